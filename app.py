@@ -1,6 +1,6 @@
 from flask import Flask, render_template
 from flask_cors import CORS
-from backend.routes import auth, accounts, masters, reports
+from backend.routes import auth, accounts, masters, reports, bootstrap
 from backend.utils.init_data import initialize_data
 import os
 
@@ -16,6 +16,7 @@ app.register_blueprint(auth.bp)
 app.register_blueprint(accounts.bp)
 app.register_blueprint(masters.bp)
 app.register_blueprint(reports.bp)
+app.register_blueprint(bootstrap.bp)
 
 @app.route('/')
 def index():
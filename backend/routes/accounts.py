@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash
-from backend.utils.json_manager import load_json, save_json
+from backend.utils.json_manager import load_json, transaction, retry_on_conflict
 from backend.routes.auth import admin_required
 import uuid
 
@@ -24,6 +24,7 @@ def get_accounts():
 
 @bp.route('/add', methods=['POST'])
 @admin_required
+@retry_on_conflict
 def add_account():
     """アカウント追加"""
     data = request.get_json()
@@ -39,23 +40,22 @@ def add_account():
     if not username or not password:
         return jsonify({'error': 'ユーザー名とパスワードは必須です'}), 400
     
-    users = load_json('users.json')
-    
-    if username in users:
-        return jsonify({'error': 'このユーザー名は既に使用されています'}), 400
-    
-    users[username] = {
-        'username': username,
-        'password': generate_password_hash(password, method='pbkdf2:sha256'),
-        'role': role,
-        '担当種別': category
-    }
+    with transaction('users.json') as users:
+        if username in users:
+            return jsonify({'error': 'このユーザー名は既に使用されています'}), 400
+        
+        users[username] = {
+            'username': username,
+            'password': generate_password_hash(password, method='pbkdf2:sha256'),
+            'role': role,
+            '担当種別': category
+        }
     
-    save_json('users.json', users)
     return jsonify({'success': True, 'message': 'アカウントを追加しました'})
 
 @bp.route('/update', methods=['PUT'])
 @admin_required
+@retry_on_conflict
 def update_account():
     """アカウント更新"""
     data = request.get_json()
@@ -67,28 +67,27 @@ def update_account():
     if not username:
         return jsonify({'error': 'ユーザー名は必須です'}), 400
     
-    users = load_json('users.json')
-    
-    if username not in users:
-        return jsonify({'error': 'ユーザーが見つかりません'}), 404
+    with transaction('users.json') as users:
+        if username not in users:
+            return jsonify({'error': 'ユーザーが見つかりません'}), 404
+        
+        if new_password:
+            users[username]['password'] = generate_password_hash(new_password, method='pbkdf2:sha256')
+        
+        if role:
+            users[username]['role'] = role
+        
+        if category is not None:
+            # 後方互換性のため、文字列が来た場合は配列に変換
+            if isinstance(category, str):
+                category = [category] if category else []
+            users[username]['担当種別'] = category
     
-    if new_password:
-        users[username]['password'] = generate_password_hash(new_password, method='pbkdf2:sha256')
-    
-    if role:
-        users[username]['role'] = role
-    
-    if category is not None:
-        # 後方互換性のため、文字列が来た場合は配列に変換
-        if isinstance(category, str):
-            category = [category] if category else []
-        users[username]['担当種別'] = category
-    
-    save_json('users.json', users)
     return jsonify({'success': True, 'message': 'アカウントを更新しました'})
 
 @bp.route('/delete', methods=['DELETE'])
 @admin_required
+@retry_on_conflict
 def delete_account():
     """アカウント削除"""
     data = request.get_json()
@@ -100,12 +99,10 @@ def delete_account():
     if username == 'admin':
         return jsonify({'error': 'adminアカウントは削除できません'}), 400
     
-    users = load_json('users.json')
-    
-    if username not in users:
-        return jsonify({'error': 'ユーザーが見つかりません'}), 404
-    
-    del users[username]
-    save_json('users.json', users)
+    with transaction('users.json') as users:
+        if username not in users:
+            return jsonify({'error': 'ユーザーが見つかりません'}), 404
+        
+        del users[username]
     return jsonify({'success': True, 'message': 'アカウントを削除しました'})
 
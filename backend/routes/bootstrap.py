@@ -0,0 +1,41 @@
+from flask import Blueprint, jsonify, session
+from backend.utils.json_manager import load_many, get_cached_versions
+from backend.utils.http_cache import make_etag, conditional_response
+from backend.routes.masters import get_session_categories, can_view_all_work_items, work_items_filename, load_visible_work_items
+
+bp = Blueprint('bootstrap', __name__, url_prefix='/api')
+
+# ログイン直後の画面表示に必要なマスター
+BOOTSTRAP_FILENAMES = ['work_types.json', 'projects.json', 'job_categories.json', work_items_filename()]
+
+@bp.route('/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """ログイン状態と、現在のユーザーが参照できる全マスターをまとめて取得
+
+    未ログインの場合は /api/auth/check と同じく logged_in: false のみを返す。
+    """
+    if 'username' not in session:
+        return jsonify({'logged_in': False})
+
+    user_category = get_session_categories()
+    user = {
+        'username': session['username'],
+        'role': session['role'],
+        '担当種別': user_category
+    }
+    etag = make_etag(get_cached_versions(BOOTSTRAP_FILENAMES), user,
+                     can_view_all_work_items(user_category))
+
+    def build():
+        # キャッシュにないマスターはまとめて並列に読み込む（作業項目はカタログから）
+        masters = load_many(BOOTSTRAP_FILENAMES)
+        return jsonify({
+            'logged_in': True,
+            **user,
+            'work_types': masters['work_types.json'].get('work_types', []),
+            'projects': masters['projects.json'].get('projects', []),
+            'job_categories': masters['job_categories.json'].get('categories', []),
+            'work_items': load_visible_work_items(None, user_category)
+        })
+
+    return conditional_response(etag, build, cache=True)
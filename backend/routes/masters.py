@@ -1,101 +1,76 @@
 from flask import Blueprint, request, jsonify, session, send_file
-from backend.utils.json_manager import load_json, save_json, list_files
-from backend.utils.excel_manager import export_work_items_to_excel, import_work_items_from_excel, export_project_to_excel, export_project_to_excel_detail, export_project_view_to_excel
+from backend.utils.json_manager import load_json, load_json_with_version, save_json, get_cached_versions, transaction, retry_on_conflict, update_json
+from backend.utils import export_cache, export_jobs, report_store, work_item_catalog
+from backend.utils.work_item_tree import WorkItemTree, filter_visible_items, invalidate_visibility_cache
+from backend.utils.excel_manager import save_workbook_to_stream, export_work_items_to_excel, import_work_items_from_excel, export_project_to_excel, export_project_to_excel_detail, export_project_view_to_excel
+from backend.utils.http_cache import make_etag, conditional_response
 from backend.routes.auth import admin_required, login_required
 import uuid
-import os
-import tempfile
+from datetime import datetime
 
 bp = Blueprint('masters', __name__, url_prefix='/api/masters')
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 # 作業項目マスター
-@bp.route('/work-items', methods=['GET'])
-@login_required
-def get_work_items():
-    """作業項目マスター取得"""
-    work_type_id = request.args.get('work_type_id', None)
-    
-    # 工程IDが指定されている場合、工程別ファイルを読み込む
-    if work_type_id:
-        filename = f'work_items_{work_type_id}.json'
-        work_items = load_json(filename)
-        all_items = work_items.get('items', [])
-    else:
-        # 工程IDが指定されていない場合は全ての工程の作業項目を読み込む
-        all_items = []
-        from backend.utils.json_manager import list_files
-        work_item_files = list_files('work_items_')
-        for filename in work_item_files:
-            # ファイル名から工程IDを抽出 (work_items_{work_type_id}.json)
-            if filename.startswith('work_items_') and filename.endswith('.json'):
-                work_type_id_from_file = filename[11:-5]  # 'work_items_'を削除し、'.json'を削除
-            else:
-                work_type_id_from_file = None
-            
-            work_items = load_json(filename)
-            items = work_items.get('items', [])
-            
-            # 各アイテムにwork_type_idを設定（まだ設定されていない場合のみ）
-            for item in items:
-                if 'work_type_id' not in item or item['work_type_id'] is None:
-                    item['work_type_id'] = work_type_id_from_file
-            
-            all_items.extend(items)
-    
+def get_session_categories():
+    """セッションの担当種別を配列で取得"""
     user_category = session.get('担当種別', [])
     # 後方互換性のため、文字列の場合は配列に変換
     if isinstance(user_category, str):
         user_category = [user_category] if user_category else []
+    return user_category
+
+def can_view_all_work_items(user_category):
+    """管理者または全体担当の場合は全ての作業項目を表示"""
+    return session.get('role') == 'admin' or 'all' in user_category
+
+def work_items_filename(work_type_id=None):
+    """作業項目の読み込み元（工程IDが指定されている場合は工程別ファイル、指定されていない場合は全工程のカタログ）"""
+    return f'work_items_{work_type_id}.json' if work_type_id else work_item_catalog.CATALOG_FILENAME
+
+def load_visible_work_items(work_type_id, user_category):
+    """現在のユーザーが参照できる作業項目のリストを取得"""
+    # (ファイル名, バージョン, 作業項目リスト) のリスト
+    item_files = []
+    if work_type_id:
+        filename = work_items_filename(work_type_id)
+        work_items, version = load_json_with_version(filename)
+        item_files.append((filename, version, work_items.get('items', [])))
+    else:
+        item_files = work_item_catalog.load_all_work_items()
     
-    # 管理者または全体担当の場合は全て表示
-    if session.get('role') == 'admin' or 'all' in user_category:
-        return jsonify({'items': all_items})
+    if can_view_all_work_items(user_category):
+        return [item for _, _, items in item_files for item in items]
     
     # 一般ユーザーは階層的に担当種別でフィルター
-    # 最下層項目（子項目がない項目）かどうかを判定する関数
-    def is_leaf_item(item, items):
-        item_id = item.get('id')
-        has_children = any(i.get('parent_id') == item_id for i in items)
-        return not has_children
-    
-    # 最下層項目かどうかの判定を事前に計算
-    leaf_flags = {item.get('id'): is_leaf_item(item, all_items) for item in all_items}
-    
-    # 項目の配下の最下層項目にユーザーの担当種別が含まれるかチェック
-    def has_accessible_leaf_descendants(item_id, items, leaf_flags, user_cats):
-        """項目の配下にユーザーがアクセス可能な最下層項目があるか確認"""
-        # 自分が最下層の場合
-        if leaf_flags.get(item_id, False):
-            item = next((i for i in items if i.get('id') == item_id), None)
-            if item:
-                item_categories = item.get('担当種別', [])
-                # 担当種別が設定されていない場合、またはユーザーの担当種別のいずれかが含まれる場合
-                if not item_categories or any(user_cat in item_categories for user_cat in user_cats):
-                    return True
-        
-        # 子項目を確認
-        children = [i for i in items if i.get('parent_id') == item_id]
-        for child in children:
-            if has_accessible_leaf_descendants(child.get('id'), items, leaf_flags, user_cats):
-                return True
-        
-        return False
-    
-    # フィルタリング：配下にアクセス可能な最下層項目がある項目のみを表示
+    # 配下にアクセス可能な最下層項目がある項目のみを表示（担当種別ごとの計算結果はファイルのバージョン単位でキャッシュ）
     filtered_items = []
-    for item in all_items:
-        item_id = item.get('id')
-        # 自分が最下層で、かつアクセス可能な場合
-        if leaf_flags.get(item_id, False):
-            item_categories = item.get('担当種別', [])
-            if not item_categories or any(user_cat in item_categories for user_cat in user_category):
-                filtered_items.append(item)
-        # 自分が親項目の場合、配下にアクセス可能な最下層項目がある場合のみ表示
-        else:
-            if has_accessible_leaf_descendants(item_id, all_items, leaf_flags, user_category):
-                filtered_items.append(item)
+    for filename, version, items in item_files:
+        filtered_items.extend(filter_visible_items(filename, version, items, user_category))
+    return filtered_items
+
+@bp.route('/work-items', methods=['GET'])
+@login_required
+def get_work_items():
+    """作業項目マスター取得"""
+    work_type_id = request.args.get('work_type_id', None)
+    user_category = get_session_categories()
     
-    return jsonify({'items': filtered_items})
+    etag = make_etag(get_cached_versions([work_items_filename(work_type_id)]),
+                     can_view_all_work_items(user_category) or sorted(user_category))
+    return conditional_response(etag, lambda: {'items': load_visible_work_items(work_type_id, user_category)},
+                                cache=True)
+
+def refresh_work_items_file(filename):
+    """作業項目ファイルの保存後に、全工程カタログの該当エントリを更新して表示可能項目のキャッシュを破棄"""
+    work_item_catalog.update_catalog_file(filename)
+    invalidate_visibility_cache(filename)
+
+def save_work_items_file(filename, work_items):
+    """作業項目ファイルを保存（内容全体を置き換える）"""
+    save_json(filename, work_items)
+    refresh_work_items_file(filename)
 
 @bp.route('/work-items', methods=['POST'])
 @admin_required
@@ -108,11 +83,12 @@ def save_work_items():
         return jsonify({'error': '工種IDが必要です'}), 400
     
     filename = f'work_items_{work_type_id}.json'
-    save_json(filename, data)
+    save_work_items_file(filename, data)
     return jsonify({'success': True, 'message': '作業項目マスターを保存しました'})
 
 @bp.route('/work-items/add', methods=['POST'])
 @admin_required
+@retry_on_conflict
 def add_work_item():
     """作業項目追加"""
     data = request.get_json()
@@ -122,7 +98,6 @@ def add_work_item():
         return jsonify({'error': '工種IDが必要です'}), 400
     
     filename = f'work_items_{work_type_id}.json'
-    work_items = load_json(filename)
     
     new_item = {
         'id': str(uuid.uuid4()),
@@ -142,16 +117,18 @@ def add_work_item():
         'is_leaf': data.get('is_leaf', False)
     }
     
-    if 'items' not in work_items:
-        work_items['items'] = []
-    
-    work_items['items'].append(new_item)
-    save_json(filename, work_items)
+    with transaction(filename) as work_items:
+        if 'items' not in work_items:
+            work_items['items'] = []
+        
+        work_items['items'].append(new_item)
+    refresh_work_items_file(filename)
     
     return jsonify({'success': True, 'item': new_item})
 
 @bp.route('/work-items/update', methods=['PUT'])
 @admin_required
+@retry_on_conflict
 def update_work_item():
     """作業項目更新"""
     data = request.get_json()
@@ -162,34 +139,38 @@ def update_work_item():
         return jsonify({'error': '工種IDが必要です'}), 400
     
     filename = f'work_items_{work_type_id}.json'
-    work_items = load_json(filename)
     
-    for i, item in enumerate(work_items.get('items', [])):
-        if item['id'] == item_id:
-            work_items['items'][i] = {
-                'id': item_id,
-                'name': data.get('name', item['name']),
-                'level': data.get('level', item['level']),
-                'parent_id': data.get('parent_id', item.get('parent_id')),
-                'work_type_id': work_type_id,
-                'attribute': data.get('attribute', item.get('attribute')),
-                'target_minutes': data.get('target_minutes', item.get('target_minutes')),
-                'checklist': data.get('checklist', item.get('checklist', [])),
-                'method': data.get('method', item.get('method', [])),
-                'internal_leadtime': data.get('internal_leadtime', item.get('internal_leadtime', False)),
-                'external_leadtime': data.get('external_leadtime', item.get('external_leadtime', False)),
-                'internal_leadtime_items': data.get('internal_leadtime_items', item.get('internal_leadtime_items', [])),
-                'external_leadtime_items': data.get('external_leadtime_items', item.get('external_leadtime_items', [])),
-                '担当種別': data.get('担当種別', item.get('担当種別', [])),
-                'is_leaf': data.get('is_leaf', item.get('is_leaf', False))
-            }
-            save_json(filename, work_items)
-            return jsonify({'success': True, 'item': work_items['items'][i]})
-    
-    return jsonify({'error': '作業項目が見つかりません'}), 404
+    with transaction(filename) as work_items:
+        for i, item in enumerate(work_items.get('items', [])):
+            if item['id'] == item_id:
+                updated_item = {
+                    'id': item_id,
+                    'name': data.get('name', item['name']),
+                    'level': data.get('level', item['level']),
+                    'parent_id': data.get('parent_id', item.get('parent_id')),
+                    'work_type_id': work_type_id,
+                    'attribute': data.get('attribute', item.get('attribute')),
+                    'target_minutes': data.get('target_minutes', item.get('target_minutes')),
+                    'checklist': data.get('checklist', item.get('checklist', [])),
+                    'method': data.get('method', item.get('method', [])),
+                    'internal_leadtime': data.get('internal_leadtime', item.get('internal_leadtime', False)),
+                    'external_leadtime': data.get('external_leadtime', item.get('external_leadtime', False)),
+                    'internal_leadtime_items': data.get('internal_leadtime_items', item.get('internal_leadtime_items', [])),
+                    'external_leadtime_items': data.get('external_leadtime_items', item.get('external_leadtime_items', [])),
+                    '担当種別': data.get('担当種別', item.get('担当種別', [])),
+                    'is_leaf': data.get('is_leaf', item.get('is_leaf', False))
+                }
+                work_items['items'][i] = updated_item
+                break
+        else:
+            return jsonify({'error': '作業項目が見つかりません'}), 404
+    refresh_work_items_file(filename)
+    
+    return jsonify({'success': True, 'item': updated_item})
 
 @bp.route('/work-items/delete', methods=['DELETE'])
 @admin_required
+@retry_on_conflict
 def delete_work_item():
     """作業項目削除"""
     data = request.get_json()
@@ -203,29 +184,20 @@ def delete_work_item():
         return jsonify({'error': '工種IDが必要です'}), 400
     
     filename = f'work_items_{work_type_id}.json'
-    work_items = load_json(filename)
     
     # 削除対象のIDセットを作成
     ids_to_delete = set(item_ids)
     
-    # 再帰的に子項目も削除
-    def get_all_descendant_ids(item_id, items):
-        """項目IDとその全ての子孫IDを取得"""
-        descendant_ids = {item_id}
-        for item in items:
-            if item.get('parent_id') == item_id:
-                descendant_ids.add(item['id'])
-                descendant_ids.update(get_all_descendant_ids(item['id'], items))
-        return descendant_ids
-    
-    # 全ての削除対象IDを取得（子孫を含む）
-    all_ids_to_delete = set()
-    for item_id in ids_to_delete:
-        all_ids_to_delete.update(get_all_descendant_ids(item_id, work_items.get('items', [])))
-    
-    # 削除対象以外の項目を残す
-    work_items['items'] = [item for item in work_items.get('items', []) if item['id'] not in all_ids_to_delete]
-    save_json(filename, work_items)
+    with transaction(filename) as work_items:
+        # 全ての削除対象IDを取得（子孫を含む）
+        tree = WorkItemTree(work_items.get('items', []))
+        all_ids_to_delete = set()
+        for item_id in ids_to_delete:
+            all_ids_to_delete.update(tree.descendant_ids(item_id))
+        
+        # 削除対象以外の項目を残す
+        work_items['items'] = [item for item in work_items.get('items', []) if item['id'] not in all_ids_to_delete]
+    refresh_work_items_file(filename)
     
     return jsonify({'success': True})
 
@@ -245,19 +217,12 @@ def export_work_items():
     # Excelを生成（作業項目がない場合は空の雛形を生成）
     wb = export_work_items_to_excel(items)
     
-    # 一時ファイルに保存
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file_path = temp_file.name
-    wb.save(temp_file_path)
-    temp_file.close()
-    
-    # send_fileの後、レスポンスが送信された後に削除されるよう設定
+    # メモリ上（大きい場合は自動削除される一時領域）に保存し、送信後に破棄する
     return send_file(
-        temp_file_path,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        save_workbook_to_stream(wb),
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
         download_name='作業項目マスター.xlsx',
-        # 削除はFlaskが自動的に処理（send_fileは削除しないが、一時ファイルはシステムが後で削除）
     )
 
 @bp.route('/work-items/preview', methods=['POST'])
@@ -274,34 +239,16 @@ def preview_work_items():
     if not file.filename.endswith('.xlsx'):
         return jsonify({'error': 'Excelファイル(.xlsx)をアップロードしてください'}), 400
     
-    temp_file_path = None
     try:
-        # 一時ファイルに保存
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        temp_file_path = temp_file.name
-        file.save(temp_file_path)
-        temp_file.close()
-        
-        # Excelから作業項目を読み込み（プレビューのみ、工程ID不要）
-        imported_items = import_work_items_from_excel(temp_file_path)
+        # アップロードされたストリームから直接、作業項目を読み込み（プレビューのみ、工程ID不要）
+        imported_items = import_work_items_from_excel(file.stream)
         
         # プレビュー用にデータを整形（階層パスを含める）
-        def get_hierarchy_path(item, all_items):
-            """項目の階層パスを取得"""
-            path = []
-            current_item = item
-            while current_item:
-                path.insert(0, current_item.get('name', ''))
-                parent_id = current_item.get('parent_id')
-                if parent_id:
-                    current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-                else:
-                    break
-            return path
+        tree = WorkItemTree(imported_items)
         
         preview_data = []
         for item in imported_items:
-            hierarchy_path = get_hierarchy_path(item, imported_items)
+            hierarchy_path = tree.path(item)
             preview_data.append({
                 'uuid': item.get('id', ''),
                 'level1': hierarchy_path[0] if len(hierarchy_path) > 0 else '',
@@ -319,21 +266,94 @@ def preview_work_items():
                 '担当種別': ','.join(item.get('担当種別', [])) if item.get('担当種別') else ''
             })
         
-        # 一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
-        
         return jsonify({
             'success': True,
             'items': preview_data,
             'count': len(preview_data)
         })
     except Exception as e:
-        # エラー時は一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
         return jsonify({'error': f'プレビューの読み込みに失敗しました: {str(e)}'}), 500
 
+def merge_imported_items(work_items, imported_items):
+    """インポートした作業項目を既存の作業項目ファイルの内容に反映し、(新規, 更新, 削除)の件数を返す"""
+    existing_items = work_items.get('items', [])
+    
+    # UUIDで既存項目をマップ
+    existing_items_map = {item['id']: item for item in existing_items}
+    
+    # 階層パスを取得するための木構造
+    imported_tree = WorkItemTree(imported_items)
+    existing_tree = WorkItemTree(existing_items)
+    
+    # インポートされた項目の階層パスセットを作成
+    imported_hierarchy_paths = set()
+    for item in imported_items:
+        hierarchy_path = tuple(imported_tree.path(item))
+        imported_hierarchy_paths.add(hierarchy_path)
+    
+    # インポートされた項目のUUIDセットを作成（最下層項目と親項目の両方を含む）
+    imported_uuids = {item['id'] for item in imported_items}
+    
+    # 既存項目の階層パスマップを作成
+    existing_hierarchy_paths = {}
+    for item in existing_items:
+        hierarchy_path = tuple(existing_tree.path(item))
+        existing_hierarchy_paths[item['id']] = hierarchy_path
+    
+    # インポートした項目で更新/追加
+    updated_count = 0
+    added_count = 0
+    
+    # 既存項目をマップに保持（インポート順序を保持するため）
+    updated_items_map = {}
+    
+    for imported_item in imported_items:
+        item_id = imported_item['id']
+        if item_id in existing_items_map:
+            # 既存項目を更新（既存のデータを保持しつつ更新）
+            existing_item = existing_items_map[item_id].copy()
+            existing_item.update(imported_item)
+            updated_items_map[item_id] = existing_item
+            updated_count += 1
+        else:
+            # 新規項目を追加
+            updated_items_map[item_id] = imported_item
+            added_count += 1
+    
+    # Excelに含まれていない既存項目を削除（ただし、階層パスが同じ既存項目は削除しない）
+    items_to_keep_from_existing = []
+    deleted_count = 0
+    for item in existing_items:
+        item_id = item['id']
+        hierarchy_path = existing_hierarchy_paths[item_id]
+        if item_id in imported_uuids:
+            # インポートされたUUIDに含まれている場合は保持
+            items_to_keep_from_existing.append(item)
+        elif hierarchy_path in imported_hierarchy_paths:
+            # 階層パスが同じ既存項目は削除しない（名称が同じ場合は保持）
+            items_to_keep_from_existing.append(item)
+        else:
+            deleted_count += 1
+    
+    # インポートされた項目の順序を保持（親項目も含む）
+    items_to_keep = []
+    seen_ids = set()
+    for imported_item in imported_items:
+        item_id = imported_item['id']
+        if item_id not in seen_ids:
+            items_to_keep.append(updated_items_map[item_id])
+            seen_ids.add(item_id)
+    
+    # 階層パスが同じ既存項目を追加（インポートされていないが、名称が同じ項目）
+    existing_ids_in_keep = {item['id'] for item in items_to_keep}
+    for item in items_to_keep_from_existing:
+        if item['id'] not in existing_ids_in_keep:
+            items_to_keep.append(item)
+    
+    # フィルタリング後のリストを保存
+    work_items['items'] = items_to_keep
+    return added_count, updated_count, deleted_count
+
 @bp.route('/work-items/import', methods=['POST'])
 @admin_required
 def import_work_items():
@@ -348,119 +368,21 @@ def import_work_items():
     if not file.filename.endswith('.xlsx'):
         return jsonify({'error': 'Excelファイル(.xlsx)をアップロードしてください'}), 400
     
-    temp_file_path = None
     try:
-        # 一時ファイルに保存
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        temp_file_path = temp_file.name
-        file.save(temp_file_path)
-        temp_file.close()
-        
         # Excelから作業項目を読み込み
         work_type_id = request.form.get('work_type_id')
         
         if not work_type_id:
-            os.unlink(temp_file_path)
             return jsonify({'error': '工程IDが必要です'}), 400
         
-        imported_items = import_work_items_from_excel(temp_file_path)
+        # アップロードされたストリームから直接読み込む
+        imported_items = import_work_items_from_excel(file.stream)
         
-        # 既存の作業項目を読み込み
+        # 既存の作業項目に反映して保存（他の保存と競合した場合は読み込みからやり直す）
         filename = f'work_items_{work_type_id}.json'
-        work_items = load_json(filename)
-        existing_items = work_items.get('items', [])
-        
-        # UUIDで既存項目をマップ
-        existing_items_map = {item['id']: item for item in existing_items}
-        
-        # 階層パスを取得する関数
-        def get_hierarchy_path(item, all_items):
-            """項目の階層パス（レベル1から順に）を取得"""
-            path = []
-            current_item = item
-            while current_item:
-                path.insert(0, current_item.get('name', ''))
-                parent_id = current_item.get('parent_id')
-                if parent_id:
-                    current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-                else:
-                    break
-            return tuple(path)
-        
-        # インポートされた項目の階層パスセットを作成
-        imported_hierarchy_paths = set()
-        for item in imported_items:
-            hierarchy_path = get_hierarchy_path(item, imported_items)
-            imported_hierarchy_paths.add(hierarchy_path)
-        
-        # インポートされた項目のUUIDセットを作成（最下層項目と親項目の両方を含む）
-        imported_uuids = {item['id'] for item in imported_items}
-        
-        # 既存項目の階層パスマップを作成
-        existing_hierarchy_paths = {}
-        for item in existing_items:
-            hierarchy_path = get_hierarchy_path(item, existing_items)
-            existing_hierarchy_paths[item['id']] = hierarchy_path
-        
-        # インポートした項目で更新/追加
-        updated_count = 0
-        added_count = 0
-        
-        # 既存項目をマップに保持（インポート順序を保持するため）
-        updated_items_map = {}
-        
-        for imported_item in imported_items:
-            item_id = imported_item['id']
-            if item_id in existing_items_map:
-                # 既存項目を更新（既存のデータを保持しつつ更新）
-                existing_item = existing_items_map[item_id].copy()
-                existing_item.update(imported_item)
-                updated_items_map[item_id] = existing_item
-                updated_count += 1
-            else:
-                # 新規項目を追加
-                updated_items_map[item_id] = imported_item
-                added_count += 1
-        
-        # Excelに含まれていない既存項目を削除（ただし、階層パスが同じ既存項目は削除しない）
-        items_to_keep_from_existing = []
-        deleted_count = 0
-        for item in existing_items:
-            item_id = item['id']
-            hierarchy_path = existing_hierarchy_paths[item_id]
-            if item_id in imported_uuids:
-                # インポートされたUUIDに含まれている場合は保持
-                items_to_keep_from_existing.append(item)
-            elif hierarchy_path in imported_hierarchy_paths:
-                # 階層パスが同じ既存項目は削除しない（名称が同じ場合は保持）
-                items_to_keep_from_existing.append(item)
-            else:
-                deleted_count += 1
-        
-        # インポートされた項目の順序を保持（親項目も含む）
-        items_to_keep = []
-        seen_ids = set()
-        for imported_item in imported_items:
-            item_id = imported_item['id']
-            if item_id not in seen_ids:
-                items_to_keep.append(updated_items_map[item_id])
-                seen_ids.add(item_id)
-        
-        # 階層パスが同じ既存項目を追加（インポートされていないが、名称が同じ項目）
-        existing_ids_in_keep = {item['id'] for item in items_to_keep}
-        for item in items_to_keep_from_existing:
-            if item['id'] not in existing_ids_in_keep:
-                items_to_keep.append(item)
-        
-        # フィルタリング後のリストを保存
-        work_items['items'] = items_to_keep
-        
-        # 保存（filenameは既に設定されている）
-        save_json(filename, work_items)
-        
-        # 一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+        added_count, updated_count, deleted_count = update_json(
+            filename, lambda work_items: merge_imported_items(work_items, imported_items))
+        refresh_work_items_file(filename)
         
         message = f'{len(imported_items)}件の作業項目をインポートしました（新規: {added_count}件、更新: {updated_count}件、削除: {deleted_count}件）'
         
@@ -473,9 +395,6 @@ def import_work_items():
             'deleted': deleted_count
         })
     except Exception as e:
-        # 一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
         return jsonify({'error': f'インポートに失敗しました: {str(e)}'}), 500
 
 # 担当種別マスター
@@ -483,8 +402,8 @@ def import_work_items():
 @login_required
 def get_job_categories():
     """担当種別マスター取得"""
-    categories = load_json('job_categories.json')
-    return jsonify(categories)
+    etag = make_etag(get_cached_versions(['job_categories.json']))
+    return conditional_response(etag, lambda: jsonify(load_json('job_categories.json')), cache=True)
 
 @bp.route('/job-categories', methods=['POST'])
 @admin_required
@@ -499,15 +418,15 @@ def save_job_categories():
 @login_required
 def get_projects():
     """プロジェクトマスター取得"""
-    projects = load_json('projects.json')
-    return jsonify(projects)
+    etag = make_etag(get_cached_versions(['projects.json']))
+    return conditional_response(etag, lambda: jsonify(load_json('projects.json')), cache=True)
 
 @bp.route('/projects/add', methods=['POST'])
 @admin_required
+@retry_on_conflict
 def add_project():
     """プロジェクト追加"""
     data = request.get_json()
-    projects = load_json('projects.json')
     
     new_project = {
         'id': str(uuid.uuid4()),
@@ -516,16 +435,17 @@ def add_project():
         'work_type_ids': data.get('work_type_ids', [])  # 複数工程に対応
     }
     
-    if 'projects' not in projects:
-        projects['projects'] = []
-    
-    projects['projects'].append(new_project)
-    save_json('projects.json', projects)
+    with transaction('projects.json') as projects:
+        if 'projects' not in projects:
+            projects['projects'] = []
+        
+        projects['projects'].append(new_project)
     
     return jsonify({'success': True, 'project': new_project})
 
 @bp.route('/projects/update', methods=['PUT'])
 @admin_required
+@retry_on_conflict
 def update_project():
     """プロジェクト更新"""
     from datetime import datetime
@@ -533,40 +453,38 @@ def update_project():
     data = request.get_json()
     project_id = data.get('id')
     
-    projects = load_json('projects.json')
-    
-    for i, project in enumerate(projects.get('projects', [])):
-        if project['id'] == project_id:
-            new_status = data.get('status', project.get('status'))
-            old_status = project.get('status')
-            
-            # ステータスが「完了」に変更された場合、完了日を記録
-            completed_date = project.get('completed_date')
-            if new_status == '完了' and old_status != '完了':
-                completed_date = datetime.now().strftime('%Y-%m-%d')
-            elif new_status != '完了':
-                # ステータスが「完了」以外に変更された場合、完了日をクリア
-                completed_date = None
-            
-            # 後方互換性: work_type_idがある場合はwork_type_idsに変換
-            work_type_ids = data.get('work_type_ids')
-            if work_type_ids is None:
-                # work_type_idsが指定されていない場合、既存のwork_type_idを確認
-                existing_work_type_id = project.get('work_type_id')
-                if existing_work_type_id:
-                    work_type_ids = [existing_work_type_id]
-                else:
-                    work_type_ids = project.get('work_type_ids', [])
-            
-            projects['projects'][i] = {
-                'id': project_id,
-                'name': data.get('name', project['name']),
-                'status': new_status,
-                'work_type_ids': work_type_ids,
-                'completed_date': completed_date if completed_date else project.get('completed_date')
-            }
-            save_json('projects.json', projects)
-            return jsonify({'success': True, 'project': projects['projects'][i]})
+    with transaction('projects.json') as projects:
+        for i, project in enumerate(projects.get('projects', [])):
+            if project['id'] == project_id:
+                new_status = data.get('status', project.get('status'))
+                old_status = project.get('status')
+                
+                # ステータスが「完了」に変更された場合、完了日を記録
+                completed_date = project.get('completed_date')
+                if new_status == '完了' and old_status != '完了':
+                    completed_date = datetime.now().strftime('%Y-%m-%d')
+                elif new_status != '完了':
+                    # ステータスが「完了」以外に変更された場合、完了日をクリア
+                    completed_date = None
+                
+                # 後方互換性: work_type_idがある場合はwork_type_idsに変換
+                work_type_ids = data.get('work_type_ids')
+                if work_type_ids is None:
+                    # work_type_idsが指定されていない場合、既存のwork_type_idを確認
+                    existing_work_type_id = project.get('work_type_id')
+                    if existing_work_type_id:
+                        work_type_ids = [existing_work_type_id]
+                    else:
+                        work_type_ids = project.get('work_type_ids', [])
+                
+                projects['projects'][i] = {
+                    'id': project_id,
+                    'name': data.get('name', project['name']),
+                    'status': new_status,
+                    'work_type_ids': work_type_ids,
+                    'completed_date': completed_date if completed_date else project.get('completed_date')
+                }
+                return jsonify({'success': True, 'project': projects['projects'][i]})
     
     return jsonify({'error': 'プロジェクトが見つかりません'}), 404
 
@@ -575,60 +493,58 @@ def update_project():
 @login_required
 def get_work_types():
     """工程マスター取得"""
-    work_types = load_json('work_types.json')
-    return jsonify(work_types)
+    etag = make_etag(get_cached_versions(['work_types.json']))
+    return conditional_response(etag, lambda: jsonify(load_json('work_types.json')), cache=True)
 
 @bp.route('/work-types/add', methods=['POST'])
 @admin_required
+@retry_on_conflict
 def add_work_type():
     """工程追加"""
     data = request.get_json()
-    work_types = load_json('work_types.json')
     
     new_work_type = {
         'id': str(uuid.uuid4()),
         'name': data.get('name', '')
     }
     
-    if 'work_types' not in work_types:
-        work_types['work_types'] = []
-    
-    work_types['work_types'].append(new_work_type)
-    save_json('work_types.json', work_types)
+    with transaction('work_types.json') as work_types:
+        if 'work_types' not in work_types:
+            work_types['work_types'] = []
+        
+        work_types['work_types'].append(new_work_type)
     
     return jsonify({'success': True, 'work_type': new_work_type})
 
 @bp.route('/work-types/update', methods=['PUT'])
 @admin_required
+@retry_on_conflict
 def update_work_type():
     """工程更新"""
     data = request.get_json()
     work_type_id = data.get('id')
     
-    work_types = load_json('work_types.json')
-    
-    for i, work_type in enumerate(work_types.get('work_types', [])):
-        if work_type['id'] == work_type_id:
-            work_types['work_types'][i] = {
-                'id': work_type_id,
-                'name': data.get('name', work_type['name'])
-            }
-            save_json('work_types.json', work_types)
-            return jsonify({'success': True, 'work_type': work_types['work_types'][i]})
+    with transaction('work_types.json') as work_types:
+        for i, work_type in enumerate(work_types.get('work_types', [])):
+            if work_type['id'] == work_type_id:
+                work_types['work_types'][i] = {
+                    'id': work_type_id,
+                    'name': data.get('name', work_type['name'])
+                }
+                return jsonify({'success': True, 'work_type': work_types['work_types'][i]})
     
     return jsonify({'error': '工程が見つかりません'}), 404
 
 @bp.route('/work-types/delete', methods=['DELETE'])
 @admin_required
+@retry_on_conflict
 def delete_work_type():
     """工程削除"""
     data = request.get_json()
     work_type_id = data.get('id')
     
-    work_types = load_json('work_types.json')
-    
-    work_types['work_types'] = [wt for wt in work_types.get('work_types', []) if wt['id'] != work_type_id]
-    save_json('work_types.json', work_types)
+    with transaction('work_types.json') as work_types:
+        work_types['work_types'] = [wt for wt in work_types.get('work_types', []) if wt['id'] != work_type_id]
     
     return jsonify({'success': True, 'message': '工程を削除しました'})
 
@@ -649,34 +565,51 @@ def update_work_types_order():
 
 @bp.route('/projects/delete', methods=['DELETE'])
 @admin_required
+@retry_on_conflict
 def delete_project():
     """プロジェクト削除"""
     data = request.get_json()
     project_id = data.get('id')
     
-    projects = load_json('projects.json')
-    
-    projects['projects'] = [p for p in projects.get('projects', []) if p['id'] != project_id]
-    save_json('projects.json', projects)
+    with transaction('projects.json') as projects:
+        projects['projects'] = [p for p in projects.get('projects', []) if p['id'] != project_id]
     
     return jsonify({'success': True})
 
-@bp.route('/projects/export', methods=['GET'])
-@admin_required
-def export_project():
-    """プロジェクトをExcelにエクスポート"""
-    project_id = request.args.get('project_id')
-    format_type = request.args.get('format', 'user')  # 'user' または 'detail'
-    
+def find_export_project(project_id):
+    """エクスポート対象のプロジェクトを取得（エラー時は (None, エラーレスポンス)）"""
     if not project_id:
-        return jsonify({'error': 'プロジェクトIDが必要です'}), 400
+        return None, (jsonify({'error': 'プロジェクトIDが必要です'}), 400)
     
     # プロジェクトを取得
     projects = load_json('projects.json')
     project = next((p for p in projects.get('projects', []) if p['id'] == project_id), None)
     
     if not project:
-        return jsonify({'error': 'プロジェクトが見つかりません'}), 404
+        return None, (jsonify({'error': 'プロジェクトが見つかりません'}), 404)
+    return project, None
+
+def project_export_download_name(project):
+    """プロジェクトのExcelのファイル名（プロジェクト名＋年月日）"""
+    project_name = project.get('name', 'プロジェクト')
+    safe_project_name = "".join(c for c in project_name if c.isalnum() or c in (' ', '-', '_')).strip()
+    if not safe_project_name:
+        safe_project_name = 'プロジェクト'
+    
+    # 年月日を取得（YYYYMMDD形式）
+    today = datetime.now()
+    date_str = today.strftime('%Y%m%d')
+    return f'{safe_project_name}_{date_str}.xlsx'
+
+def project_view_export_download_name():
+    """プロジェクト別表示のExcelのファイル名（プロジェクト別表示_YYYYMMDD.xlsx）"""
+    today = datetime.now()
+    date_str = today.strftime('%Y%m%d')
+    return f'プロジェクト別表示_{date_str}.xlsx'
+
+def build_project_export(project, format_type):
+    """プロジェクトのExcelを生成"""
+    project_id = project['id']
     
     # 工程マスターを取得
     work_types_data = load_json('work_types.json')
@@ -691,54 +624,17 @@ def export_project():
         work_items_data = load_json(filename)
         work_items_by_type[work_type_id] = work_items_data.get('items', [])
     
-    # 全ユーザーの日報を取得
-    all_reports = []
+    # 全ユーザーの日報を取得（このプロジェクトの日報を含む月のファイルのみ読み込む）
     users_data = load_json('users.json')
-    
-    for username in users_data.keys():
-        reports_filename = f'reports_{username}.json'
-        user_reports_data = load_json(reports_filename)
-        if user_reports_data:  # ファイルが存在する場合（空でない場合）
-            for report in user_reports_data.get('reports', []):
-                report_with_username = report.copy()
-                report_with_username['username'] = username
-                all_reports.append(report_with_username)
+    all_reports = report_store.load_all_user_reports(users_data.keys(), project_id=project_id)
     
     # Excelを生成（フォーマットに応じて）
     if format_type == 'detail':
-        wb = export_project_to_excel_detail(project, work_types, work_items_by_type, all_reports)
-    else:
-        wb = export_project_to_excel(project, work_types, work_items_by_type, all_reports)
-    
-    # 一時ファイルに保存
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file_path = temp_file.name
-    wb.save(temp_file_path)
-    temp_file.close()
-    
-    # プロジェクト名をファイル名に使用（プロジェクト名＋年月日）
-    from datetime import datetime
-    project_name = project.get('name', 'プロジェクト')
-    safe_project_name = "".join(c for c in project_name if c.isalnum() or c in (' ', '-', '_')).strip()
-    if not safe_project_name:
-        safe_project_name = 'プロジェクト'
-    
-    # 年月日を取得（YYYYMMDD形式）
-    today = datetime.now()
-    date_str = today.strftime('%Y%m%d')
-    
-    # send_fileで返す
-    return send_file(
-        temp_file_path,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'{safe_project_name}_{date_str}.xlsx'
-    )
+        return export_project_to_excel_detail(project, work_types, work_items_by_type, all_reports)
+    return export_project_to_excel(project, work_types, work_items_by_type, all_reports)
 
-@bp.route('/reports/export-project-view', methods=['GET'])
-@admin_required
-def export_project_view():
-    """プロジェクト別表示をExcelにエクスポート"""
+def build_project_view_export():
+    """プロジェクト別表示のExcelを生成"""
     # 工程マスターを取得
     work_types_data = load_json('work_types.json')
     work_types = work_types_data.get('work_types', [])
@@ -759,37 +655,108 @@ def export_project_view():
             work_items_by_type[work_type_id] = []
     
     # 全ユーザーの日報を取得
-    all_reports = []
     users_data = load_json('users.json')
-    
-    for username in users_data.keys():
-        reports_filename = f'reports_{username}.json'
-        user_reports_data = load_json(reports_filename)
-        if user_reports_data:  # ファイルが存在する場合（空でない場合）
-            for report in user_reports_data.get('reports', []):
-                report_with_username = report.copy()
-                report_with_username['username'] = username
-                all_reports.append(report_with_username)
+    all_reports = report_store.load_all_user_reports(users_data.keys())
     
     # Excelを生成
-    wb = export_project_view_to_excel(work_types, projects, work_items_by_type, all_reports)
-    
-    # 一時ファイルに保存
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file_path = temp_file.name
-    wb.save(temp_file_path)
-    temp_file.close()
-    
-    # ファイル名を生成（プロジェクト別表示_YYYYMMDD.xlsx）
-    from datetime import datetime
-    today = datetime.now()
-    date_str = today.strftime('%Y%m%d')
-    
-    # send_fileで返す
+    return export_project_view_to_excel(work_types, projects, work_items_by_type, all_reports)
+
+def report_versions():
+    """全ユーザーの日報ファイルのバージョン（エクスポートのキャッシュキー用）"""
+    versions = []
+    for username in load_json('users.json').keys():
+        versions.extend(report_store.report_file_versions(username))
+    return versions
+
+def open_project_export(project, format_type):
+    """プロジェクトのExcelを開く（依存するJSONが更新されていなければキャッシュから返す）"""
+    filenames = ['projects.json', 'work_types.json', 'users.json']
+    filenames += [f'work_items_{work_type_id}.json' for work_type_id in project.get('work_type_ids', [])]
+    versions = get_cached_versions(filenames) + report_versions()
+    key = export_cache.cache_key('project', {'project_id': project['id'], 'format': format_type}, versions)
+    return export_cache.open_or_build(key, lambda: build_project_export(project, format_type))
+
+def open_project_view_export():
+    """プロジェクト別表示のExcelを開く（依存するJSONが更新されていなければキャッシュから返す）"""
+    work_types = load_json('work_types.json').get('work_types', [])
+    filenames = ['projects.json', 'work_types.json', 'users.json']
+    filenames += [f"work_items_{work_type['id']}.json" for work_type in work_types]
+    versions = get_cached_versions(filenames) + report_versions()
+    key = export_cache.cache_key('project-view', {}, versions)
+    return export_cache.open_or_build(key, build_project_view_export)
+
+def send_export(stream, download_name):
+    """エクスポートしたファイルをダウンロードとして返す"""
+    # send_fileで返す（送信後にストリームを閉じる）
     return send_file(
-        temp_file_path,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        stream,
+        mimetype=XLSX_MIMETYPE,
         as_attachment=True,
-        download_name=f'プロジェクト別表示_{date_str}.xlsx'
+        download_name=download_name
     )
 
+def export_job_response(job):
+    """エクスポートジョブの登録結果を返す"""
+    if job is None:
+        return jsonify({'error': 'エクスポートの待ちが多いため受け付けられません。しばらくしてから再度お試しください'}), 503
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+@bp.route('/projects/export', methods=['GET'])
+@admin_required
+def export_project():
+    """プロジェクトをExcelにエクスポート"""
+    project, error = find_export_project(request.args.get('project_id'))
+    if error:
+        return error
+    format_type = request.args.get('format', 'user')  # 'user' または 'detail'
+    return send_export(open_project_export(project, format_type), project_export_download_name(project))
+
+@bp.route('/projects/export/jobs', methods=['POST'])
+@admin_required
+def enqueue_project_export():
+    """プロジェクトのExcelエクスポートをジョブとして登録"""
+    data = request.get_json(silent=True) or {}
+    project, error = find_export_project(data.get('project_id'))
+    if error:
+        return error
+    format_type = data.get('format', 'user')  # 'user' または 'detail'
+    job = export_jobs.submit(('project', project['id'], format_type),
+                             lambda: (open_project_export(project, format_type),
+                                      project_export_download_name(project)))
+    return export_job_response(job)
+
+@bp.route('/reports/export-project-view', methods=['GET'])
+@admin_required
+def export_project_view():
+    """プロジェクト別表示をExcelにエクスポート"""
+    return send_export(open_project_view_export(), project_view_export_download_name())
+
+@bp.route('/reports/export-project-view/jobs', methods=['POST'])
+@admin_required
+def enqueue_project_view_export():
+    """プロジェクト別表示のExcelエクスポートをジョブとして登録"""
+    job = export_jobs.submit(('project-view',),
+                             lambda: (open_project_view_export(), project_view_export_download_name()))
+    return export_job_response(job)
+
+@bp.route('/export-jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_export_job(job_id):
+    """エクスポートジョブの状態取得（queued, running, done, failed）"""
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'ジョブが見つかりません（期限切れの可能性があります）'}), 404
+    return jsonify({'job': job.to_dict()})
+
+@bp.route('/export-jobs/<job_id>/download', methods=['GET'])
+@admin_required
+def download_export_job(job_id):
+    """完了したエクスポートジョブのファイルをダウンロード"""
+    # 期限切れの破棄で結果ファイルが削除されても送信できるよう、ジョブの取得と同時にファイルを開く
+    job, stream = export_jobs.open_result(job_id)
+    if job is None:
+        return jsonify({'error': 'ジョブが見つかりません（期限切れの可能性があります）'}), 404
+    if stream is None:
+        return jsonify({'error': 'エクスポートが完了していません', 'job': job.to_dict()}), 409
+    return send_export(stream, job.download_name)
+
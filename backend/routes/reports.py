@@ -1,30 +1,71 @@
 from flask import Blueprint, request, jsonify, session
-from backend.utils.json_manager import load_json, save_json, list_files
+from backend.utils.json_manager import load_json, get_cached_versions
+from backend.utils import report_store, report_rollups
+from backend.utils.http_cache import make_etag, conditional_response
 from backend.routes.auth import login_required, admin_required
 import uuid
 from datetime import datetime
-import os
 
 bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
-def get_user_reports_filename(username):
-    """ユーザーごとの日報ファイル名を取得"""
-    return f'reports_{username}.json'
+# 変更の取得でlimit未指定時に1ページに返す件数
+CHANGES_PAGE_SIZE = 500
+
+def parse_limit():
+    """クエリパラメータのlimitを取得（未指定の場合はNone、不正な値の場合はValueError）"""
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limitは整数で指定してください')
+        if limit < 1:
+            raise ValueError('limitは1以上で指定してください')
+    return limit
+
+def parse_report_query():
+    """日報一覧の検索条件をクエリパラメータから取得（不正な値の場合はValueError）"""
+    return {
+        'date_from': request.args.get('from') or None,
+        'date_to': request.args.get('to') or None,
+        'project_id': request.args.get('project_id') or None,
+        'limit': parse_limit(),
+        'cursor': request.args.get('cursor') or None
+    }
+
+def query_reports_response(usernames, query, include_username):
+    """検索条件に一致する日報を新しい順に返す"""
+    try:
+        reports, next_cursor = report_store.query_reports(usernames, **query)
+    except ValueError:
+        return jsonify({'error': 'cursorが不正です'}), 400
+    
+    if not include_username:
+        for report in reports:
+            report.pop('username', None)
+    
+    return jsonify({'reports': reports, 'next_cursor': next_cursor})
 
 @bp.route('/', methods=['GET'])
 @login_required
 def get_reports():
-    """日報一覧取得"""
+    """日報一覧取得（from, to, project_id, limit, cursorで絞り込み・ページング）"""
     username = session.get('username')
-    reports = load_json(get_user_reports_filename(username))
     
-    if 'reports' not in reports:
-        reports['reports'] = []
+    # 他のユーザーの日報はadminのみ参照可能
+    target_username = request.args.get('username') or username
+    if target_username != username and session.get('role') != 'admin':
+        return jsonify({'error': '管理者権限が必要です'}), 403
     
-    # 日付でソート（新しい順）
-    reports['reports'].sort(key=lambda x: x.get('date', ''), reverse=True)
+    try:
+        query = parse_report_query()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify(reports)
+    # 日報ファイルが更新されていなければ読み込まずに304を返す
+    etag = make_etag(report_store.report_file_versions(target_username),
+                     target_username, query)
+    return conditional_response(etag, lambda: query_reports_response([target_username], query, include_username=False))
 
 @bp.route('/add', methods=['POST'])
 @login_required
@@ -33,11 +74,6 @@ def add_report():
     username = session.get('username')
     data = request.get_json()
     
-    reports = load_json(get_user_reports_filename(username))
-    
-    if 'reports' not in reports:
-        reports['reports'] = []
-    
     new_report = {
         'id': str(uuid.uuid4()),
         'date': data.get('date'),
@@ -47,8 +83,7 @@ def add_report():
         'updated_at': datetime.now().isoformat()
     }
     
-    reports['reports'].append(new_report)
-    save_json(get_user_reports_filename(username), reports)
+    report_store.add_report(username, new_report)
     
     return jsonify({'success': True, 'report': new_report})
 
@@ -60,20 +95,19 @@ def update_report():
     data = request.get_json()
     report_id = data.get('id')
     
-    reports = load_json(get_user_reports_filename(username))
-    
-    for i, report in enumerate(reports.get('reports', [])):
-        if report['id'] == report_id:
-            reports['reports'][i] = {
-                'id': report_id,
-                'date': data.get('date', report['date']),
-                'projects': data.get('projects', report.get('projects', [])),
-                'work_items': data.get('work_items', report.get('work_items', [])),  # 旧形式との互換性のため保持
-                'created_at': report.get('created_at'),
-                'updated_at': datetime.now().isoformat()
-            }
-            save_json(get_user_reports_filename(username), reports)
-            return jsonify({'success': True, 'report': reports['reports'][i]})
+    def apply_update(report):
+        return {
+            'id': report_id,
+            'date': data.get('date', report['date']),
+            'projects': data.get('projects', report.get('projects', [])),
+            'work_items': data.get('work_items', report.get('work_items', [])),  # 旧形式との互換性のため保持
+            'created_at': report.get('created_at'),
+            'updated_at': datetime.now().isoformat()
+        }
+    
+    updated_report = report_store.update_report(username, report_id, apply_update)
+    if updated_report is not None:
+        return jsonify({'success': True, 'report': updated_report})
     
     return jsonify({'error': '日報が見つかりません'}), 404
 
@@ -85,44 +119,127 @@ def delete_report():
     data = request.get_json()
     report_id = data.get('id')
     
-    reports = load_json(get_user_reports_filename(username))
-    
-    reports['reports'] = [r for r in reports.get('reports', []) if r['id'] != report_id]
-    save_json(get_user_reports_filename(username), reports)
+    report_store.delete_report(username, report_id)
     
     return jsonify({'success': True})
 
+@bp.route('/changes', methods=['GET'])
+@login_required
+def get_changes():
+    """sinceの位置より後に追加・更新・削除された日報の取得（since, limit、adminはusernameで絞り込み）
+
+    削除された日報は deleted=True、report=None の墓標として返す。
+    sinceには前回のsync_tokenを指定する（since=latestの場合は変更を返さず、現在の位置だけを返す）。
+    next_cursorがある場合は続きがあるため、next_cursorをsince（またはcursor）に指定して取得する。
+    """
+    username = session.get('username')
+    is_admin = session.get('role') == 'admin'
+    
+    # 他のユーザーの変更はadminのみ参照可能（adminはusername未指定で全ユーザー）
+    target_username = request.args.get('username') or None
+    if not is_admin:
+        if target_username and target_username != username:
+            return jsonify({'error': '管理者権限が必要です'}), 403
+        usernames = [username]
+    elif target_username:
+        usernames = [target_username]
+    else:
+        usernames = list(load_json('users.json').keys())
+    
+    try:
+        limit = parse_limit() or CHANGES_PAGE_SIZE
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    since = request.args.get('cursor') or request.args.get('since') or None
+    if since == 'latest':
+        return jsonify({'changes': [], 'next_cursor': None, 'sync_token': report_store.latest_sync_token(usernames)})
+    
+    try:
+        changes, sync_token, has_more = report_store.query_changes(usernames, since=since, limit=limit)
+    except ValueError:
+        return jsonify({'error': 'sinceが不正です'}), 400
+    
+    if not is_admin:
+        for change in changes:
+            change.pop('username', None)
+    
+    return jsonify({'changes': changes, 'next_cursor': sync_token if has_more else None, 'sync_token': sync_token})
+
+def summary_response(params):
+    """集計表から工数の一覧を返す"""
+    group = params['group']
+    target_username = params['username']
+    try:
+        rows = report_rollups.summarize(
+            group,
+            usernames=[target_username] if target_username else None,
+            project_id=params['project_id'],
+            work_type_id=params['work_type_id'],
+            date_from=params['date_from'],
+            date_to=params['date_to']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'group': group, 'rows': rows})
+
+@bp.route('/summary', methods=['GET'])
+@login_required
+def get_summary():
+    """工数の集計取得（group=user_day|project_item|project_day、username, project_id, work_type_id, from, toで絞り込み）
+
+    user_day以外とusername未指定の全ユーザー分はadminのみ参照可能
+    """
+    username = session.get('username')
+    is_admin = session.get('role') == 'admin'
+    group = request.args.get('group', 'user_day')
+    target_username = request.args.get('username') or None
+    if not is_admin:
+        if group != 'user_day' or (target_username and target_username != username):
+            return jsonify({'error': '管理者権限が必要です'}), 403
+        target_username = username
+    
+    params = {
+        'group': group,
+        'username': target_username,
+        'project_id': request.args.get('project_id') or None,
+        'work_type_id': request.args.get('work_type_id') or None,
+        'date_from': request.args.get('from') or None,
+        'date_to': request.args.get('to') or None
+    }
+    # 集計対象の集計表が更新されていなければ読み込まずに304を返す
+    etag = make_etag(report_rollups.summary_versions(group, [target_username] if target_username else None,
+                                                     params['project_id']), params)
+    return conditional_response(etag, lambda: summary_response(params))
+
 @bp.route('/date/<date>', methods=['GET'])
 @login_required
 def get_report_by_date(date):
     """特定日付の日報取得"""
     username = session.get('username')
-    reports = load_json(get_user_reports_filename(username))
-    
-    date_reports = [r for r in reports.get('reports', []) if r.get('date') == date]
-    
-    return jsonify({'reports': date_reports})
+    etag = make_etag(report_store.report_file_versions(username), username, date)
+    return conditional_response(etag, lambda: jsonify({'reports': report_store.get_reports_by_date(username, date)}))
 
 @bp.route('/all', methods=['GET'])
 @admin_required
 def get_all_reports():
-    """全ユーザーの日報一覧取得（admin専用）"""
-    all_reports = []
-    users = load_json('users.json')
-    
-    # 全ユーザーの日報ファイルを読み込む
-    for username in users.keys():
-        reports_filename = get_user_reports_filename(username)
-        user_reports = load_json(reports_filename)
-        if user_reports:  # ファイルが存在する場合（空でない場合）
-            for report in user_reports.get('reports', []):
-                # ユーザー名を追加
-                report_with_username = report.copy()
-                report_with_username['username'] = username
-                all_reports.append(report_with_username)
+    """全ユーザーの日報一覧取得（admin専用、username, from, to, project_id, limit, cursorで絞り込み・ページング）"""
+    try:
+        query = parse_report_query()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # 日付でソート（新しい順）
-    all_reports.sort(key=lambda x: x.get('date', ''), reverse=True)
-    
-    return jsonify({'reports': all_reports})
-
+    users = load_json('users.json')
+    usernames = list(users.keys())
+    
+    # ユーザー指定時はそのユーザーの日報ファイルだけを読み込む
+    username = request.args.get('username')
+    if username:
+        usernames = [u for u in usernames if u == username]
+    
+    versions = get_cached_versions(['users.json'])
+    for u in usernames:
+        versions += report_store.report_file_versions(u)
+    etag = make_etag(versions, usernames, query)
+    return conditional_response(etag, lambda: query_reports_response(usernames, query, include_username=True))
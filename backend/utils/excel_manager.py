@@ -1,12 +1,183 @@
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 import uuid
+from backend.utils.leadtime import LeadtimeIndex
+from backend.utils.report_facts import ReportFacts
+from backend.utils.work_item_tree import WorkItemTree
+
+# エクスポートはwrite-onlyモードで行単位に書き出し、この容量まではメモリ上、超えると一時ファイルに退避する
+EXCEL_SPOOL_MAX_BYTES = int(os.environ.get('EXCEL_SPOOL_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# 工程ごとのシートの行を別プロセスで並列に計算する場合のプロセス数（0または1で無効）
+EXCEL_EXPORT_PROCESSES = int(os.environ.get('EXCEL_EXPORT_PROCESSES', '0'))
+
+# 共通スタイル（セルごとに生成せず使い回す）
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HEADER_FONT = Font(color="FFFFFF", bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+GREEN_FILL = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+
+def save_workbook_to_stream(wb):
+    """ブックを保存したストリームを返す（送信後にcloseすると自動的に削除される）"""
+    stream = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_BYTES)
+    try:
+        wb.save(stream)
+    except Exception:
+        stream.close()
+        raise
+    stream.seek(0)
+    return stream
+
+def _header_row(ws, values):
+    """スタイル付きのヘッダー行を作成"""
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        cell.alignment = HEADER_ALIGNMENT
+        row.append(cell)
+    return row
+
+def _filled_cell(ws, value, fill):
+    """塗りつぶし付きのセルを作成"""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.fill = fill
+    return cell
+
+class _FilledValue(NamedTuple):
+    """緑色に塗りつぶすセルの値（計算した行をシートに書き出す際にセルに変換する）"""
+    value: Any
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+def _get_process_pool():
+    """シートの行を計算するプロセスプールを取得（初回呼び出し時に作成）
+
+    エクスポートジョブのスレッドから呼ばれるため、ロックを取って1つだけ作成する。
+    マルチスレッドのプロセスをforkすると子プロセスがロックを保持したまま停止し得るため、spawnで起動する。
+    """
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=EXCEL_EXPORT_PROCESSES,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+@atexit.register
+def _shutdown_process_pool():
+    """プロセス終了時にプロセスプールを終了"""
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+
+def _map_sheet_rows(func, args_list):
+    """工程ごとのシートの行を計算（EXCEL_EXPORT_PROCESSESが2以上でシートが複数の場合はプロセスプールで並列に計算）
+
+    結果はargs_listの順に返すため、行の内容と順序は逐次計算と同じになる。
+    """
+    if EXCEL_EXPORT_PROCESSES > 1 and len(args_list) > 1:
+        return list(_get_process_pool().map(func, *zip(*args_list)))
+    return [func(*args) for args in args_list]
+
+def _append_rows(ws, rows):
+    """計算した行をシートに書き出す"""
+    for row in rows:
+        ws.append([_filled_cell(ws, value.value, GREEN_FILL) if isinstance(value, _FilledValue) else value
+                   for value in row])
+
+def _leaf_items_in_order(work_items, tree):
+    """最下層の項目のみをフィルタリング（元の順序を維持）"""
+    # work_itemsの順序を保持しながら、最下層項目のみを抽出
+    item_index_map = {item.get('id'): idx for idx, item in enumerate(work_items)}
+    leaf_items_with_index = []
+    for item in work_items:
+        if tree.is_leaf(item.get('id')):
+            leaf_items_with_index.append((item_index_map[item.get('id')], item))
+    
+    # 元のインデックス順でソート（登録順を維持）
+    return [item for _, item in sorted(leaf_items_with_index, key=lambda x: x[0])]
+
+def _date_matrix_rows(work_items, columns, dates_by_item):
+    """最下層の作業項目ごとに、列（ユーザーまたはプロジェクト）ごとの作業日を並べた行を計算
+
+    dates_by_item: {作業項目ID: {列のキー: [作業日]}}
+    """
+    # 作業項目の木構造（最下層判定・階層パス）
+    tree = WorkItemTree(work_items)
+    
+    rows = []
+    for item in _leaf_items_in_order(work_items, tree):
+        # 作業項目のパスを表示
+        row = [' > '.join(tree.path(item))]
+        
+        # 各列の日報データをセルに記入
+        dates_by_column = dates_by_item.get(item.get('id'), {})
+        for column in columns:
+            dates = dates_by_column.get(column)
+            if dates:
+                # 複数の日付がある場合はカンマ区切り、緑色に塗りつぶし
+                row.append(_FilledValue(', '.join(sorted(dates))))
+            else:
+                row.append('')
+        rows.append(row)
+    return rows
+
+def _detail_rows(work_items, report_records):
+    """詳細版の行（作業項目、作業の日付、工数、社内・社外リードタイム日数）を計算
+
+    report_records: 工程の日報のファクト（日報の順序）
+    """
+    # 作業項目の木構造（最下層判定・階層パス）
+    tree = WorkItemTree(work_items)
+    
+    # 日報データを整理（作業項目ID -> レコードのリスト）
+    # レコード: ReportFact(username, date, project_id, work_type_id, work_item_id, minutes, primary)
+    records_by_item = {}
+    for record in report_records:
+        records_by_item.setdefault(record.work_item_id, []).append(record)
+    
+    # リードタイム計算用の索引（作業項目ID -> 作業日の昇順配列）
+    leadtime_index = LeadtimeIndex((r.work_item_id, r.date) for r in report_records)
+    
+    rows = []
+    for item in _leaf_items_in_order(work_items, tree):
+        work_item_path = ' > '.join(tree.path(item))
+        
+        # この作業項目のレコードを取得
+        item_records = records_by_item.get(item.get('id'), [])
+        
+        if not item_records:
+            # レコードがない場合は作業項目名のみ表示
+            rows.append([work_item_path])
+            continue
+        
+        # 各レコードを行として出力
+        for record in sorted(item_records, key=lambda x: x.date):
+            # 作業項目、作業の日付、工数
+            row = [work_item_path, _FilledValue(record.date), record.minutes]
+            
+            # 社内・社外リードタイム日数（対象項目の直近の作業日からの日数）
+            internal_leadtime_days, external_leadtime_days = leadtime_index.item_leadtime_days(item, record.date)
+            row.append(internal_leadtime_days if internal_leadtime_days is not None else '')
+            row.append(external_leadtime_days if external_leadtime_days is not None else '')
+            rows.append(row)
+    return rows
 
 def export_work_items_to_excel(work_items):
     """作業項目をExcelにエクスポート"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "作業項目"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="作業項目")
     
     # ヘッダー行
     headers = [
@@ -15,49 +186,36 @@ def export_work_items_to_excel(work_items):
         '社外リードタイム', '社外リードタイムUUID', '担当種別'
     ]
     
-    # ヘッダーのスタイル
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # 階層パスを取得する関数
-    def get_hierarchy_path(item, all_items):
-        """項目の階層パス（レベル1から順に）を取得"""
-        path = []
-        current_item = item
-        while current_item:
-            path.insert(0, current_item.get('name', ''))
-            parent_id = current_item.get('parent_id')
-            if parent_id:
-                current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-            else:
-                break
-        return path
+    # 列幅の調整（write-onlyモードでは行の書き出し前に設定する）
+    ws.column_dimensions['A'].width = 36  # UUID
+    ws.column_dimensions['B'].width = 25  # レベル1
+    ws.column_dimensions['C'].width = 25  # レベル2
+    ws.column_dimensions['D'].width = 25  # レベル3
+    ws.column_dimensions['E'].width = 25  # レベル4
+    ws.column_dimensions['F'].width = 30  # チェックリスト
+    ws.column_dimensions['G'].width = 30  # 手段
+    ws.column_dimensions['H'].width = 15  # 属性
+    ws.column_dimensions['I'].width = 15  # 目標工数
+    ws.column_dimensions['J'].width = 15  # 社内リードタイム
+    ws.column_dimensions['K'].width = 40  # 社内リードタイムUUID
+    ws.column_dimensions['L'].width = 15  # 社外リードタイム
+    ws.column_dimensions['M'].width = 40  # 社外リードタイムUUID
+    ws.column_dimensions['N'].width = 20  # 担当種別
     
-    # 最下層の項目を判定する関数（子項目が存在しない = 最下層）
-    def is_leaf_item(item, all_items):
-        """項目が最下層かどうかを判定（子項目が存在しない = 最下層）"""
-        item_id = item.get('id')
-        # 子項目が存在するかチェック
-        has_children = any(i.get('parent_id') == item_id for i in all_items)
-        return not has_children
+    ws.append(_header_row(ws, headers))
     
     # 最下層の項目のみをフィルタリング
     items_list = work_items.get('items', []) if isinstance(work_items, dict) else work_items
-    leaf_items = [item for item in items_list if is_leaf_item(item, items_list)]
+    tree = WorkItemTree(items_list)
+    leaf_items = tree.leaf_items()
     
     # 階層順で並べ替え（深さ優先、同階層内は元の順序を維持）
     # まず、元のインデックスを取得するマップを作成
     item_index_map = {item.get('id'): idx for idx, item in enumerate(items_list)}
     
-    def get_hierarchy_key(item, all_items, index_map):
+    def get_hierarchy_key(item, index_map):
         """階層パスと元のインデックスをキーとして返す（並べ替え用）"""
-        path = get_hierarchy_path(item, all_items)
+        path = tree.path(item)
         # 階層パスをタプルとして返す
         key_parts = []
         for i in range(4):  # 最大4階層
@@ -72,67 +230,39 @@ def export_work_items_to_excel(work_items):
         return tuple(key_parts)
     
     # 階層パスと元のインデックスで並べ替え
-    leaf_items_sorted = sorted(leaf_items, key=lambda item: get_hierarchy_key(item, items_list, item_index_map))
+    leaf_items_sorted = sorted(leaf_items, key=lambda item: get_hierarchy_key(item, item_index_map))
     
     # データ行
-    row_idx = 2
     for item in leaf_items_sorted:
-        hierarchy_path = get_hierarchy_path(item, items_list)
+        hierarchy_path = tree.path(item)
         
-        ws.cell(row=row_idx, column=1, value=item.get('id', ''))  # UUID
+        row = [item.get('id', '')]  # UUID
         
         # レベル1-4に階層パスを設定
         for level in range(1, 5):
             if level <= len(hierarchy_path):
-                ws.cell(row=row_idx, column=level + 1, value=hierarchy_path[level - 1])
+                row.append(hierarchy_path[level - 1])
             else:
-                ws.cell(row=row_idx, column=level + 1, value='')
+                row.append('')
         
         # 残りの列（新しい順番）
-        col_idx = 6
-        ws.cell(row=row_idx, column=col_idx, value='\n'.join(item.get('checklist', [])))  # チェックリスト
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value='\n'.join(item.get('method', [])))  # 手段
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value=item.get('attribute', ''))  # 属性
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value=item.get('target_minutes', ''))  # 目標工数
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value='あり' if item.get('internal_leadtime') else 'なし')  # 社内リードタイム
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value=','.join(item.get('internal_leadtime_items', [])))  # 社内リードタイムUUID
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value='あり' if item.get('external_leadtime') else 'なし')  # 社外リードタイム
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value=','.join(item.get('external_leadtime_items', [])))  # 社外リードタイムUUID
-        col_idx += 1
-        ws.cell(row=row_idx, column=col_idx, value=','.join(item.get('担当種別', [])))  # 担当種別
-        
-        row_idx += 1
-    
-    # 列幅の調整
-    ws.column_dimensions['A'].width = 36  # UUID
-    ws.column_dimensions['B'].width = 25  # レベル1
-    ws.column_dimensions['C'].width = 25  # レベル2
-    ws.column_dimensions['D'].width = 25  # レベル3
-    ws.column_dimensions['E'].width = 25  # レベル4
-    ws.column_dimensions['F'].width = 30  # チェックリスト
-    ws.column_dimensions['G'].width = 30  # 手段
-    ws.column_dimensions['H'].width = 15  # 属性
-    ws.column_dimensions['I'].width = 15  # 目標工数
-    ws.column_dimensions['J'].width = 15  # 社内リードタイム
-    ws.column_dimensions['K'].width = 40  # 社内リードタイムUUID
-    ws.column_dimensions['L'].width = 15  # 社外リードタイム
-    ws.column_dimensions['M'].width = 40  # 社外リードタイムUUID
-    ws.column_dimensions['N'].width = 20  # 担当種別
+        row.append('\n'.join(item.get('checklist', [])))  # チェックリスト
+        row.append('\n'.join(item.get('method', [])))  # 手段
+        row.append(item.get('attribute', ''))  # 属性
+        row.append(item.get('target_minutes', ''))  # 目標工数
+        row.append('あり' if item.get('internal_leadtime') else 'なし')  # 社内リードタイム
+        row.append(','.join(item.get('internal_leadtime_items', [])))  # 社内リードタイムUUID
+        row.append('あり' if item.get('external_leadtime') else 'なし')  # 社外リードタイム
+        row.append(','.join(item.get('external_leadtime_items', [])))  # 社外リードタイムUUID
+        row.append(','.join(item.get('担当種別', [])))  # 担当種別
+        
+        ws.append(row)
     
     return wb
 
 def export_project_to_excel_detail(project, work_types, work_items_by_type, all_reports):
     """プロジェクトをExcelにエクスポート（詳細版：日付、工数、リードタイム日数）"""
-    from datetime import datetime
-    wb = Workbook()
-    wb.remove(wb.active)  # デフォルトのシートを削除
+    wb = Workbook(write_only=True)
     
     # プロジェクトに関連する工程を取得
     work_type_ids = project.get('work_type_ids', [])
@@ -142,7 +272,12 @@ def export_project_to_excel_detail(project, work_types, work_items_by_type, all_
     # プロジェクトIDを取得
     project_id = project.get('id')
     
-    # 各工程ごとにシートを作成
+    # 日報のファクト表（全日報を1回だけ走査）
+    facts = ReportFacts(all_reports)
+    
+    # シートを作成する工程と、各シートの行の計算に必要なデータ
+    sheet_work_types = []
+    sheet_args = []
     for work_type_id in work_type_ids:
         work_type = next((wt for wt in work_types if wt['id'] == work_type_id), None)
         if not work_type:
@@ -152,183 +287,32 @@ def export_project_to_excel_detail(project, work_types, work_items_by_type, all_
         if not work_items:
             continue
         
+        sheet_work_types.append(work_type)
+        sheet_args.append((work_items, facts.member_facts(project_id, work_type_id)))
+    
+    # 各工程ごとにシートを作成
+    for work_type, rows in zip(sheet_work_types, _map_sheet_rows(_detail_rows, sheet_args)):
         # シートを作成
         ws = wb.create_sheet(title=work_type['name'][:31])  # Excelのシート名は31文字まで
         
-        # ヘッダー行: 作業項目、作業の日付、工数、社内リードタイム日数、社外リードタイム日数
-        ws.cell(row=1, column=1, value='作業項目')
-        ws.cell(row=1, column=2, value='作業の日付')
-        ws.cell(row=1, column=3, value='工数（分）')
-        ws.cell(row=1, column=4, value='社内リードタイム日数')
-        ws.cell(row=1, column=5, value='社外リードタイム日数')
-        
-        # ヘッダーのスタイル
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True)
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for col in range(1, 6):
-            cell = ws.cell(row=1, column=col)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # 階層パスを取得する関数
-        def get_hierarchy_path(item, all_items):
-            """項目の階層パス（レベル1から順に）を取得"""
-            path = []
-            current_item = item
-            while current_item:
-                path.insert(0, current_item.get('name', ''))
-                parent_id = current_item.get('parent_id')
-                if parent_id:
-                    current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-                else:
-                    break
-            return path
-        
-        # 最下層の項目を判定する関数
-        def is_leaf_item(item, all_items):
-            """項目が最下層かどうかを判定"""
-            item_id = item.get('id')
-            has_children = any(i.get('parent_id') == item_id for i in all_items)
-            return not has_children
-        
-        # 最下層の項目のみをフィルタリング（元の順序を維持）
-        # work_itemsの順序を保持しながら、最下層項目のみを抽出
-        item_index_map = {item.get('id'): idx for idx, item in enumerate(work_items)}
-        leaf_items_with_index = []
-        for item in work_items:
-            if is_leaf_item(item, work_items):
-                leaf_items_with_index.append((item_index_map[item.get('id')], item))
-        
-        # 元のインデックス順でソート（登録順を維持）
-        leaf_items_sorted = [item for _, item in sorted(leaf_items_with_index, key=lambda x: x[0])]
-        
-        # 日報データを整理（作業項目ID -> レコードのリスト）
-        # レコード: {date, username, minutes, work_item_id}
-        report_records = []  # [{work_item_id, date, username, minutes}]
-        
-        for report in all_reports:
-            username = report.get('username')
-            if not username or username == 'admin':
-                continue
-            
-            # このプロジェクトの日報か確認
-            projects = report.get('projects', [])
-            project_data = next((p for p in projects if p.get('project_id') == project_id), None)
-            if not project_data:
-                continue
-            
-            report_date = report.get('date')
-            if not report_date:
-                continue
-            
-            # このプロジェクトの作業項目を確認
-            work_items_in_report = project_data.get('work_items', [])
-            for work_item in work_items_in_report:
-                work_item_id = work_item.get('work_item_id')
-                work_item_type_id = work_item.get('work_type_id')
-                
-                # この工程の作業項目のみを対象
-                if work_item_id and work_item_type_id == work_type_id:
-                    minutes = work_item.get('minutes', 0)
-                    report_records.append({
-                        'work_item_id': work_item_id,
-                        'date': report_date,
-                        'username': username,
-                        'minutes': minutes
-                    })
-        
-        # リードタイム対象項目の日付を取得する関数
-        def get_leadtime_target_date(target_work_item_id, current_date, all_records):
-            """リードタイム対象項目の日付を取得（現在の日付より前の最新の日付）"""
-            # 同じプロジェクト内のレコードのみを対象
-            target_dates = [
-                r['date'] for r in all_records
-                if r['work_item_id'] == target_work_item_id and r['date'] < current_date
-            ]
-            if not target_dates:
-                return None
-            return max(target_dates)  # 最新の日付
-        
-        # 日付の差分を計算する関数
-        def calculate_date_diff(date1_str, date2_str):
-            """日付の差分を日数で返す（date1 - date2）"""
-            try:
-                date1 = datetime.strptime(date1_str, '%Y-%m-%d')
-                date2 = datetime.strptime(date2_str, '%Y-%m-%d')
-                diff = (date1 - date2).days
-                return diff if diff >= 0 else None
-            except:
-                return None
-        
-        # データ行
-        row_idx = 2
-        green_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-        
-        for item in leaf_items_sorted:
-            work_item_id = item.get('id')
-            hierarchy_path = get_hierarchy_path(item, work_items)
-            work_item_path = ' > '.join(hierarchy_path)
-            
-            # この作業項目のレコードを取得
-            item_records = [r for r in report_records if r['work_item_id'] == work_item_id]
-            
-            if not item_records:
-                # レコードがない場合は作業項目名のみ表示
-                ws.cell(row=row_idx, column=1, value=work_item_path)
-                row_idx += 1
-            else:
-                # 各レコードを行として出力
-                for record in sorted(item_records, key=lambda x: x['date']):
-                    # 作業項目
-                    ws.cell(row=row_idx, column=1, value=work_item_path)
-                    
-                    # 作業の日付
-                    date_cell = ws.cell(row=row_idx, column=2, value=record['date'])
-                    date_cell.fill = green_fill
-                    
-                    # 工数
-                    ws.cell(row=row_idx, column=3, value=record['minutes'])
-                    
-                    # 社内リードタイム日数
-                    internal_leadtime_items = item.get('internal_leadtime_items', [])
-                    internal_leadtime_days = None
-                    if internal_leadtime_items and len(internal_leadtime_items) > 0:
-                        target_item_id = internal_leadtime_items[0]  # 最初の項目
-                        target_date = get_leadtime_target_date(target_item_id, record['date'], report_records)
-                        if target_date:
-                            internal_leadtime_days = calculate_date_diff(record['date'], target_date)
-                    
-                    ws.cell(row=row_idx, column=4, value=internal_leadtime_days if internal_leadtime_days is not None else '')
-                    
-                    # 社外リードタイム日数
-                    external_leadtime_items = item.get('external_leadtime_items', [])
-                    external_leadtime_days = None
-                    if external_leadtime_items and len(external_leadtime_items) > 0:
-                        target_item_id = external_leadtime_items[0]  # 最初の項目
-                        target_date = get_leadtime_target_date(target_item_id, record['date'], report_records)
-                        if target_date:
-                            external_leadtime_days = calculate_date_diff(record['date'], target_date)
-                    
-                    ws.cell(row=row_idx, column=5, value=external_leadtime_days if external_leadtime_days is not None else '')
-                    
-                    row_idx += 1
-        
-        # 列幅の調整
+        # 列幅の調整（write-onlyモードでは行の書き出し前に設定する）
         ws.column_dimensions['A'].width = 50  # 作業項目
         ws.column_dimensions['B'].width = 15  # 作業の日付
         ws.column_dimensions['C'].width = 12  # 工数
         ws.column_dimensions['D'].width = 18  # 社内リードタイム日数
         ws.column_dimensions['E'].width = 18  # 社外リードタイム日数
+        
+        # ヘッダー行: 作業項目、作業の日付、工数、社内リードタイム日数、社外リードタイム日数
+        ws.append(_header_row(ws, ['作業項目', '作業の日付', '工数（分）', '社内リードタイム日数', '社外リードタイム日数']))
+        
+        # データ行
+        _append_rows(ws, rows)
     
     return wb
 
 def export_project_to_excel(project, work_types, work_items_by_type, all_reports):
     """プロジェクトをExcelにエクスポート（工程別にシートを作成）"""
-    wb = Workbook()
-    wb.remove(wb.active)  # デフォルトのシートを削除
+    wb = Workbook(write_only=True)
     
     # プロジェクトに関連する工程を取得
     work_type_ids = project.get('work_type_ids', [])
@@ -338,22 +322,15 @@ def export_project_to_excel(project, work_types, work_items_by_type, all_reports
     # プロジェクトIDを取得
     project_id = project.get('id')
     
-    # このプロジェクトで作業しているユーザーのみを取得（admin以外）
-    users = set()
-    for report in all_reports:
-        username = report.get('username')
-        if not username or username == 'admin':
-            continue
-        
-        # このプロジェクトの日報があるか確認
-        projects = report.get('projects', [])
-        project_data = next((p for p in projects if p.get('project_id') == project_id), None)
-        if project_data:
-            users.add(username)
+    # 日報のファクト表（全日報を1回だけ走査）
+    facts = ReportFacts(all_reports)
     
-    users = sorted(list(users))
+    # このプロジェクトで作業しているユーザーのみを取得（admin以外）
+    users = facts.project_usernames(project_id)
     
-    # 各工程ごとにシートを作成
+    # シートを作成する工程と、各シートの行の計算に必要なデータ
+    sheet_work_types = []
+    sheet_args = []
     for work_type_id in work_type_ids:
         work_type = next((wt for wt in work_types if wt['id'] == work_type_id), None)
         if not work_type:
@@ -363,136 +340,55 @@ def export_project_to_excel(project, work_types, work_items_by_type, all_reports
         if not work_items:
             continue
         
+        # 日報データを整理（作業項目ID -> ユーザー -> 日付のマッピング）
+        report_map = {}  # {work_item_id: {username: [dates]}}
+        for fact in facts.member_facts(project_id, work_type_id):
+            report_map.setdefault(fact.work_item_id, {}).setdefault(fact.username, []).append(fact.date)
+        
+        sheet_work_types.append(work_type)
+        sheet_args.append((work_items, users, report_map))
+    
+    # 各工程ごとにシートを作成
+    for work_type, rows in zip(sheet_work_types, _map_sheet_rows(_date_matrix_rows, sheet_args)):
         # シートを作成
         ws = wb.create_sheet(title=work_type['name'][:31])  # Excelのシート名は31文字まで
         
-        # ヘッダー行: 作業項目、ユーザー名
-        ws.cell(row=1, column=1, value='作業項目')
+        # 列幅の調整（write-onlyモードでは行の書き出し前に設定する）
+        ws.column_dimensions['A'].width = 50  # 作業項目
         for col_idx, username in enumerate(users, 2):
-            ws.cell(row=1, column=col_idx, value=username)
-        
-        # ヘッダーのスタイル
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True)
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for col in range(1, len(users) + 2):
-            cell = ws.cell(row=1, column=col)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # 階層パスを取得する関数
-        def get_hierarchy_path(item, all_items):
-            """項目の階層パス（レベル1から順に）を取得"""
-            path = []
-            current_item = item
-            while current_item:
-                path.insert(0, current_item.get('name', ''))
-                parent_id = current_item.get('parent_id')
-                if parent_id:
-                    current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-                else:
-                    break
-            return path
-        
-        # 最下層の項目を判定する関数
-        def is_leaf_item(item, all_items):
-            """項目が最下層かどうかを判定"""
-            item_id = item.get('id')
-            has_children = any(i.get('parent_id') == item_id for i in all_items)
-            return not has_children
-        
-        # 最下層の項目のみをフィルタリング（元の順序を維持）
-        # work_itemsの順序を保持しながら、最下層項目のみを抽出
-        item_index_map = {item.get('id'): idx for idx, item in enumerate(work_items)}
-        leaf_items_with_index = []
-        for item in work_items:
-            if is_leaf_item(item, work_items):
-                leaf_items_with_index.append((item_index_map[item.get('id')], item))
-        
-        # 元のインデックス順でソート（登録順を維持）
-        leaf_items_sorted = [item for _, item in sorted(leaf_items_with_index, key=lambda x: x[0])]
+            ws.column_dimensions[get_column_letter(col_idx)].width = 20  # ユーザー列
         
-        # 日報データを整理（作業項目ID -> ユーザー -> 日付のマッピング）
-        report_map = {}  # {work_item_id: {username: [dates]}}
-        project_id = project.get('id')
-        
-        for report in all_reports:
-            username = report.get('username')
-            if not username or username == 'admin':
-                continue
-            
-            # このプロジェクトの日報か確認
-            projects = report.get('projects', [])
-            project_data = next((p for p in projects if p.get('project_id') == project_id), None)
-            if not project_data:
-                continue
-            
-            report_date = report.get('date')
-            if not report_date:
-                continue
-            
-            # このプロジェクトの作業項目を確認
-            work_items_in_report = project_data.get('work_items', [])
-            for work_item in work_items_in_report:
-                work_item_id = work_item.get('work_item_id')
-                work_item_type_id = work_item.get('work_type_id')
-                
-                # この工程の作業項目のみを対象
-                if work_item_id and work_item_type_id == work_type_id:
-                    if work_item_id not in report_map:
-                        report_map[work_item_id] = {}
-                    if username not in report_map[work_item_id]:
-                        report_map[work_item_id][username] = []
-                    report_map[work_item_id][username].append(report_date)
+        # ヘッダー行: 作業項目、ユーザー名
+        ws.append(_header_row(ws, ['作業項目'] + users))
         
         # データ行
-        row_idx = 2
-        green_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-        
-        for item in leaf_items_sorted:
-            work_item_id = item.get('id')
-            hierarchy_path = get_hierarchy_path(item, work_items)
-            work_item_path = ' > '.join(hierarchy_path)
-            
-            # 作業項目のパスを表示
-            ws.cell(row=row_idx, column=1, value=work_item_path)
-            
-            # 各ユーザーの日報データをセルに記入
-            for col_idx, username in enumerate(users, 2):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                
-                # この作業項目とユーザーに対応する日報があるか確認
-                if work_item_id in report_map and username in report_map[work_item_id]:
-                    dates = sorted(report_map[work_item_id][username])
-                    cell.value = ', '.join(dates)  # 複数の日付がある場合はカンマ区切り
-                    cell.fill = green_fill  # 緑色に塗りつぶし
-                else:
-                    cell.value = ''
-            
-            row_idx += 1
-        
-        # 列幅の調整
-        ws.column_dimensions['A'].width = 50  # 作業項目
-        for col_idx, username in enumerate(users, 2):
-            col_letter = ws.cell(row=1, column=col_idx).column_letter
-            ws.column_dimensions[col_letter].width = 20  # ユーザー列
+        _append_rows(ws, rows)
     
     return wb
 
-def import_work_items_from_excel(file_path):
-    """Excelから作業項目をインポート"""
-    wb = load_workbook(file_path, data_only=True)
-    ws = wb.active
-    
-    # 実際のデータがある行を取得（空行まで読み込む）
-    max_row = ws.max_row
-    
-    # ヘッダー行をスキップして、全行を読み込む
+def import_work_items_from_excel(file):
+    """Excelから作業項目をインポート（fileはファイルパスまたはアップロードされたストリーム）
+
+    read-onlyモードで先頭から1回だけ走査する。数式のセルは従来どおり数式ではなく、ファイルに保存されている
+    計算結果の値を読み込む（data_only=True。Excel以外で作成され計算結果が保存されていない場合は空になる）。
+    """
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        return _import_work_items_from_rows(wb.active.iter_rows(min_row=2, values_only=True))
+    finally:
+        wb.close()
+
+def _import_work_items_from_rows(rows):
+    """ヘッダー行を除いた行の値から作業項目を作成"""
     imported_items = []
     # 階層パスから親子関係を構築するためのマップ（階層パス -> 項目ID）
     hierarchy_map = {}
+    # 子項目を持つ項目IDの集合（最下層かどうかをO(1)で判定する）
+    parent_ids = set()
+    
+    def append_item(item):
+        imported_items.append(item)
+        parent_ids.add(item['parent_id'])
     
     def get_or_create_parent(parent_hierarchy, parent_level):
         """親項目を取得または作成"""
@@ -530,21 +426,14 @@ def import_work_items_from_excel(file_path):
             'is_leaf': False
         }
         
-        imported_items.append(parent_item)
+        append_item(parent_item)
         hierarchy_map[parent_key] = parent_uuid
         
         return parent_uuid
     
     # 行を順番に処理（全行を読み込む）
-    for row_num in range(2, max_row + 1):
-        try:
-            row_values = list(ws.iter_rows(min_row=row_num, max_row=row_num, values_only=True))
-            if not row_values:
-                continue
-            row = list(row_values[0]) if row_values else []
-        except:
-            # 行が存在しない場合はスキップ
-            continue
+    for row in rows:
+        row = list(row)
         
         # 行の長さを確認（少なくとも14列必要）
         if len(row) < 14:
@@ -634,7 +523,7 @@ def import_work_items_from_excel(file_path):
             if imported_items:
                 previous_item = imported_items[-1]
                 # 一つ前の項目が最下層項目であることを確認（子項目がない）
-                has_children = any(i.get('parent_id') == previous_item.get('id') for i in imported_items)
+                has_children = previous_item.get('id') in parent_ids
                 if not has_children:
                     internal_leadtime_items = [previous_item.get('id')]
         
@@ -643,7 +532,7 @@ def import_work_items_from_excel(file_path):
             if imported_items:
                 previous_item = imported_items[-1]
                 # 一つ前の項目が最下層項目であることを確認（子項目がない）
-                has_children = any(i.get('parent_id') == previous_item.get('id') for i in imported_items)
+                has_children = previous_item.get('id') in parent_ids
                 if not has_children:
                     external_leadtime_items = [previous_item.get('id')]
         
@@ -669,7 +558,7 @@ def import_work_items_from_excel(file_path):
             'is_leaf': True  # インポートされる行は全て最下層
         }
         
-        imported_items.append(item)
+        append_item(item)
         
         # 階層マップに登録
         hierarchy_key = tuple(hierarchy)
@@ -679,10 +568,14 @@ def import_work_items_from_excel(file_path):
 
 def export_project_view_to_excel(work_types, projects, work_items_by_type, all_reports):
     """プロジェクト別表示をExcelにエクスポート（工程ごとにシート、作業項目を行、プロジェクトを列）"""
-    wb = Workbook()
-    wb.remove(wb.active)  # デフォルトのシートを削除
+    wb = Workbook(write_only=True)
     
-    # 工程ごとにシートを作成
+    # 日報のファクト表（全日報を1回だけ走査）
+    facts = ReportFacts(all_reports)
+    
+    # シートを作成する工程と、各シートの行の計算に必要なデータ
+    sheets = []
+    sheet_args = []
     for work_type in work_types:
         work_type_id = work_type['id']
         work_items = work_items_by_type.get(work_type_id, [])
@@ -694,120 +587,30 @@ def export_project_view_to_excel(work_types, projects, work_items_by_type, all_r
         if not projects_with_work_type:
             continue
         
+        # 作業項目とプロジェクトのマッピングを作成（{workItemId: {projectId: [dates]}}）
+        # 管理者の日報や同じプロジェクトの2件目以降の項目も含める
+        work_item_project_map = {}
+        for project in projects_with_work_type:
+            for work_item_id, item_facts in facts.facts_by_item(project['id'], work_type_id).items():
+                work_item_project_map.setdefault(work_item_id, {})[project['id']] = [fact.date for fact in item_facts]
+        
+        sheets.append((work_type, projects_with_work_type))
+        sheet_args.append((work_items, [project['id'] for project in projects_with_work_type], work_item_project_map))
+    
+    # 工程ごとにシートを作成
+    for (work_type, projects_with_work_type), rows in zip(sheets, _map_sheet_rows(_date_matrix_rows, sheet_args)):
         # シートを作成
         ws = wb.create_sheet(title=work_type['name'][:31])  # Excelのシート名は31文字まで
         
-        # ヘッダー行: 作業項目、プロジェクト名
-        ws.cell(row=1, column=1, value='作業項目')
+        # 列幅の調整（write-onlyモードでは行の書き出し前に設定する）
+        ws.column_dimensions['A'].width = 50  # 作業項目
         for col_idx, project in enumerate(projects_with_work_type, 2):
-            ws.cell(row=1, column=col_idx, value=project['name'])
-        
-        # ヘッダーのスタイル
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True)
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for col in range(1, len(projects_with_work_type) + 2):
-            cell = ws.cell(row=1, column=col)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # 階層パスを取得する関数
-        def get_hierarchy_path(item, all_items):
-            """項目の階層パス（レベル1から順に）を取得"""
-            path = []
-            current_item = item
-            while current_item:
-                path.insert(0, current_item.get('name', ''))
-                parent_id = current_item.get('parent_id')
-                if parent_id:
-                    current_item = next((i for i in all_items if i.get('id') == parent_id), None)
-                else:
-                    break
-            return path
-        
-        # 最下層の項目を判定する関数
-        def is_leaf_item(item, all_items):
-            """項目が最下層かどうかを判定"""
-            item_id = item.get('id')
-            has_children = any(i.get('parent_id') == item_id for i in all_items)
-            return not has_children
-        
-        # 最下層の項目のみをフィルタリング（元の順序を維持）
-        # work_itemsの順序を保持しながら、最下層項目のみを抽出
-        item_index_map = {item.get('id'): idx for idx, item in enumerate(work_items)}
-        leaf_items_with_index = []
-        for item in work_items:
-            if is_leaf_item(item, work_items):
-                leaf_items_with_index.append((item_index_map[item.get('id')], item))
-        
-        # 元のインデックス順でソート（登録順を維持）
-        leaf_items_sorted = [item for _, item in sorted(leaf_items_with_index, key=lambda x: x[0])]
-        
-        # プロジェクトと作業項目のマッピングを作成（{projectId: {workItemId: [dates]}}）
-        project_work_item_map = {}
-        
-        for report in all_reports:
-            if not report.get('projects'):
-                continue
-            
-            report_date = report.get('date')
-            if not report_date:
-                continue
-            
-            for project_data in report['projects']:
-                project_id = project_data.get('project_id')
-                if project_id not in [p['id'] for p in projects_with_work_type]:
-                    continue
-                
-                if project_id not in project_work_item_map:
-                    project_work_item_map[project_id] = {}
-                
-                if not project_data.get('work_items'):
-                    continue
-                
-                for work_item in project_data['work_items']:
-                    work_item_id = work_item.get('work_item_id')
-                    work_item_type_id = work_item.get('work_type_id')
-                    
-                    # この工程の作業項目のみを対象
-                    if work_item_id and work_item_type_id == work_type_id:
-                        if work_item_id not in project_work_item_map[project_id]:
-                            project_work_item_map[project_id][work_item_id] = []
-                        project_work_item_map[project_id][work_item_id].append(report_date)
-        
-        # データ行
-        row_idx = 2
-        green_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+            ws.column_dimensions[get_column_letter(col_idx)].width = 25  # プロジェクト列
         
-        for item in leaf_items_sorted:
-            work_item_id = item.get('id')
-            hierarchy_path = get_hierarchy_path(item, work_items)
-            work_item_path = ' > '.join(hierarchy_path)
-            
-            # 作業項目のパスを表示
-            ws.cell(row=row_idx, column=1, value=work_item_path)
-            
-            # 各プロジェクトの日報データをセルに記入
-            for col_idx, project in enumerate(projects_with_work_type, 2):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                project_id = project['id']
-                
-                # この作業項目とプロジェクトに対応する日報があるか確認
-                if project_id in project_work_item_map and work_item_id in project_work_item_map[project_id]:
-                    dates = sorted(project_work_item_map[project_id][work_item_id])
-                    cell.value = ', '.join(dates)  # 複数の日付がある場合はカンマ区切り
-                    cell.fill = green_fill  # 緑色に塗りつぶし
-                else:
-                    cell.value = ''
-            
-            row_idx += 1
+        # ヘッダー行: 作業項目、プロジェクト名
+        ws.append(_header_row(ws, ['作業項目'] + [project['name'] for project in projects_with_work_type]))
         
-        # 列幅の調整
-        ws.column_dimensions['A'].width = 50  # 作業項目
-        for col_idx, project in enumerate(projects_with_work_type, 2):
-            col_letter = ws.cell(row=1, column=col_idx).column_letter
-            ws.column_dimensions[col_letter].width = 25  # プロジェクト列
+        # データ行
+        _append_rows(ws, rows)
     
     return wb
@@ -0,0 +1,125 @@
+"""生成済みExcelエクスポートのキャッシュ
+
+エクスポートが依存するJSONファイルのバージョンとパラメータからキーを計算し、
+生成したファイルをキーごとに保存する。依存するファイルのどれかが更新されるとキーが変わるため、
+明示的な無効化は不要で、古いファイルはサイズ上限を超えた時点で使われていない順に削除される。
+
+ファイルはプロセスごとの一時ディレクトリに保存し、合計サイズの上限は
+EXPORT_CACHE_MAX_BYTES（バイト、0でキャッシュ無効）で指定する。
+"""
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+
+from backend.utils.excel_manager import save_workbook_to_stream
+
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# キー -> ファイルサイズ（LRU順）
+_entries: 'OrderedDict[str, int]' = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+_cache_dir: Optional[str] = None
+
+
+def cache_key(kind: str, params: Dict[str, Any], versions: Iterable[Tuple[str, Optional[str]]]) -> str:
+    """エクスポートの種類・パラメータ・依存ファイルのバージョンからキャッシュキーを計算"""
+    source = json.dumps([kind, params, sorted(versions, key=lambda v: v[0])],
+                        ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _get_cache_dir() -> str:
+    """保存先ディレクトリを取得（初回呼び出し時に作成、_lockを取得して呼び出す）"""
+    global _cache_dir
+    if _cache_dir is None:
+        _cache_dir = tempfile.mkdtemp(prefix='export_cache_')
+    return _cache_dir
+
+
+def _path(key: str) -> str:
+    return os.path.join(_get_cache_dir(), f'{key}.xlsx')
+
+
+def _open_entry(key: str) -> Optional[BinaryIO]:
+    """キャッシュ済みのファイルを開く（_lockを取得して呼び出す）"""
+    if key not in _entries:
+        return None
+    try:
+        stream = open(_path(key), 'rb')
+    except FileNotFoundError:
+        _discard(key)
+        return None
+    _entries.move_to_end(key)
+    return stream
+
+
+def _discard(key: str):
+    """キャッシュからファイルを削除（_lockを取得して呼び出す）"""
+    global _total_bytes
+    size = _entries.pop(key, None)
+    if size is None:
+        return
+    _total_bytes -= size
+    try:
+        os.remove(_path(key))
+    except FileNotFoundError:
+        pass
+
+
+def _evict(keep: str):
+    """合計サイズが上限を超えている間、使われていない順に削除（_lockを取得して呼び出す）"""
+    for key in list(_entries):
+        if _total_bytes <= EXPORT_CACHE_MAX_BYTES:
+            break
+        if key != keep:
+            _discard(key)
+
+
+def open_or_build(key: str, build: Callable[[], Any]) -> BinaryIO:
+    """キャッシュ済みのエクスポートを開く（なければbuildでWorkbookを作成して保存）
+
+    呼び出し元は返されたストリームを閉じること（送信中にキャッシュから削除されても読み込みは続けられる）。
+    """
+    global _total_bytes
+    if EXPORT_CACHE_MAX_BYTES <= 0:
+        return save_workbook_to_stream(build())
+
+    with _lock:
+        stream = _open_entry(key)
+    if stream is not None:
+        return stream
+
+    wb = build()
+    with _lock:
+        cache_dir = _get_cache_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            wb.save(f)
+        size = os.path.getsize(tmp_path)
+        with _lock:
+            # 同じキーを並行して作成した場合は後から保存した方で置き換える
+            _discard(key)
+            os.replace(tmp_path, _path(key))
+            _entries[key] = size
+            _total_bytes += size
+            _evict(keep=key)
+            return open(_path(key), 'rb')
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@atexit.register
+def _remove_cache_dir():
+    """プロセス終了時に保存先ディレクトリを削除"""
+    if _cache_dir is not None:
+        shutil.rmtree(_cache_dir, ignore_errors=True)
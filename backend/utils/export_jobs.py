@@ -0,0 +1,170 @@
+"""Excelエクスポートのバックグラウンドジョブ
+
+エクスポートをリクエスト内で作成する代わりに、ジョブとして登録してスレッドプールで作成する。
+クライアントはジョブの状態を問い合わせ、完了後に結果ファイルをダウンロードする。
+
+- 同時に作成するジョブ数はEXPORT_JOB_WORKERS、待機中を含む未完了のジョブ数はEXPORT_JOB_MAX_PENDINGまで
+- 同じ内容（キー）のジョブが未完了の間は新しいジョブを作らず、そのジョブを返す
+- 完了したジョブと結果ファイルはEXPORT_JOB_TTL秒後に破棄する
+
+ジョブの状態と結果ファイルはプロセス内で管理するため、複数のワーカープロセスで起動した場合は
+ジョブを登録したプロセス以外から状態・結果を参照できない。これは意図的な制限で、
+ジョブのエンドポイントはgunicornを1ワーカー（--workers 1 --threads 8、Procfile・render.yaml）で
+起動した場合のみ使用できる。
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Hashable, Optional, Tuple
+
+EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', '2'))
+EXPORT_JOB_MAX_PENDING = int(os.environ.get('EXPORT_JOB_MAX_PENDING', '16'))
+EXPORT_JOB_TTL_SECONDS = float(os.environ.get('EXPORT_JOB_TTL', '600'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    """エクスポートジョブ1件"""
+    __slots__ = ('id', 'key', 'status', 'download_name', 'path', 'error', 'created_at', 'finished_at')
+
+    def __init__(self, key: Hashable):
+        self.id = str(uuid.uuid4())
+        self.key = key
+        self.status = QUEUED
+        self.download_name: Optional[str] = None
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filename': self.download_name,
+            'error': self.error,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+            'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None
+        }
+
+
+# ジョブID -> ジョブ、キー -> 未完了のジョブID
+_jobs: Dict[str, ExportJob] = {}
+_active_by_key: Dict[Hashable, str] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_result_dir: Optional[str] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """ジョブ用のスレッドプールを取得（初回呼び出し時に作成）"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(EXPORT_JOB_WORKERS, 1),
+                                               thread_name_prefix='export_job')
+    return _executor
+
+
+def _get_result_dir() -> str:
+    """結果ファイルの保存先ディレクトリを取得（初回呼び出し時に作成）"""
+    global _result_dir
+    with _lock:
+        if _result_dir is None:
+            _result_dir = tempfile.mkdtemp(prefix='export_jobs_')
+        return _result_dir
+
+
+def _remove_result(job: ExportJob):
+    if job.path:
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+        job.path = None
+
+
+def _purge_expired():
+    """期限切れの完了済みジョブを破棄（_lockを取得して呼び出す）"""
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at is not None and now - job.finished_at >= EXPORT_JOB_TTL_SECONDS:
+            _remove_result(job)
+            del _jobs[job_id]
+
+
+def _run(job: ExportJob, build: Callable[[], Tuple[BinaryIO, str]]):
+    """ジョブを実行（buildは (ファイルの読み込み用ストリーム, ダウンロード時のファイル名) を返す関数）"""
+    job.status = RUNNING
+    try:
+        stream, download_name = build()
+        path = os.path.join(_get_result_dir(), f'{job.id}.xlsx')
+        with stream, open(path, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        job.path = path
+        job.download_name = download_name
+        job.status = DONE
+    except Exception as e:
+        print(f"[export_jobs] エクスポートに失敗しました: {job.key}, エラー: {e}")
+        job.error = str(e) or 'エクスポートに失敗しました'
+        job.status = FAILED
+    finally:
+        job.finished_at = time.time()
+        with _lock:
+            if _active_by_key.get(job.key) == job.id:
+                del _active_by_key[job.key]
+
+
+def submit(key: Hashable, build: Callable[[], Tuple[BinaryIO, str]]) -> Optional[ExportJob]:
+    """ジョブを登録（同じキーのジョブが未完了ならそのジョブを返す、未完了のジョブが上限に達している場合はNone）"""
+    with _lock:
+        _purge_expired()
+        active_id = _active_by_key.get(key)
+        if active_id is not None:
+            return _jobs[active_id]
+        if len(_active_by_key) >= EXPORT_JOB_MAX_PENDING:
+            return None
+        job = ExportJob(key)
+        _jobs[job.id] = job
+        _active_by_key[key] = job.id
+    _get_executor().submit(_run, job, build)
+    return job
+
+
+def get_job(job_id: str) -> Optional[ExportJob]:
+    """ジョブを取得（存在しないか期限切れの場合はNone）"""
+    with _lock:
+        _purge_expired()
+        return _jobs.get(job_id)
+
+
+def open_result(job_id: str) -> Tuple[Optional[ExportJob], Optional[BinaryIO]]:
+    """ジョブと完了済みの結果ファイルの読み込み用ストリームを取得
+
+    期限切れの破棄（_purge_expired）と競合しないよう、結果ファイルは_lockを取得したまま開く。
+    開いたストリームは破棄後も読み込める。ジョブが未完了の場合のストリームはNone。
+    """
+    with _lock:
+        _purge_expired()
+        job = _jobs.get(job_id)
+        if job is None or job.status != DONE or job.path is None:
+            return job, None
+        return job, open(job.path, 'rb')
+
+
+@atexit.register
+def _remove_result_dir():
+    """プロセス終了時に結果ファイルの保存先ディレクトリを削除"""
+    if _result_dir is not None:
+        shutil.rmtree(_result_dir, ignore_errors=True)
@@ -0,0 +1,140 @@
+"""GETレスポンスの条件付きリクエスト（ETag / If-None-Match）対応と、シリアライズ済みレスポンスのキャッシュ
+
+ETagはレスポンスの元になるドキュメントのストレージ上のバージョンと、リクエストごとの条件
+（ユーザー・クエリパラメータなど）から計算する。バージョンはjson_managerのキャッシュ経由で取得するため、
+クライアントの持つ内容が最新であればドキュメントを読み込まず・JSONに変換せずに304を返せる。
+
+cache=Trueを指定したレスポンスは (エンドポイント, ETag) ごとにJSONに変換済みの本文を保持し、
+Accept-Encodingに応じてgzip（brotliがインストールされている場合はbrも）で圧縮した本文も保持する。
+キャッシュの合計サイズの上限はRESPONSE_CACHE_MAX_BYTES（バイト、0でキャッシュ無効）で指定する。
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# これより小さい本文は圧縮しない
+COMPRESS_MIN_BYTES = 1024
+
+# (エンドポイント, ETag) -> {'mimetype': MIMEタイプ, エンコーディング: 本文}（LRU順）
+_responses: 'OrderedDict[Tuple[str, str], Dict[str, Any]]' = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+
+def make_etag(versions: Iterable[Tuple[str, Optional[str]]], *params: Any) -> str:
+    """ドキュメントのバージョンとリクエストの条件からETagを計算"""
+    source = json.dumps([list(params), sorted(versions, key=lambda v: v[0])],
+                        ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _supported_encodings() -> Tuple[str, ...]:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    """圧縮した本文には別のETagを付ける（強いETagは表現ごとに異なる必要があるため）"""
+    return etag if encoding == 'identity' else f'{etag}-{encoding}'
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    return sum(len(v) for k, v in entry.items() if k != 'mimetype')
+
+
+def _cache_put(key: Tuple[str, str], encoding: str, body: bytes):
+    """本文をキャッシュに追加し、上限を超えた分を使われていない順に削除（_lockを取得して呼び出す）"""
+    global _total_bytes
+    entry = _responses.setdefault(key, {})
+    _total_bytes -= len(entry.get(encoding, b''))
+    entry[encoding] = body
+    _total_bytes += len(body)
+    _responses.move_to_end(key)
+    while _total_bytes > RESPONSE_CACHE_MAX_BYTES and _responses:
+        _, evicted = _responses.popitem(last=False)
+        _total_bytes -= _entry_size(evicted)
+
+
+def _cached_body(key: Tuple[str, str], encoding: str,
+                 build: Callable[[], Any]) -> Tuple[Any, str]:
+    """キャッシュからエンコーディングに対応する本文を取得（なければ作成して保存）
+
+    (本文またはエラー時のResponse, 実際のエンコーディング) を返す。
+    """
+    with _lock:
+        entry = _responses.get(key)
+        if entry is not None:
+            _responses.move_to_end(key)
+            entry = dict(entry)
+
+    if entry is None:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response, 'identity'
+        entry = {'mimetype': response.mimetype, 'identity': response.get_data()}
+        with _lock:
+            _responses.setdefault(key, {})['mimetype'] = entry['mimetype']
+            _cache_put(key, 'identity', entry['identity'])
+
+    if len(entry['identity']) < COMPRESS_MIN_BYTES:
+        encoding = 'identity'
+    body = entry.get(encoding)
+    if body is None:
+        body = _compress(entry['identity'], encoding)
+        with _lock:
+            if key in _responses:
+                _cache_put(key, encoding, body)
+    return current_app.response_class(body, mimetype=entry['mimetype']), encoding
+
+
+def conditional_response(etag: str, build: Callable[[], Any], cache: bool = False):
+    """If-None-MatchがETagと一致すれば304を、そうでなければbuild()の結果を返す
+
+    buildはビュー関数と同じ形式（dict、Response、(Response, ステータス)）を返す。
+    ETagは正常応答（200）にのみ付与する。cache=Trueの場合はJSONに変換・圧縮済みの本文をキャッシュから返す。
+    """
+    cache = cache and RESPONSE_CACHE_MAX_BYTES > 0
+    encoding = 'identity'
+    if cache:
+        encoding = request.accept_encodings.best_match(_supported_encodings(), default='identity')
+
+    # 小さい本文は圧縮せずに返しているため、圧縮なしのETagとも比較する
+    matched = next((tag for tag in (_encoded_etag(etag, encoding), etag) if request.if_none_match.contains(tag)), None)
+    if matched is not None:
+        response = current_app.response_class(status=304)
+        encoding = 'identity' if matched == etag else encoding
+    elif cache:
+        response, encoding = _cached_body((request.endpoint, etag), encoding, build)
+        if response.status_code != 200:
+            return response
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    else:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(_encoded_etag(etag, encoding))
+    # ブラウザは保存した内容を毎回ETagで再検証する（セッションごとに内容が異なるためCookieで区別）
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    if cache:
+        response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,112 @@
+"""JSONファイルの保存形式（エンコード）
+
+保存形式はJSON_CODECで指定する（ローカル・S3のJSONファイルが対象、SQLiteは対象外）。
+
+    pretty  … インデント付きのJSON（デフォルト、従来の形式）
+    compact … 空白を含まないJSON
+    gzip    … compactをgzipで圧縮
+    zstd    … compactをZstandardで圧縮（zstandardがインストールされていない場合はgzip）
+
+読み込み時は先頭のマジックバイトで圧縮の有無と方式を判別するため、形式を変更しても既存のファイルは
+そのまま読める。既存のファイルを現在の形式で保存し直す場合は python -m backend.utils.json_manager recode を実行する。
+追記する.ndjson（JSON Lines）は形式にかかわらず圧縮しない1行1レコードで保存する。
+"""
+import gzip
+import json
+import os
+from typing import Any, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = ('pretty', 'compact', 'gzip', 'zstd')
+JSON_CODEC = os.environ.get('JSON_CODEC', 'pretty').lower()
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_warned = False
+
+
+def is_lines(filename: str) -> bool:
+    """1行1レコードのJSON Lines形式（.ndjson）のファイルか"""
+    return filename.endswith('.ndjson')
+
+
+def dump_line(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def active_codec() -> str:
+    """実際に使用する保存形式（指定が不正な場合やzstandardがない場合は代わりの形式）"""
+    global _warned
+    codec = JSON_CODEC
+    if codec not in CODECS:
+        fallback = 'pretty'
+    elif codec == 'zstd' and zstandard is None:
+        fallback = 'gzip'
+    else:
+        return codec
+    if not _warned:
+        _warned = True
+        print(f"[json_codec] JSON_CODEC={codec} は使用できないため {fallback} で保存します")
+    return fallback
+
+
+def content_encoding(body: bytes) -> Optional[str]:
+    """本文の圧縮方式（S3のContent-Encodingに設定する値、圧縮していない場合はNone）"""
+    if body.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if body.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def encode(filename: str, data: Any) -> Tuple[bytes, str]:
+    """保存する内容を (本文, 保存形式) にエンコード"""
+    if is_lines(filename):
+        return ''.join(dump_line(record) for record in data).encode('utf-8'), 'ndjson'
+    codec = active_codec()
+    if codec == 'pretty':
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'), codec
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if codec == 'gzip':
+        # 同じ内容は同じ本文になるよう、ヘッダーの時刻は0にする
+        return gzip.compress(body, compresslevel=6, mtime=0), codec
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body), codec
+    return body, codec
+
+
+def _decompress(filename: str, body: bytes) -> bytes:
+    encoding = content_encoding(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError(f'Zstandardで圧縮されたファイルの読み込みにはzstandardが必要です: {filename}')
+        return zstandard.ZstdDecompressor().decompress(body)
+    return body
+
+
+def decode(filename: str, body: bytes) -> Any:
+    """ファイルの本文をデコード（.ndjsonは各行のレコードのリスト）"""
+    body = _decompress(filename, body)
+    if not is_lines(filename):
+        return json.loads(body)
+    lines = body.decode('utf-8').splitlines()
+    records = []
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # 追記の途中で中断された最終行は無視する
+            if i == len(lines) - 1:
+                print(f"[json_codec] 不完全な最終行を無視しました: {filename}")
+                break
+            raise
+    return records
@@ -1,39 +1,129 @@
-import json
 import os
-from typing import Any, Dict, Optional
+import pickle
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.utils import json_codec
+
+try:
+    import fcntl
+except ImportError:
+    # Windowsではプロセス間のファイルロックを使わない（同一プロセス内のロックのみ）
+    fcntl = None
 
 # S3設定
 USE_S3 = os.environ.get('USE_S3', 'false').lower() == 'true'
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'nohara-dairy-report-db')
 AWS_REGION = os.environ.get('AWS_REGION', 'ap-northeast-1')
 
+# SQLite設定（USE_SQLITE=trueの場合はUSE_S3より優先。パスはSQLITE_PATHで指定）
+USE_SQLITE = os.environ.get('USE_SQLITE', 'false').lower() == 'true'
+
 # ローカルデータディレクトリ（開発環境用）
 DATA_DIR = 'data'
 
+# 読み込みキャッシュ設定
+# JSON_CACHE_TTL: 最後の検証からこの秒数以内は再検証せずにキャッシュを返す（0で毎回検証）
+# JSON_CACHE_MAX_ENTRIES: キャッシュするファイル数の上限（LRU、0でキャッシュ無効）
+CACHE_TTL_SECONDS = float(os.environ.get('JSON_CACHE_TTL', '1'))
+CACHE_MAX_ENTRIES = int(os.environ.get('JSON_CACHE_MAX_ENTRIES', '256'))
+
+# transactionの設定
+# JSON_TRANSACTION_RETRIES: 保存が他の書き込みと競合した場合の再試行回数（S3・SQLite）
+# ローカルではファイルごとのロックファイルを DATA_DIR/.locks に作成する
+TRANSACTION_RETRIES = int(os.environ.get('JSON_TRANSACTION_RETRIES', '5'))
+LOCK_DIR = '.locks'
+
+# list_filesの結果のキャッシュ
+# JSON_LIST_CACHE_TTL: 同じプレフィックスの一覧をこの秒数以内はストレージに問い合わせずに返す（0でキャッシュ無効）
+# このプロセスでの保存で新しいファイルが作成された場合は、該当するプレフィックスの一覧に追加する
+LIST_CACHE_TTL_SECONDS = float(os.environ.get('JSON_LIST_CACHE_TTL', '5'))
+
 # S3クライアント（必要な場合のみ初期化）
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', '32'))
 _s3_client = None
+_s3_client_lock = threading.Lock()
+
+# load_manyでキャッシュにないファイルをS3から並列に読み込む際の並列数
+JSON_LOAD_WORKERS = int(os.environ.get('JSON_LOAD_WORKERS', '8'))
+_load_executor: Optional[ThreadPoolExecutor] = None
+_load_executor_lock = threading.Lock()
+
+
+class _CacheEntry:
+    """キャッシュエントリ（data_blobは呼び出し元に複製を渡すためのpickle）"""
+    __slots__ = ('data_blob', 'exists', 'version', 'checked_at')
+
+    def __init__(self, data: Any, exists: bool, version: Optional[str]):
+        self.data_blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL) if exists else None
+        self.exists = exists
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    def copy_data(self) -> Any:
+        return pickle.loads(self.data_blob)
+
+
+# ファイル名 -> _CacheEntry（LRU順）
+_cache: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+# プレフィックス -> (取得時刻, ファイル名の一覧)
+_listings: Dict[str, Tuple[float, List[str]]] = {}
+_listings_lock = threading.Lock()
+
+# ファイル名 -> transaction用のロック（同一プロセス内）
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+class ConflictError(Exception):
+    """transactionで読み込んだ後に、他の書き込みでファイルが更新されていた"""
+
 
 def get_s3_client():
-    """S3クライアントを取得（必要に応じて初期化）"""
+    """S3クライアントを取得（必要に応じて初期化）
+
+    boto3のクライアントはスレッドセーフなため、プロセス内で1つを共有し、
+    並列読み込みに備えてコネクションプールの上限をS3_MAX_POOL_CONNECTIONSで設定する。
+    """
     global _s3_client
     if _s3_client is None and USE_S3:
-        try:
-            import boto3
-            _s3_client = boto3.client(
-                's3',
-                region_name=AWS_REGION,
-                aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
-            )
-            print(f"[json_manager] S3クライアントを初期化しました: バケット={S3_BUCKET_NAME}, リージョン={AWS_REGION}")
-        except Exception as e:
-            print(f"[json_manager] S3クライアントの初期化に失敗しました: {e}")
-            raise
+        with _s3_client_lock:
+            if _s3_client is not None:
+                return _s3_client
+            try:
+                import boto3
+                from botocore.config import Config
+                _s3_client = boto3.client(
+                    's3',
+                    region_name=AWS_REGION,
+                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+                    config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+                )
+                print(f"[json_manager] S3クライアントを初期化しました: バケット={S3_BUCKET_NAME}, リージョン={AWS_REGION}")
+            except Exception as e:
+                print(f"[json_manager] S3クライアントの初期化に失敗しました: {e}")
+                raise
     return _s3_client
 
+def get_sqlite_store():
+    """SQLiteストレージを取得（初回のみスキーマ作成と初期データ取り込みを行う）"""
+    from backend.utils import sqlite_store
+    sqlite_store.initialize(DATA_DIR)
+    return sqlite_store
+
 def ensure_data_dir():
     """データディレクトリが存在することを確認（ローカル環境のみ）"""
-    if not USE_S3:
+    if not USE_S3 and not USE_SQLITE:
         if not os.path.exists(DATA_DIR):
             try:
                 os.makedirs(DATA_DIR, exist_ok=True)
@@ -42,123 +132,586 @@ def ensure_data_dir():
                 print(f"[json_manager] データディレクトリの作成に失敗しました: {e}, パス: {os.path.abspath(DATA_DIR)}")
                 raise
 
-def load_json(filename: str) -> Dict[str, Any]:
-    """JSONファイルを読み込む（S3またはローカル）"""
+# キャッシュ操作
+
+def _cache_get(filename: str) -> Optional[_CacheEntry]:
+    with _cache_lock:
+        entry = _cache.get(filename)
+        if entry is not None:
+            _cache.move_to_end(filename)
+        return entry
+
+def _cache_put(filename: str, entry: _CacheEntry):
+    if CACHE_MAX_ENTRIES <= 0:
+        return
+    with _cache_lock:
+        _cache[filename] = entry
+        _cache.move_to_end(filename)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+def invalidate_cache(filename: Optional[str] = None):
+    """キャッシュを破棄（filename未指定の場合はファイル一覧のキャッシュも含めて全て）"""
+    with _cache_lock:
+        if filename is None:
+            _cache.clear()
+        else:
+            _cache.pop(filename, None)
+    if filename is None:
+        with _listings_lock:
+            _listings.clear()
+
+def _listing_add(filename: str):
+    """保存したファイルを、キャッシュ済みのファイル一覧のうちプレフィックスが一致するものに追加"""
+    with _listings_lock:
+        for prefix, (checked_at, filenames) in _listings.items():
+            if filename.startswith(prefix) and filename not in filenames:
+                _listings[prefix] = (checked_at, sorted(filenames + [filename]))
+
+def _local_version(filepath: str) -> Optional[str]:
+    """ローカルファイルのバージョン（更新時刻とサイズ）を取得"""
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return f'{st.st_mtime_ns}-{st.st_size}'
+
+def _s3_error_code(e: Exception) -> str:
+    response = getattr(e, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code', ''))
+
+def get_version(filename: str) -> Optional[str]:
+    """ストレージ上のファイルのバージョンを取得（存在しない場合はNone）
+
+    ローカルでは更新時刻とサイズ、S3ではETag、SQLiteでは更新回数をバージョンとして扱う。
+    """
+    if USE_SQLITE:
+        return get_sqlite_store().document_version(filename)
     if USE_S3:
         try:
-            s3_client = get_s3_client()
-            response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=filename)
-            content = response['Body'].read().decode('utf-8')
-            return json.loads(content)
-        except s3_client.exceptions.NoSuchKey:
-            # ファイルが存在しない場合は空の辞書を返す
-            return {}
+            response = get_s3_client().head_object(Bucket=S3_BUCKET_NAME, Key=filename)
+            return response.get('ETag')
         except Exception as e:
-            print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
-            return {}
+            if _s3_error_code(e) in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+    ensure_data_dir()
+    return _local_version(os.path.join(DATA_DIR, filename))
+
+def _fetch(filename: str, cached: Optional[_CacheEntry]) -> _CacheEntry:
+    """ストレージから読み込む（キャッシュが有効な場合はそのまま返す）"""
+    if USE_SQLITE:
+        store = get_sqlite_store()
+        if cached is not None and cached.version == store.document_version(filename):
+            return cached
+        data, version = store.load_document(filename)
+        return _CacheEntry(data, version is not None, version)
+    if USE_S3:
+        s3_client = get_s3_client()
+        params = {'Bucket': S3_BUCKET_NAME, 'Key': filename}
+        if cached is not None and cached.exists:
+            # 条件付きGET: 変更がなければ304が返り、本文は転送されない
+            params['IfNoneMatch'] = cached.version
+        try:
+            response = s3_client.get_object(**params)
+        except Exception as e:
+            code = _s3_error_code(e)
+            if code in ('304', 'NotModified'):
+                return cached
+            if code in ('404', 'NoSuchKey'):
+                return _CacheEntry(None, False, None)
+            raise
+        # 圧縮の有無は本文のマジックバイトで判別する
+        data = json_codec.decode(filename, response['Body'].read())
+        return _CacheEntry(data, True, response.get('ETag'))
     else:
         # ローカルファイルシステム
         ensure_data_dir()
         filepath = os.path.join(DATA_DIR, filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        version = _local_version(filepath)
+        if cached is not None and cached.version == version:
+            return cached
+        if version is None:
+            return _CacheEntry(None, False, None)
+        with open(filepath, 'rb') as f:
+            data = json_codec.decode(filename, f.read())
+        # 読み込み中に書き換えられた場合に備え、読み込み前のバージョンを記録する
+        return _CacheEntry(data, True, version)
 
-def save_json(filename: str, data: Dict[str, Any]):
-    """JSONファイルに保存（S3またはローカル）"""
-    if USE_S3:
+def _load_fresh(filename: str) -> _CacheEntry:
+    """TTLにかかわらずストレージのバージョンを確認して読み込む（変更がなければキャッシュを返す）"""
+    entry = _fetch(filename, _cache_get(filename))
+    entry.checked_at = time.monotonic()
+    _cache_put(filename, entry)
+    return entry
+
+def _load_entry(filename: str) -> _CacheEntry:
+    """キャッシュ経由でキャッシュエントリを取得（TTL経過後は再検証）"""
+    cached = _cache_get(filename)
+    if cached is not None and time.monotonic() - cached.checked_at < CACHE_TTL_SECONDS:
+        return cached
+
+    entry = _fetch(filename, cached)
+    entry.checked_at = time.monotonic()
+    _cache_put(filename, entry)
+    return entry
+
+def _load_cached(filename: str, default_factory: Callable[[], Any]) -> Any:
+    """キャッシュ経由でJSONを読み込み、呼び出し元が変更可能な複製を返す"""
+    entry = _load_entry(filename)
+    return entry.copy_data() if entry.exists else default_factory()
+
+def _write_local(filepath: str, body: bytes):
+    """一時ファイルに書き込んでから置き換える（書き込み途中で中断されても元のファイルは壊れない）"""
+    # reports/{username}/{YYYY-MM}.json のような階層付きのファイル名に対応
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(filepath)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _store(filename: str, data: Any, conditional: bool = False,
+           expected_version: Optional[str] = None) -> Optional[str]:
+    """JSONを書き込み、キャッシュを新しい内容で更新（保存後のバージョンを返す）
+
+    conditional=Trueの場合は、ストレージ上のバージョンがexpected_versionと一致する場合のみ保存し
+    （Noneはファイルが存在しないこと）、一致しなければConflictErrorを送出する（S3・SQLite）。
+    """
+    if USE_SQLITE:
+        try:
+            store = get_sqlite_store()
+            if conditional:
+                version = store.save_document(filename, data, check_version=True, expected_version=expected_version)
+            else:
+                version = store.save_document(filename, data)
+        except Exception as e:
+            invalidate_cache(filename)
+            print(f"[json_manager] SQLiteへの保存に失敗しました: {filename}, エラー: {e}")
+            raise
+        if version is None:
+            invalidate_cache(filename)
+            raise ConflictError(filename)
+    elif USE_S3:
         try:
             s3_client = get_s3_client()
-            content = json.dumps(data, ensure_ascii=False, indent=2)
-            s3_client.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=filename,
-                Body=content.encode('utf-8'),
-                ContentType='application/json'
-            )
+            body, codec = json_codec.encode(filename, data)
+            params = {
+                'Bucket': S3_BUCKET_NAME,
+                'Key': filename,
+                'Body': body,
+                'ContentType': 'application/json',
+                'Metadata': {'json-codec': codec}
+            }
+            encoding = json_codec.content_encoding(body)
+            if encoding is not None:
+                params['ContentEncoding'] = encoding
+            if conditional:
+                # 条件付きPUT: 読み込んだ時点から更新されていれば412が返る
+                if expected_version is None:
+                    params['IfNoneMatch'] = '*'
+                else:
+                    params['IfMatch'] = expected_version
+            response = s3_client.put_object(**params)
+            version = response.get('ETag')
             print(f"[json_manager] S3に保存しました: {filename}")
         except Exception as e:
+            invalidate_cache(filename)
+            if _s3_error_code(e) in ('412', 'PreconditionFailed', '409', 'ConditionalRequestConflict'):
+                raise ConflictError(filename) from e
             print(f"[json_manager] S3への保存に失敗しました: {filename}, エラー: {e}")
             raise
     else:
         # ローカルファイルシステム
         ensure_data_dir()
         filepath = os.path.join(DATA_DIR, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        try:
+            _write_local(filepath, json_codec.encode(filename, data)[0])
+        except Exception:
+            invalidate_cache(filename)
+            raise
+        version = _local_version(filepath)
 
-def load_list_json(filename: str) -> list:
-    """JSONファイル（リスト形式）を読み込む（S3またはローカル）"""
+    if version is None:
+        invalidate_cache(filename)
+    else:
+        # 次回の読み込みはメモリから返す
+        _cache_put(filename, _CacheEntry(data, True, version))
+    _listing_add(filename)
+    return version
+
+@contextmanager
+def _file_lock(filename: str) -> Iterator[None]:
+    """ファイルごとのロックを取得（ローカルではロックファイルでプロセス間も排他する）"""
+    with _file_locks_lock:
+        lock = _file_locks.setdefault(filename, threading.Lock())
+    with lock:
+        if USE_S3 or USE_SQLITE or fcntl is None:
+            yield
+            return
+        ensure_data_dir()
+        lock_path = os.path.join(DATA_DIR, LOCK_DIR, filename.replace('/', '__') + '.lock')
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def transaction(filename: str, default_factory: Callable[[], Any] = dict) -> Iterator[Any]:
+    """ファイルの読み込み〜変更〜保存を他の書き込みと競合しないように行う
+
+        with transaction('projects.json') as projects:
+            projects['projects'].append(project)
+
+    ブロックを抜けると変更した内容を保存する（例外が発生した場合と、内容を変更しなかった場合は保存しない）。
+    ローカルではファイルごとのロック（プロセス間はロックファイル）を保存まで保持する。
+    S3・SQLiteでは読み込んだ時点のバージョンを条件に保存し、他の書き込みと競合した場合は
+    ConflictErrorを送出する（retry_on_conflictで処理全体をやり直す）。
+    同じファイルのtransactionを入れ子にしないこと。
+    """
+    with _file_lock(filename):
+        entry = _load_fresh(filename)
+        data = entry.copy_data() if entry.exists else default_factory()
+        yield data
+        if entry.exists:
+            if pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL) == entry.data_blob:
+                return
+        elif data == default_factory():
+            return
+        _store(filename, data, conditional=True, expected_version=entry.version if entry.exists else None)
+
+def _last_line_end(f: BinaryIO, end: int) -> int:
+    """ファイルの最後の改行の直後の位置を取得（改行がない場合は0）"""
+    position = end
+    while position > 0:
+        start = max(position - 4096, 0)
+        f.seek(start)
+        index = f.read(position - start).rfind(b'\n')
+        if index >= 0:
+            return start + index + 1
+        position = start
+    return 0
+
+def _append_local(filepath: str, records: List[Any]):
+    """ローカルのJSON Linesファイルの末尾に追記（_file_lockを取得して呼び出す）"""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'a+b') as f:
+        # 前回の追記が途中で中断されていた場合は不完全な最終行を削除する
+        # （改行を補うと読み込み時に最終行ではなくなり、ファイル全体が読めなくなるため）
+        end = f.tell()
+        if end > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.truncate(_last_line_end(f, end))
+        f.write(''.join(json_codec.dump_line(record) for record in records).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+
+@contextmanager
+def appending(filename: str) -> Iterator[Tuple[List[Any], Callable[[Any], None]]]:
+    """JSON Lines形式（.ndjson）のファイルに他の書き込みと競合しないように追記する
+
+        with appending('reports/user/journal.ndjson') as (records, append):
+            append({'op': 'put', ...})
+
+    recordsは現在の全レコード。ブロックを抜けるとappendしたレコードを保存する（例外時は保存しない）。
+    ローカルではロックを保持したままファイルの末尾に追記するため、書き込み量は追記した分だけになる。
+    S3・SQLiteでは追記できないため、読み込んだ時点のバージョンを条件に全体を保存する（競合時はConflictError）。
+    """
+    with _file_lock(filename):
+        entry = _load_fresh(filename)
+        records = entry.copy_data() if entry.exists else []
+        appended: List[Any] = []
+        yield records, appended.append
+        if not appended:
+            return
+        if USE_S3 or USE_SQLITE:
+            _store(filename, records + appended, conditional=True,
+                   expected_version=entry.version if entry.exists else None)
+            return
+        ensure_data_dir()
+        filepath = os.path.join(DATA_DIR, filename)
+        try:
+            _append_local(filepath, appended)
+        except Exception:
+            invalidate_cache(filename)
+            raise
+        _cache_put(filename, _CacheEntry(records + appended, True, _local_version(filepath)))
+        _listing_add(filename)
+
+def retry_on_conflict(func: Callable) -> Callable:
+    """ConflictErrorが発生した場合に関数を最初からやり直すデコレータ（JSON_TRANSACTION_RETRIES回まで）
+
+    やり直しても結果が変わらないよう、関数内の読み込みはtransaction内で行うこと。
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(TRANSACTION_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except ConflictError as e:
+                print(f"[json_manager] 保存が競合したため再試行します: {e}（{attempt + 1}回目）")
+                # 同時に再試行して再び競合しないよう、待ち時間をずらす
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        return func(*args, **kwargs)
+    return wrapper
+
+def update_json(filename: str, mutate: Callable[[Any], Any], default_factory: Callable[[], Any] = dict) -> Any:
+    """transaction内でmutate(内容)を実行して保存し、mutateの戻り値を返す（競合した場合は読み込みからやり直す）"""
+    @retry_on_conflict
+    def run():
+        with transaction(filename, default_factory) as data:
+            return mutate(data)
+    return run()
+
+def load_json(filename: str) -> Dict[str, Any]:
+    """JSONファイルを読み込む（S3またはローカル）"""
     if USE_S3:
         try:
-            s3_client = get_s3_client()
-            import botocore.exceptions
-            response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=filename)
-            content = response['Body'].read().decode('utf-8')
-            return json.loads(content)
-        except botocore.exceptions.ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code == 'NoSuchKey':
-                # ファイルが存在しない場合は空のリストを返す
-                return []
-            else:
-                print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
-                return []
+            return _load_cached(filename, dict)
         except Exception as e:
             print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
-            return []
-    else:
-        # ローカルファイルシステム
-        ensure_data_dir()
-        filepath = os.path.join(DATA_DIR, filename)
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+            return {}
+    return _load_cached(filename, dict)
 
-def save_list_json(filename: str, data: list):
-    """JSONファイル（リスト形式）に保存（S3またはローカル）"""
+def load_json_with_version(filename: str, revalidate: bool = False) -> Tuple[Dict[str, Any], Optional[str]]:
+    """JSONファイルを読み込み、内容とバージョンを返す（存在しない場合は({}, None)）
+
+    バージョンは読み込んだ内容に対応するため、内容から計算した値のキャッシュキーに使える。
+    revalidate=Trueの場合はTTL以内でもストレージのバージョンを確認する。
+    """
+    load = _load_fresh if revalidate else _load_entry
     if USE_S3:
         try:
-            s3_client = get_s3_client()
-            content = json.dumps(data, ensure_ascii=False, indent=2)
-            s3_client.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=filename,
-                Body=content.encode('utf-8'),
-                ContentType='application/json'
-            )
-            print(f"[json_manager] S3に保存しました: {filename}")
+            entry = load(filename)
         except Exception as e:
-            print(f"[json_manager] S3への保存に失敗しました: {filename}, エラー: {e}")
-            raise
+            print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
+            return {}, None
     else:
-        # ローカルファイルシステム
-        ensure_data_dir()
-        filepath = os.path.join(DATA_DIR, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        entry = load(filename)
+    if not entry.exists:
+        return {}, None
+    return entry.copy_data(), entry.version
 
-def list_files(prefix: str = '') -> list:
-    """指定されたプレフィックスで始まるファイルのリストを取得（S3またはローカル）"""
+def _get_load_executor() -> ThreadPoolExecutor:
+    """load_many用のスレッドプールを取得（プロセス内で共有）"""
+    global _load_executor
+    if _load_executor is None:
+        with _load_executor_lock:
+            if _load_executor is None:
+                _load_executor = ThreadPoolExecutor(max_workers=max(1, JSON_LOAD_WORKERS),
+                                                    thread_name_prefix='json-loader')
+    return _load_executor
+
+def load_many(filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """複数のJSONファイルをまとめて読み込む（ファイル名 -> 内容、存在しない場合は{}）
+
+    TTL以内のキャッシュはそのまま使い、それ以外のファイルはS3の場合は並列に読み込む
+    （条件付きGETのため、変更がなければ本文は転送されない）。
+    """
+    filenames = list(dict.fromkeys(filenames))
+    entries: Dict[str, _CacheEntry] = {}
+    stale = []
+    now = time.monotonic()
+    for filename in filenames:
+        cached = _cache_get(filename)
+        if cached is not None and now - cached.checked_at < CACHE_TTL_SECONDS:
+            entries[filename] = cached
+        else:
+            stale.append(filename)
+
+    def load(filename):
+        try:
+            return _load_entry(filename)
+        except Exception as e:
+            if not USE_S3:
+                raise
+            print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
+            return None
+
+    if USE_S3 and JSON_LOAD_WORKERS > 1 and len(stale) > 1:
+        loaded = list(_get_load_executor().map(load, stale))
+    else:
+        loaded = [load(filename) for filename in stale]
+    entries.update(zip(stale, loaded))
+
+    result = {}
+    for filename in filenames:
+        entry = entries[filename]
+        result[filename] = entry.copy_data() if entry is not None and entry.exists else {}
+    return result
+
+def get_cached_version(filename: str) -> Optional[str]:
+    """キャッシュ経由でファイルのバージョンを取得（TTL以内はストレージに問い合わせない、存在しない場合はNone）
+
+    TTL経過後はバージョンだけを問い合わせ（ローカルはstat、S3はHEAD）、本文は読み込まない。
+    """
+    cached = _cache_get(filename)
+    if cached is not None and time.monotonic() - cached.checked_at < CACHE_TTL_SECONDS:
+        return cached.version
+    version = get_version(filename)
+    if cached is not None and cached.version == version:
+        # キャッシュの内容が最新であることを確認できたため、次の読み込みは再検証しない
+        cached.checked_at = time.monotonic()
+    return version
+
+def get_cached_versions(filenames: Iterable[str]) -> List[Tuple[str, Optional[str]]]:
+    """複数ファイルの (ファイル名, バージョン) をキャッシュ経由で取得
+
+    TTL以内に確認していないファイルは、S3の場合はload_manyと同じスレッドプールで並列に問い合わせる
+    （HEADのみのため、キャッシュにないファイルも本文は転送されない）。
+    """
+    filenames = list(filenames)
+    now = time.monotonic()
+    stale = []
+    for filename in filenames:
+        cached = _cache_get(filename)
+        if cached is None or now - cached.checked_at >= CACHE_TTL_SECONDS:
+            stale.append(filename)
+
+    versions = {}
+    if USE_S3 and JSON_LOAD_WORKERS > 1 and len(stale) > 1:
+        versions.update(zip(stale, _get_load_executor().map(get_cached_version, stale)))
+    return [(filename, versions[filename] if filename in versions else get_cached_version(filename))
+            for filename in filenames]
+
+def save_json(filename: str, data: Dict[str, Any]) -> Optional[str]:
+    """JSONファイルに保存（S3またはローカル）し、保存後のバージョンを返す"""
+    return _store(filename, data)
+
+def load_list_json(filename: str) -> list:
+    """JSONファイル（リスト形式）を読み込む（S3またはローカル）"""
     if USE_S3:
         try:
-            s3_client = get_s3_client()
-            response = s3_client.list_objects_v2(
-                Bucket=S3_BUCKET_NAME,
-                Prefix=prefix
-            )
-            if 'Contents' in response:
-                return [obj['Key'] for obj in response['Contents']]
+            return _load_cached(filename, list)
+        except Exception as e:
+            print(f"[json_manager] S3からの読み込みに失敗しました: {filename}, エラー: {e}")
             return []
+    return _load_cached(filename, list)
+
+def save_list_json(filename: str, data: list) -> Optional[str]:
+    """JSONファイル（リスト形式）に保存（S3またはローカル）し、保存後のバージョンを返す"""
+    return _store(filename, data)
+
+def _list_s3(prefix: str) -> List[str]:
+    """S3のキーを全ページ取得（1回の応答は最大1000件のため、ページネーターで続きを取得する）"""
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    keys = []
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=prefix):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []))
+    return keys
+
+def _scan_local(directory: str, relative: str, name_prefix: str, filenames: List[str]):
+    """ローカルのディレクトリ以下のファイルを、S3のキーと同じ形式で再帰的に列挙（ロックファイル・一時ファイルを除く）"""
+    try:
+        entries = list(os.scandir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for entry in entries:
+        if entry.name.startswith('.') or not entry.name.startswith(name_prefix):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            _scan_local(entry.path, f'{relative}{entry.name}/', '', filenames)
+        else:
+            filenames.append(f'{relative}{entry.name}')
+
+def _list_local(prefix: str) -> List[str]:
+    ensure_data_dir()
+    directory, _, name_prefix = prefix.rpartition('/')
+    filenames: List[str] = []
+    _scan_local(os.path.join(DATA_DIR, directory), f'{directory}/' if directory else '', name_prefix, filenames)
+    return filenames
+
+def list_files(prefix: str = '') -> list:
+    """指定されたプレフィックスで始まるファイルのリストを取得（S3またはローカル、ファイル名順）
+
+    S3・ローカルともにサブディレクトリ（キーの / 以下）のファイルも含む。
+    一覧はプレフィックスごとにJSON_LIST_CACHE_TTL秒間キャッシュする。
+    """
+    with _listings_lock:
+        listing = _listings.get(prefix)
+    if listing is not None and time.monotonic() - listing[0] < LIST_CACHE_TTL_SECONDS:
+        return list(listing[1])
+
+    checked_at = time.monotonic()
+    if USE_SQLITE:
+        filenames = get_sqlite_store().list_documents(prefix)
+    elif USE_S3:
+        try:
+            filenames = _list_s3(prefix)
         except Exception as e:
             print(f"[json_manager] S3からのファイルリスト取得に失敗しました: {prefix}, エラー: {e}")
             return []
     else:
-        # ローカルファイルシステム
-        ensure_data_dir()
-        import glob
-        pattern = os.path.join(DATA_DIR, prefix + '*')
-        files = glob.glob(pattern)
-        return [os.path.basename(f) for f in files]
+        filenames = _list_local(prefix)
+    filenames = sorted(filenames)
+    if LIST_CACHE_TTL_SECONDS > 0:
+        with _listings_lock:
+            _listings[prefix] = (checked_at, filenames)
+    return list(filenames)
+
+def _read_raw(filename: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """ストレージ上の本文をデコードせずに (本文, バージョン) で取得（存在しない場合は (None, None)）"""
+    if USE_S3:
+        try:
+            response = get_s3_client().get_object(Bucket=S3_BUCKET_NAME, Key=filename)
+        except Exception as e:
+            if _s3_error_code(e) in ('404', 'NoSuchKey'):
+                return None, None
+            raise
+        return response['Body'].read(), response.get('ETag')
+    filepath = os.path.join(DATA_DIR, filename)
+    version = _local_version(filepath)
+    if version is None:
+        return None, None
+    with open(filepath, 'rb') as f:
+        return f.read(), version
+
+def recode_file(filename: str) -> bool:
+    """ファイルを現在の保存形式（JSON_CODEC）で保存し直す（保存し直した場合はTrue）"""
+    with _file_lock(filename):
+        raw, version = _read_raw(filename)
+        if raw is None:
+            return False
+        data = json_codec.decode(filename, raw)
+        if json_codec.encode(filename, data)[0] == raw:
+            return False
+        _store(filename, data, conditional=True, expected_version=version)
+    return True
+
+def recode_all() -> Tuple[int, int]:
+    """全てのJSONファイルを現在の保存形式で保存し直し、(保存し直した数, 対象のファイル数) を返す"""
+    filenames = [f for f in list_files('') if f.endswith('.json')]
+    recoded = 0
+    for filename in filenames:
+        try:
+            if recode_file(filename):
+                recoded += 1
+        except ConflictError:
+            # 読み込んだ後に他の書き込みで保存された場合は、その時点で現在の形式になっている
+            pass
+    return recoded, len(filenames)
+
+
+if __name__ == '__main__':
+    import sys
+    # python -m backend.utils.json_manager recode
+    if len(sys.argv) >= 2 and sys.argv[1] == 'recode':
+        if USE_SQLITE:
+            print('SQLiteではデータをデータベースに保存するため、保存形式の変更は不要です')
+            sys.exit(0)
+        recoded, total = recode_all()
+        print(f"{total}件のJSONファイルのうち{recoded}件を{json_codec.active_codec()}形式で保存し直しました")
+    else:
+        print('使い方: python -m backend.utils.json_manager recode')
+        sys.exit(1)
@@ -0,0 +1,68 @@
+"""リードタイム計算
+
+作業項目ごとの作業日を昇順の配列として索引化し、「ある日付より前の最新の作業日」を
+二分探索で求める。作業項目の社内/社外リードタイム日数（対象項目の直近の作業日からの経過日数）を
+Excelエクスポート以外からも同じ規則で計算できるようにする。
+"""
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+@lru_cache(maxsize=8192)
+def date_ordinal(date_str: str) -> Optional[int]:
+    """日付文字列（YYYY-MM-DD）を日数の序数に変換（解釈できない場合はNone）"""
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def days_between(date1_str: str, date2_str: str) -> Optional[int]:
+    """日付の差分を日数で返す（date1 - date2、負の場合や解釈できない場合はNone）"""
+    ordinal1 = date_ordinal(date1_str)
+    ordinal2 = date_ordinal(date2_str)
+    if ordinal1 is None or ordinal2 is None:
+        return None
+    diff = ordinal1 - ordinal2
+    return diff if diff >= 0 else None
+
+
+class LeadtimeIndex:
+    """作業項目ID -> 作業日（昇順）の索引"""
+
+    def __init__(self, records: Iterable[Tuple[Any, str]]):
+        """records: (作業項目ID, 作業日) の組"""
+        dates_by_item: Dict[Any, List[str]] = {}
+        for work_item_id, date in records:
+            dates_by_item.setdefault(work_item_id, []).append(date)
+        for dates in dates_by_item.values():
+            dates.sort()
+        self._dates = dates_by_item
+
+    def latest_before(self, work_item_id: Any, date: str) -> Optional[str]:
+        """作業項目の作業日のうち、dateより前の最新の日付（なければNone）"""
+        dates = self._dates.get(work_item_id)
+        if not dates:
+            return None
+        position = bisect_left(dates, date)
+        return dates[position - 1] if position > 0 else None
+
+    def days_since(self, target_work_item_id: Any, date: str) -> Optional[int]:
+        """対象項目のdateより前の最新の作業日からdateまでの日数（なければNone）"""
+        target_date = self.latest_before(target_work_item_id, date)
+        if not target_date:
+            return None
+        return days_between(date, target_date)
+
+    def item_leadtime_days(self, item: Dict[str, Any], date: str) -> Tuple[Optional[int], Optional[int]]:
+        """作業項目のdate時点の（社内リードタイム日数, 社外リードタイム日数）
+
+        リードタイム対象項目が複数ある場合は最初の項目を対象とする。
+        """
+        internal_items = item.get('internal_leadtime_items', [])
+        external_items = item.get('external_leadtime_items', [])
+        internal_days = self.days_since(internal_items[0], date) if internal_items else None
+        external_days = self.days_since(external_items[0], date) if external_items else None
+        return internal_days, external_days
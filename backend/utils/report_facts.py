@@ -0,0 +1,73 @@
+"""日報のファクト表
+
+日報（ユーザー > プロジェクト > 作業項目）を1回の走査で
+(ユーザー名, 日付, プロジェクトID, 工程ID, 作業項目ID, 工数) の行に展開し、
+プロジェクト・工程・作業項目で索引化する。エクスポートはシートごとに全日報を
+走査し直す代わりに、この索引から該当する行だけを取り出す。
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class ReportFact(NamedTuple):
+    """日報の作業項目1件"""
+    username: Optional[str]
+    date: str
+    project_id: Any
+    work_type_id: Any
+    work_item_id: Any
+    minutes: Any
+    # 日報内でこのプロジェクトIDを持つ最初のプロジェクト項目か
+    primary: bool
+
+
+def is_member_username(username: Optional[str]) -> bool:
+    """プロジェクト別のエクスポートに含めるユーザーか（管理者とユーザー名なしを除く）"""
+    return bool(username) and username != 'admin'
+
+
+class ReportFacts:
+    """日報のファクト表（日報の順序を保持する）"""
+
+    def __init__(self, reports: Iterable[Dict[str, Any]]):
+        self.facts: List[ReportFact] = []
+        # (プロジェクトID, 工程ID) -> ファクトのリスト
+        self._by_project_work_type: Dict[Tuple[Any, Any], List[ReportFact]] = {}
+        # (プロジェクトID, 工程ID) -> 作業項目ID -> ファクトのリスト
+        self._by_item: Dict[Tuple[Any, Any], Dict[Any, List[ReportFact]]] = {}
+        # プロジェクトID -> そのプロジェクトの日報があるユーザー名（日付の有無を問わない）
+        self.usernames_by_project: Dict[Any, Set[Optional[str]]] = {}
+
+        for report in reports:
+            username = report.get('username')
+            report_date = report.get('date')
+            seen_projects = set()
+            for project_data in report.get('projects') or []:
+                project_id = project_data.get('project_id')
+                self.usernames_by_project.setdefault(project_id, set()).add(username)
+                primary = project_id not in seen_projects
+                seen_projects.add(project_id)
+                if not report_date:
+                    continue
+                for work_item in project_data.get('work_items') or []:
+                    work_item_id = work_item.get('work_item_id')
+                    if not work_item_id:
+                        continue
+                    fact = ReportFact(username, report_date, project_id, work_item.get('work_type_id'),
+                                      work_item_id, work_item.get('minutes', 0), primary)
+                    key = (project_id, fact.work_type_id)
+                    self.facts.append(fact)
+                    self._by_project_work_type.setdefault(key, []).append(fact)
+                    self._by_item.setdefault(key, {}).setdefault(work_item_id, []).append(fact)
+
+    def project_usernames(self, project_id: Any) -> List[str]:
+        """プロジェクトの日報があるユーザー名（管理者を除く、名前順）"""
+        return sorted(u for u in self.usernames_by_project.get(project_id, ()) if is_member_username(u))
+
+    def facts_by_item(self, project_id: Any, work_type_id: Any) -> Dict[Any, List[ReportFact]]:
+        """プロジェクト・工程のファクトを作業項目IDごとに取得"""
+        return self._by_item.get((project_id, work_type_id), {})
+
+    def member_facts(self, project_id: Any, work_type_id: Any) -> List[ReportFact]:
+        """プロジェクト・工程のファクトのうち、管理者以外のユーザーの最初のプロジェクト項目のもの（日報の順序）"""
+        return [fact for fact in self._by_project_work_type.get((project_id, work_type_id), [])
+                if fact.primary and is_member_username(fact.username)]
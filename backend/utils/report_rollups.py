@@ -0,0 +1,342 @@
+"""日報の工数集計（ロールアップ）
+
+集計表は集計種別と最上位のキーごとに rollups/{集計種別}/{キー}.json に分けて保持する。
+
+    rollups/user_day/{ユーザー名}.json         … {'minutes': {日付: 工数}}
+    rollups/project_item/{プロジェクトID}.json … {'minutes': {工程ID: {作業項目ID: 工数}}}
+    rollups/project_day/{プロジェクトID}.json  … {'minutes': {日付: 工数}}
+
+工数はプロジェクトの作業項目のminutesの合計。日付のない日報はuser_day/project_dayに含めない。
+日報の追加・更新・削除では変更前後の日報の差分だけを集計表に反映する。
+
+- JSONファイル: 差分は日報と同じジャーナルの行（'rollups'）に記録し、追記の後に該当する集計表に反映する。
+  集計表はユーザーごとに反映済みのジャーナルの連番（applied）を持つため、反映の前に中断された差分は
+  同じ集計表への次の反映か、ジャーナルを月別ファイルに反映する時点で加えられる（二重には反映されない）。
+- SQLite: 日報の行と同じトランザクションで report_rollups テーブルに反映する。
+
+集計の取得は必要な集計表だけを読み込み、日報からは計算しない。集計表がない場合（rollups/manifest.json が
+ない場合）は全ての日報から作成する（python -m backend.utils.report_rollups rebuild で再構築、
+verify で保存内容と再計算結果を比較。いずれも日報の書き込みを止めて実行する）。
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from backend.utils import json_manager, report_store
+from backend.utils.json_manager import load_json, save_json, update_json
+
+DIMENSIONS = ('user_day', 'project_item', 'project_day')
+MANIFEST_FILENAME = 'rollups/manifest.json'
+
+# 最上位のキーが空（プロジェクトIDのない日報）の集計表のファイル名
+_EMPTY_KEY = '_none'
+
+# 集計表の行の差分 [集計種別, キー, 下位のキー..., 工数の増減]
+Diff = List[List[Any]]
+
+# 同一プロセス内での集計表の作成の重複を防ぐ
+_rebuild_lock = threading.Lock()
+
+
+def get_shard_filename(dimension: str, key: str) -> str:
+    """集計表のファイル名"""
+    return f"rollups/{dimension}/{quote(key, safe='') or _EMPTY_KEY}.json"
+
+
+def _shard_key(filename: str) -> str:
+    """集計表のファイル名から最上位のキーを取得"""
+    name = filename.rsplit('/', 1)[-1][:-len('.json')]
+    return '' if name == _EMPTY_KEY else unquote(name)
+
+
+def _to_minutes(value: Any) -> float:
+    """工数を数値に変換（解釈できない場合は0）"""
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        minutes = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return int(minutes) if minutes.is_integer() else minutes
+
+
+def _key(value: Any) -> str:
+    """集計表のキー（JSONのキーにするため文字列化し、Noneは空文字にする）"""
+    return '' if value is None else str(value)
+
+
+def report_contributions(username: str, report: Optional[Dict[str, Any]]) -> Dict[Tuple[str, ...], float]:
+    """日報1件が集計表に加える工数を (集計種別, キー...) -> 工数 で返す"""
+    contributions: Dict[Tuple[str, ...], float] = {}
+    if not report:
+        return contributions
+    report_date = report.get('date')
+    for project_data in report.get('projects') or []:
+        project_key = _key(project_data.get('project_id'))
+        for work_item in project_data.get('work_items') or []:
+            minutes = _to_minutes(work_item.get('minutes', 0))
+            if not minutes:
+                continue
+            keys = [('project_item', project_key, _key(work_item.get('work_type_id')),
+                     _key(work_item.get('work_item_id')))]
+            if report_date:
+                keys.append(('user_day', _key(username), report_date))
+                keys.append(('project_day', project_key, report_date))
+            for key in keys:
+                contributions[key] = contributions.get(key, 0) + minutes
+    return contributions
+
+
+def report_diff(username: str, old_report: Optional[Dict[str, Any]],
+                new_report: Optional[Dict[str, Any]]) -> Diff:
+    """日報の変更（追加はold_report=None、削除はnew_report=None）による集計表の差分"""
+    diff = report_contributions(username, new_report)
+    for key, minutes in report_contributions(username, old_report).items():
+        diff[key] = diff.get(key, 0) - minutes
+    return [list(key) + [minutes] for key, minutes in sorted(diff.items()) if minutes]
+
+
+def _diff_by_shard(diff: Iterable[List[Any]]) -> Dict[str, List[Tuple[Tuple[str, ...], Any]]]:
+    """差分を集計表のファイル名ごとに (下位のキー, 工数の増減) のリストにまとめる"""
+    by_shard: Dict[str, List[Tuple[Tuple[str, ...], Any]]] = {}
+    for dimension, key, *path, minutes in diff:
+        by_shard.setdefault(get_shard_filename(dimension, key), []).append((tuple(path), minutes))
+    return by_shard
+
+
+def shard_filenames(diff: Diff) -> List[str]:
+    """差分が対象とする集計表のファイル名"""
+    return sorted(_diff_by_shard(diff))
+
+
+def _sqlite_rows(diff: Diff) -> Dict[str, List[Tuple[str, str, Any]]]:
+    """差分をsqlite_storeの集計表の行（キー1, キー2, 工数の増減）に変換"""
+    return {filename: [(path[0], path[1] if len(path) > 1 else '', minutes) for path, minutes in changes]
+            for filename, changes in _diff_by_shard(diff).items()}
+
+
+def sqlite_rollup_diff(username: str):
+    """sqlite_storeの日報の書き込みに渡す、変更前後の日報から集計表の差分を求める関数"""
+    return lambda old_report, new_report: _sqlite_rows(report_diff(username, old_report, new_report))
+
+
+def _add(table: Dict[str, Any], path: Tuple[str, ...], minutes: Any):
+    """集計表に工数を加算し、0になったキーと空になった中間のキーは削除する"""
+    nodes = [table]
+    for part in path[:-1]:
+        nodes.append(nodes[-1].setdefault(part, {}))
+    total = nodes[-1].get(path[-1], 0) + minutes
+    if total:
+        nodes[-1][path[-1]] = total
+    else:
+        nodes[-1].pop(path[-1], None)
+    for node, part in zip(reversed(nodes[:-1]), reversed(path[:-1])):
+        if node.get(part):
+            break
+        node.pop(part, None)
+
+
+def _empty_shard() -> Dict[str, Any]:
+    return {'format': 'rollups', 'minutes': {}, 'applied': {}}
+
+
+def _load_manifest() -> Dict[str, Any]:
+    """集計表の作成時点の各ユーザーの反映済みの連番を取得（集計表がない場合は作成する）"""
+    manifest = load_json(MANIFEST_FILENAME)
+    if manifest.get('format') != 'rollups':
+        manifest = rebuild_rollups(force=False)
+    return manifest
+
+
+def apply_journal(username: str, events: Iterable[Dict[str, Any]], filenames: Optional[Iterable[str]] = None):
+    """ジャーナルの変更に記録された差分のうち、集計表に未反映のものを反映する
+
+    filenamesを指定した場合はその集計表だけを対象にする（省略時は差分を含む全ての集計表）。
+    """
+    pending: Dict[str, List[Tuple[int, Tuple[str, ...], Any]]] = {}
+    for event in events:
+        for filename, changes in _diff_by_shard(event.get('rollups', [])).items():
+            pending.setdefault(filename, []).extend((event['seq'], path, minutes) for path, minutes in changes)
+    if not pending:
+        return
+    base = _load_manifest().get('applied', {}).get(username, 0)
+
+    def apply(shard, changes):
+        if shard.get('format') != 'rollups':
+            shard.clear()
+            shard.update(_empty_shard())
+        applied = shard['applied'].get(username, base)
+        for seq, path, minutes in changes:
+            if seq > applied:
+                _add(shard['minutes'], path, minutes)
+        shard['applied'][username] = max([applied] + [seq for seq, _, _ in changes])
+
+    for filename in sorted(pending if filenames is None else set(filenames) & pending.keys()):
+        update_json(filename, lambda shard, changes=pending[filename]: apply(shard, changes))
+
+
+def compute_rollups(reports: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """(ユーザー名, 日報) の一覧から集計表を計算（集計表のファイル名 -> 集計表、保存はしない）"""
+    tables: Dict[str, Dict[str, Any]] = {}
+    for username, report in reports:
+        for filename, changes in _diff_by_shard(report_diff(username, None, report)).items():
+            table = tables.setdefault(filename, {})
+            for path, minutes in changes:
+                _add(table, path, minutes)
+    return {filename: table for filename, table in tables.items() if table}
+
+
+def _all_reports() -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, int]]:
+    """全ユーザーの日報と、読み込んだ時点の各ユーザーの最後の連番"""
+    reports = []
+    applied = {}
+    for username in sorted(load_json('users.json').keys()):
+        user_reports, applied[username] = report_store.load_user_reports_with_seq(username)
+        reports.extend((username, report) for report in user_reports)
+    return reports, applied
+
+
+def rebuild_rollups(force: bool = True) -> Dict[str, Any]:
+    """全ユーザーの日報から集計表を作り直して保存し、rollups/manifest.json の内容を返す
+
+    force=Falseの場合は集計表がまだない場合だけ作成する。
+    """
+    with _rebuild_lock:
+        if not force:
+            manifest = load_json(MANIFEST_FILENAME)
+            if manifest.get('format') == 'rollups':
+                return manifest
+        if json_manager.USE_SQLITE:
+            manifest = {'format': 'rollups'}
+            count = json_manager.get_sqlite_store().rebuild_rollups(
+                lambda reports: _sqlite_rows([row for username, report in reports
+                                              for row in report_diff(username, None, report)]),
+                MANIFEST_FILENAME, manifest)
+            json_manager.invalidate_cache()
+        else:
+            reports, applied = _all_reports()
+            tables = compute_rollups(reports)
+            manifest = {'format': 'rollups', 'applied': applied}
+            # 日報がなくなった集計表は空にする
+            for filename in set(_list_shards()) - tables.keys():
+                save_json(filename, dict(_empty_shard(), applied=applied))
+            for filename, table in tables.items():
+                save_json(filename, {'format': 'rollups', 'minutes': table, 'applied': applied})
+            save_json(MANIFEST_FILENAME, manifest)
+            count = len(tables)
+        print(f"[report_rollups] 集計表を作成しました: {count}ファイル")
+        return manifest
+
+
+def _list_shards(dimension: Optional[str] = None) -> List[str]:
+    """保存されている集計表のファイル名（dimension指定時はその集計種別だけ）"""
+    prefix = f'rollups/{dimension}/' if dimension else 'rollups/'
+    return [filename for filename in json_manager.list_files(prefix)
+            if filename != MANIFEST_FILENAME and filename.endswith('.json')]
+
+
+def _load_shard(filename: str) -> Dict[str, Any]:
+    """集計表の工数（{キー: 工数} または {工程ID: {作業項目ID: 工数}}）を取得"""
+    if json_manager.USE_SQLITE:
+        table: Dict[str, Any] = {}
+        nested = filename.startswith('rollups/project_item/')
+        for key1, key2, minutes in json_manager.get_sqlite_store().load_rollup(filename):
+            if nested:
+                table.setdefault(key1, {})[key2] = minutes
+            else:
+                table[key1] = minutes
+        return table
+    return load_json(filename).get('minutes', {})
+
+
+def _shard_filenames(group: str, keys: Optional[Iterable[str]]) -> List[str]:
+    """集計の対象になる集計表のファイル名（keysがNoneの場合は全て）"""
+    if keys is None:
+        return _list_shards(group)
+    return [get_shard_filename(group, key) for key in keys]
+
+
+def _summary_keys(group: str, usernames: Optional[Iterable[str]], project_id: Optional[str]) -> Optional[List[str]]:
+    if group == 'user_day':
+        return None if usernames is None else list(usernames)
+    return None if project_id is None else [project_id]
+
+
+def summary_versions(group: str, usernames: Optional[Iterable[str]] = None,
+                     project_id: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+    """集計の対象になる集計表のバージョン（集計のETag用、本文は読み込まない）"""
+    if group not in DIMENSIONS:
+        return []
+    _load_manifest()
+    filenames = _shard_filenames(group, _summary_keys(group, usernames, project_id))
+    return json_manager.get_cached_versions([MANIFEST_FILENAME] + filenames)
+
+
+def _in_range(date: str, date_from: Optional[str], date_to: Optional[str]) -> bool:
+    return (not date_from or date >= date_from) and (not date_to or date <= date_to)
+
+
+def summarize(group: str, usernames: Optional[Iterable[str]] = None,
+              project_id: Optional[str] = None, work_type_id: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    """集計表から工数の一覧を取得（usernames/project_idがNoneの場合は全件）
+
+    group: user_day (ユーザー×日付), project_item (プロジェクト×工程×作業項目), project_day (プロジェクト×日付)
+    指定されたユーザー・プロジェクトの集計表だけを読み込む。
+    """
+    if group not in DIMENSIONS:
+        raise ValueError(f'groupは{", ".join(DIMENSIONS)}のいずれかで指定してください')
+    _load_manifest()
+    keys = _summary_keys(group, usernames, project_id)
+    filenames = _shard_filenames(group, keys)
+    if keys is None:
+        filenames.sort(key=_shard_key)
+    rows = []
+    for filename in filenames:
+        key = _shard_key(filename)
+        table = _load_shard(filename)
+        if group == 'user_day':
+            for date, minutes in sorted(table.items()):
+                if _in_range(date, date_from, date_to):
+                    rows.append({'username': key, 'date': date, 'minutes': minutes})
+        elif group == 'project_day':
+            for date, minutes in sorted(table.items()):
+                if _in_range(date, date_from, date_to):
+                    rows.append({'project_id': key, 'date': date, 'minutes': minutes})
+        else:
+            work_type_ids = sorted(table) if work_type_id is None else [w for w in [work_type_id] if w in table]
+            for wt in work_type_ids:
+                for item_id, minutes in sorted(table[wt].items()):
+                    rows.append({'project_id': key, 'work_type_id': wt, 'work_item_id': item_id, 'minutes': minutes})
+    return rows
+
+
+def verify_rollups() -> List[str]:
+    """保存されている集計表と日報からの再計算結果を比較し、一致しない集計表のファイル名を返す"""
+    if json_manager.USE_SQLITE:
+        store = json_manager.get_sqlite_store()
+        expected = compute_rollups((username, report) for username in load_json('users.json').keys()
+                                   for report in store.load_reports(username))
+    else:
+        expected = compute_rollups(_all_reports()[0])
+    filenames = set(_list_shards()) | expected.keys()
+    return sorted(filename for filename in filenames if _load_shard(filename) != expected.get(filename, {}))
+
+
+if __name__ == '__main__':
+    import sys
+    # python -m backend.utils.report_rollups rebuild|verify
+    command = sys.argv[1] if len(sys.argv) >= 2 else None
+    if command == 'rebuild':
+        rebuild_rollups()
+    elif command == 'verify':
+        mismatched = verify_rollups()
+        if mismatched:
+            print(f"集計表が日報と一致しません: {', '.join(mismatched)}")
+            sys.exit(1)
+        print('集計表は日報と一致しています')
+    else:
+        print('使い方: python -m backend.utils.report_rollups rebuild|verify')
+        sys.exit(1)
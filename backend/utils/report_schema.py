@@ -0,0 +1,126 @@
+"""日報の保存形式（スキーマのバージョン）
+
+日報は画面から送られた形式（作業項目ごとに上位の項目IDを並べた hierarchy と、旧形式との互換性のための
+空の work_items を含む）のまま保存すると、作業項目1件ごとにUUIDが4つ重複して保存される。
+SCHEMA_VERSION（2）の日報は次の項目を省略して保存し、読み込み時に作業項目の木構造から復元する。
+
+    {'schema': 2, 'catalog_revision': 保存時のカタログのリビジョン, 'id', 'date', 'projects': [
+        {'project_id', 'work_items': [{'work_item_id', 'work_type_id', 'minutes', ...}]}], 'created_at', 'updated_at'}
+
+- hierarchy: 保存時点の作業項目の木構造から求めた階層と一致する場合のみ省略する
+  （作業項目が見つからない・階層が異なる場合はそのまま保存する）。保存後に作業項目が削除・移動された場合は、
+  カタログの階層の変更履歴（work_item_catalog の history）から保存時のリビジョンの階層を求める
+- work_items（日報直下）: 空の場合のみ省略する
+
+schemaのない日報（バージョン1）は読み込み時にそのまま返し、次に保存した時点でバージョン2になる。
+保存済みの日報をまとめて変換する場合は python -m backend.utils.report_store upgrade を実行する。
+"""
+import copy
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.utils import json_manager, work_item_catalog
+from backend.utils.work_item_tree import WorkItemTree
+
+SCHEMA_VERSION = 2
+
+
+class Trees(NamedTuple):
+    """カタログのリビジョン時点の作業項目の木構造と、階層の変更履歴"""
+    revision: int
+    by_work_type: Dict[Any, WorkItemTree]
+    history: Dict[str, Dict[str, List[List[Any]]]]
+
+
+# (カタログのバージョン, 作業項目の木構造)
+_trees: Optional[Tuple[Optional[str], Trees]] = None
+
+
+def _load_trees() -> Trees:
+    """全工程の作業項目の木構造を取得（カタログが更新されるまで前回の結果を使う）"""
+    global _trees
+    version = json_manager.get_cached_version(work_item_catalog.CATALOG_FILENAME)
+    trees = _trees
+    if trees is not None and version is not None and trees[0] == version:
+        return trees[1]
+
+    catalog, version = work_item_catalog.load_catalog()
+    by_work_type = {entry.get('work_type_id'): WorkItemTree(entry.get('items', []))
+                    for entry in catalog.get('files', {}).values()}
+    loaded = Trees(catalog.get('revision', 0), by_work_type, catalog.get('history', {}))
+    _trees = (version, loaded)
+    return loaded
+
+
+def _derive_hierarchy(trees: Trees, work_item: Dict[str, Any], revision: int) -> Optional[List[Any]]:
+    """カタログのリビジョンrevision時点の階層（レベル1から作業項目自身までのID）を求める
+
+    revisionより後に削除・移動された作業項目は変更前の階層を返す（見つからない場合はNone）。
+    """
+    entries = trees.history.get(str(work_item.get('work_type_id')), {}).get(work_item.get('work_item_id'), [])
+    for changed_at, path in entries:
+        if changed_at > revision:
+            return path
+    tree = trees.by_work_type.get(work_item.get('work_type_id'))
+    item = tree.get(work_item.get('work_item_id')) if tree is not None else None
+    return tree.id_path(item) if item is not None else None
+
+
+def _work_item_lists(report: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+    lists = [project.get('work_items') or [] for project in report.get('projects') or []]
+    return lists + [report.get('work_items') or []]
+
+
+def compact_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """日報を保存用の形式（バージョン2）に変換した複製を返す"""
+    trees = _load_trees()
+
+    def compact_items(items):
+        return [{k: v for k, v in item.items() if k != 'hierarchy'}
+                if 'hierarchy' in item and item['hierarchy'] == _derive_hierarchy(trees, item, trees.revision) else item
+                for item in items]
+
+    compacted = dict(report, schema=SCHEMA_VERSION, catalog_revision=trees.revision)
+    if report.get('projects'):
+        compacted['projects'] = [dict(project, work_items=compact_items(project['work_items']))
+                                 if project.get('work_items') else project
+                                 for project in report['projects']]
+    if report.get('work_items'):
+        compacted['work_items'] = compact_items(report['work_items'])
+    elif report.get('work_items') == []:
+        del compacted['work_items']
+    return compacted
+
+
+def expand_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """保存された日報を画面・エクスポート用の形式に変換（reportを直接変更して返す）
+
+    バージョン1の日報はそのまま返す。階層を復元できない作業項目（変更履歴が整理された後に
+    削除された作業項目）は作業項目自身のIDだけを階層とする。
+    """
+    if report.get('schema') != SCHEMA_VERSION:
+        return report
+    trees = _load_trees()
+    del report['schema']
+    revision = report.pop('catalog_revision', 0)
+    report.setdefault('work_items', [])
+    for items in _work_item_lists(report):
+        for item in items:
+            if 'hierarchy' not in item:
+                item['hierarchy'] = _derive_hierarchy(trees, item, revision) or [item.get('work_item_id')]
+    return report
+
+
+def recompact_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """保存された日報を現在の保存形式とカタログのリビジョンで保存し直す形式に変換した複製を返す
+
+    保存後に階層が変わった作業項目は保存時の階層をそのまま保存するため、変換後の日報は
+    カタログの変更履歴を使わずに復元できる。
+    """
+    return compact_report(expand_report(copy.deepcopy(report)))
+
+
+def expand_reports(reports: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """保存された日報のリストをまとめて変換（リストの各日報を直接変更して返す）"""
+    for report in reports:
+        expand_report(report)
+    return reports
@@ -0,0 +1,857 @@
+"""日報ストア（ユーザーごとの日報の読み書き）
+
+JSONファイル（ローカル/S3）の場合、日報は月ごとに分割して保存する。
+
+    reports/{username}/manifest.json   … パーティション一覧と日報ID→月の索引（revisionは月別ファイルの書き換え回数）
+    reports/{username}/{YYYY-MM}.json  … その月の日報（日付がない日報は undated.json）
+    reports/{username}/journal.ndjson  … 月別ファイルに未反映の追加・更新・削除（1行1件）
+    reports/{username}/changes.json    … 月別ファイルに反映済みの変更索引（日報ごとに最新の変更の連番、削除した日報の墓標を含む）
+
+日報の追加・更新・削除はジャーナルの末尾に1行追記するだけで、月別ファイルとマニフェストは書き換えない。
+読み込み時は月別ファイルとマニフェストにジャーナルを反映して返し、ジャーナルが
+REPORT_JOURNAL_MAX_EVENTS件に達した時点で月別ファイルとマニフェストに反映してジャーナルを空にする
+（python -m backend.utils.report_store compact で全ユーザー分を反映することも可能）。
+追加・更新・削除にはジャーナルへの追記と同時にユーザーごとの連番（seq）を付け、差分取得（query_changes）の位置に使う。
+ジャーナルの行には工数の集計表の差分（rollups）も記録し、追記の後に集計表に反映する（report_rollups）。
+日付・月範囲の読み込みは必要な月のファイルだけを読み込む。旧形式の reports_{username}.json は
+初回アクセス時に自動的に分割され、移行済みの印（migrated_to）を付けて残される
+（python -m backend.utils.report_store migrate で一括移行も可能）。
+
+SQLiteの場合は該当する1行だけを追加・更新・削除し、同じトランザクションで変更の記録と集計表を更新する。
+"""
+import base64
+import bisect
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.utils import json_manager, report_rollups, report_schema, work_item_catalog
+from backend.utils.json_manager import load_json, load_json_with_version, transaction, appending, retry_on_conflict
+
+UNDATED_PARTITION = 'undated'
+CHANGES_FORMAT = 'sequence'
+
+# 差分取得の位置の初期値（全ての変更より前）
+_START = (-1, '')
+
+# 全ユーザーの日報を読み込む際の並列数
+REPORT_LOAD_WORKERS = int(os.environ.get('REPORT_LOAD_WORKERS', '8'))
+
+# ジャーナルがこの件数に達したら月別ファイルに反映する
+REPORT_JOURNAL_MAX_EVENTS = int(os.environ.get('REPORT_JOURNAL_MAX_EVENTS', '100'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_MONTH_PATTERN = re.compile(r'^(\d{4}-\d{2})')
+_PARTITION_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+
+def get_user_reports_filename(username: str) -> str:
+    """ユーザーごとの日報ファイル名を取得（旧形式・SQLiteのドキュメント名）"""
+    return f'reports_{username}.json'
+
+
+def get_changes_filename(username: str) -> str:
+    """ユーザーの日報の変更索引のファイル名"""
+    return f'reports/{username}/changes.json'
+
+
+def get_manifest_filename(username: str) -> str:
+    """ユーザーごとの日報マニフェストのファイル名を取得"""
+    return f'reports/{username}/manifest.json'
+
+
+def get_partition_filename(username: str, partition: str) -> str:
+    """月別日報ファイル名を取得"""
+    return f'reports/{username}/{partition}.json'
+
+
+def get_journal_filename(username: str) -> str:
+    """月別ファイルに未反映の変更を記録するジャーナルのファイル名"""
+    return f'reports/{username}/journal.ndjson'
+
+
+def get_partition_key(date: Optional[str]) -> str:
+    """日付（YYYY-MM-DD）から月のパーティション名（YYYY-MM）を取得"""
+    match = _MONTH_PATTERN.match(date or '')
+    return match.group(1) if match else UNDATED_PARTITION
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {'format': 'monthly', 'partitions': {}, 'index': {}}
+
+
+def _split_by_partition(reports: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    for report in reports:
+        partitions.setdefault(get_partition_key(report.get('date')), []).append(report)
+    return partitions
+
+
+def _report_project_ids(report: Dict[str, Any]) -> List[str]:
+    return [p.get('project_id') for p in report.get('projects') or [] if p.get('project_id')]
+
+
+def _set_partition(manifest: Dict[str, Any], partition: str, reports: List[Dict[str, Any]]):
+    """マニフェストのパーティション情報（件数と含まれるプロジェクトID）を更新"""
+    if reports:
+        project_ids = {project_id for report in reports for project_id in _report_project_ids(report)}
+        manifest['partitions'][partition] = {'count': len(reports), 'project_ids': sorted(project_ids)}
+    else:
+        manifest['partitions'].pop(partition, None)
+
+
+def _partition_may_contain(meta: Dict[str, Any], project_id: Optional[str]) -> bool:
+    """パーティションに指定プロジェクトの日報が含まれる可能性があるか（索引がない場合はTrue）"""
+    if project_id is None or 'project_ids' not in meta:
+        return True
+    return project_id in meta['project_ids']
+
+
+def _load_saved_partitions(username: str) -> Dict[str, List[Dict[str, Any]]]:
+    """保存済みの月別ファイルの日報を取得（パーティション名 -> 日報）"""
+    prefix = f'reports/{username}/'
+    partitions = {}
+    for filename in json_manager.list_files(prefix):
+        partition = filename[len(prefix):-len('.json')]
+        if filename.endswith('.json') and (partition == UNDATED_PARTITION or _PARTITION_PATTERN.match(partition)):
+            # 読み込みに失敗した場合は例外を送出させるため、transaction経由で読み込む（内容は変更しない）
+            with transaction(filename) as data:
+                partitions[partition] = data.get('reports', [])
+    return partitions
+
+
+@retry_on_conflict
+def migrate_user(username: str) -> Dict[str, Any]:
+    """旧形式の reports_{username}.json を月別ファイルに分割し、マニフェストを返す
+
+    マニフェストが存在しない場合のみ移行する（読み込みに失敗した場合は例外を送出し、移行しない）。
+    移行した旧形式のファイルには移行済みの印（migrated_to）を付け、そのファイルからは再度移行しない
+    （マニフェストだけが失われた場合は保存済みの月別ファイルから作り直す）。
+    """
+    with transaction(get_manifest_filename(username)) as manifest:
+        if 'partitions' in manifest:
+            return manifest
+        with transaction(get_user_reports_filename(username)) as legacy:
+            if legacy.get('migrated_to'):
+                partitions = _load_saved_partitions(username)
+                if legacy.get('reports') and not partitions:
+                    raise RuntimeError(f'移行済みの日報の月別ファイルが見つかりません: {username}')
+            else:
+                partitions = _split_by_partition(legacy.get('reports', []))
+                for partition, reports in partitions.items():
+                    # 他のプロセスが移行後に書き換えていた場合はConflictErrorになり、移行をやり直す
+                    with transaction(get_partition_filename(username, partition)) as data:
+                        data.clear()
+                        data['reports'] = reports
+                if legacy:
+                    legacy['migrated_to'] = f'reports/{username}/'
+            manifest.update(_empty_manifest())
+            for partition, reports in sorted(partitions.items()):
+                _set_partition(manifest, partition, reports)
+                for report in reports:
+                    manifest['index'][report.get('id')] = partition
+    if manifest['index']:
+        print(f"[report_store] 日報を月別ファイルに移行しました: {username}（{len(manifest['index'])}件）")
+    return manifest
+
+
+def _load_manifest(username: str, revalidate: bool = False) -> Dict[str, Any]:
+    manifest, _ = load_json_with_version(get_manifest_filename(username), revalidate=revalidate)
+    if 'partitions' not in manifest:
+        # 読み込みに失敗した場合も{}になるため、移行の要否はmigrate_user内で確認し直す
+        manifest = migrate_user(username)
+    return manifest
+
+
+def _event_id(event: Dict[str, Any]) -> Optional[str]:
+    return event['report'].get('id') if event['op'] == 'put' else event.get('id')
+
+
+def _load_journal(username: str, revalidate: bool = False) -> List[Dict[str, Any]]:
+    """ジャーナルの変更を古い順に取得
+
+    {'op': 'put', 'seq': 連番, 'partition': 月, 'report': 日報, 'rollups': 集計表の差分} は追加・更新、
+    {'op': 'delete', 'seq': 連番, 'id': 日報ID, 'rollups': 集計表の差分} は削除。
+    """
+    events, _ = load_json_with_version(get_journal_filename(username), revalidate=revalidate)
+    return events or []
+
+
+def _last_seq(manifest: Dict[str, Any], events: Iterable[Dict[str, Any]]) -> int:
+    """採番済みの最後の連番（ジャーナルを反映済みの変更はマニフェストのseqに記録されている）"""
+    return max([manifest.get('seq', 0)] + [event['seq'] for event in events])
+
+
+def _bump_revision(manifest: Dict[str, Any]):
+    """月別ファイルを書き換えたことをマニフェストに記録（report_file_versionsのバージョンを変える）"""
+    manifest['revision'] = manifest.get('revision', 0) + 1
+
+
+def _merge_manifest(manifest: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """マニフェストにジャーナルの変更を反映（索引とパーティションに含まれうるプロジェクトIDを追加する）"""
+    for event in events:
+        if event['op'] == 'put':
+            meta = manifest['partitions'].setdefault(event['partition'], {'count': 0, 'project_ids': []})
+            if 'project_ids' in meta:
+                meta['project_ids'] = sorted(set(meta['project_ids']).union(_report_project_ids(event['report'])))
+            manifest['index'][_event_id(event)] = event['partition']
+        else:
+            manifest['index'].pop(_event_id(event), None)
+    return manifest
+
+
+def _load_view(username: str, revalidate: bool = False) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """ジャーナルを反映したマニフェストと、ジャーナルの変更を取得"""
+    events = _load_journal(username, revalidate)
+    return _merge_manifest(_load_manifest(username, revalidate), events), events
+
+
+def _apply_events(reports: List[Dict[str, Any]], partition: str,
+                  events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """月別ファイルの日報にジャーナルの変更を順に反映（同じ月の中での更新は元の位置で置き換える）
+
+    同じ変更を繰り返し反映しても結果は変わらない。
+    """
+    merged = list(reports)
+    for event in events:
+        report_id = _event_id(event)
+        index = next((i for i, r in enumerate(merged) if r.get('id') == report_id), None)
+        if event['op'] == 'put' and event['partition'] == partition:
+            if index is None:
+                merged.append(event['report'])
+            else:
+                merged[index] = event['report']
+        elif index is not None:
+            del merged[index]
+    return merged
+
+
+def _load_partition(username: str, partition: str, events: Iterable[Dict[str, Any]] = (),
+                    revalidate: bool = False) -> Dict[str, Any]:
+    data, _ = load_json_with_version(get_partition_filename(username, partition), revalidate=revalidate)
+    data['reports'] = _apply_events(data.get('reports', []), partition, events)
+    return data
+
+
+def _sorted_partitions(manifest: Dict[str, Any]) -> List[str]:
+    # 日付なしのパーティションは最後に読み込む
+    return sorted(manifest['partitions'], key=lambda p: (p == UNDATED_PARTITION, p))
+
+
+def load_user_reports(username: str) -> List[Dict[str, Any]]:
+    """ユーザーの日報を全て取得（月順、同じ月の中は保存順）"""
+    if json_manager.USE_SQLITE:
+        return report_schema.expand_reports(load_json(get_user_reports_filename(username)).get('reports', []))
+    return report_schema.expand_reports(_load_all_partitions(username)[0])
+
+
+def _load_all_partitions(username: str, revalidate: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+    """全ての月の保存された形式の日報と、読み込んだ時点の最後の連番"""
+    manifest, events = _load_view(username, revalidate)
+    reports = []
+    for partition in _sorted_partitions(manifest):
+        reports.extend(_load_partition(username, partition, events, revalidate)['reports'])
+    return reports, _last_seq(manifest, events)
+
+
+def load_user_reports_with_seq(username: str) -> Tuple[List[Dict[str, Any]], int]:
+    """ユーザーの保存された形式の日報を全て取得し、読み込んだ時点の最後の連番と合わせて返す（JSONファイルのみ）
+
+    集計表の作成用（連番までの変更は返した日報に含まれる）。
+    """
+    return _load_all_partitions(username, revalidate=True)
+
+
+def load_user_reports_in_range(username: str, date_from: Optional[str] = None,
+                               date_to: Optional[str] = None,
+                               project_id: Optional[str] = None,
+                               include_undated: bool = False) -> List[Dict[str, Any]]:
+    """ユーザーの日報のうち、日付が date_from〜date_to（両端を含む）のものを取得
+
+    範囲に含まれ、かつ指定プロジェクトの日報を含む月のファイルだけを読み込む。
+    日付のない日報は範囲指定時にはinclude_undated=Trueの場合のみ含める。
+    """
+    def in_range(report):
+        if project_id is not None and project_id not in _report_project_ids(report):
+            return False
+        if date_from is None and date_to is None:
+            return True
+        date = report.get('date') or ''
+        if not date:
+            return include_undated
+        if date_from is not None and date < date_from:
+            return False
+        if date_to is not None and date > date_to:
+            return False
+        return True
+
+    if json_manager.USE_SQLITE:
+        reports = json_manager.get_sqlite_store().load_reports(username, date_from=date_from, date_to=date_to,
+                                                               include_undated=include_undated)
+        return report_schema.expand_reports([r for r in reports if in_range(r)])
+
+    if date_from is None and date_to is None and project_id is None:
+        return load_user_reports(username)
+
+    month_from = date_from[:7] if date_from else None
+    month_to = date_to[:7] if date_to else None
+    manifest, events = _load_view(username)
+    reports = []
+    for partition in _sorted_partitions(manifest):
+        if partition == UNDATED_PARTITION:
+            if (date_from is not None or date_to is not None) and not include_undated:
+                continue
+        else:
+            if month_from is not None and partition < month_from:
+                continue
+            if month_to is not None and partition > month_to:
+                continue
+        if not _partition_may_contain(manifest['partitions'][partition], project_id):
+            continue
+        reports.extend(r for r in _load_partition(username, partition, events)['reports'] if in_range(r))
+    return report_schema.expand_reports(reports)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """読み込み用のスレッドプールを取得（プロセス内で共有）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, REPORT_LOAD_WORKERS),
+                                               thread_name_prefix='report-loader')
+    return _executor
+
+
+def load_all_user_reports(usernames: Iterable[str], date_from: Optional[str] = None,
+                          date_to: Optional[str] = None,
+                          project_id: Optional[str] = None,
+                          include_undated: bool = False) -> List[Dict[str, Any]]:
+    """複数ユーザーの日報をまとめて取得（各日報にusernameを付与）
+
+    ユーザーごとの読み込みはスレッドプールで並列に行うが、結果はusernamesの順、
+    各ユーザー内は保存順に並べて返す。
+    """
+    usernames = list(usernames)
+
+    def load(username):
+        return load_user_reports_in_range(username, date_from, date_to, project_id, include_undated)
+
+    if json_manager.USE_SQLITE or REPORT_LOAD_WORKERS <= 1 or len(usernames) <= 1:
+        # SQLiteはローカルの索引読み込みのため並列化の効果がない
+        results = [load(username) for username in usernames]
+    else:
+        results = list(_get_executor().map(load, usernames))
+
+    all_reports = []
+    for username, reports in zip(usernames, results):
+        for report in reports:
+            # ユーザー名を追加
+            report_with_username = report.copy()
+            report_with_username['username'] = username
+            all_reports.append(report_with_username)
+    return all_reports
+
+
+def report_file_versions(username: str) -> List[Tuple[str, Optional[str]]]:
+    """ユーザーの日報のバージョンを表すファイル名とそのバージョン（ETag・エクスポートのキャッシュキー用）
+
+    日報の追加・更新・削除はジャーナルを、月別ファイルの書き換え（ジャーナルの反映・保存形式の変換）は
+    マニフェストのrevisionを必ず更新するため、月別ファイルの数にかかわらずこの2つのバージョンだけを確認する
+    （ストレージへの問い合わせはstat・HEADのみで、本文は読み込まない）。
+    作業項目の階層は読み込み時に作業項目カタログから復元するため、カタログも対象に含める。
+    """
+    filenames = [work_item_catalog.CATALOG_FILENAME]
+    if json_manager.USE_SQLITE:
+        filenames.append(get_user_reports_filename(username))
+    else:
+        filenames += [get_manifest_filename(username), get_journal_filename(username)]
+    return json_manager.get_cached_versions(filenames)
+
+
+def sort_reports(reports: List[Dict[str, Any]]):
+    """日報を新しい順に並べ替える（同じ日付の中はユーザー名・IDの順）"""
+    reports.sort(key=lambda r: (r.get('username') or '', r.get('id') or ''))
+    reports.sort(key=lambda r: r.get('date') or '', reverse=True)
+
+
+def _cursor_key(report: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (report.get('date') or '', report.get('username') or '', report.get('id') or '')
+
+
+def _encode_key(key: Tuple[str, str, str]) -> str:
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def encode_cursor(report: Dict[str, Any]) -> str:
+    """ページングのカーソル（最後に返した日報の位置）を作成"""
+    return _encode_key(_cursor_key(report))
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, str]:
+    """カーソルを復元（不正な場合はValueError）"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(key, list) or len(key) != 3 or not all(isinstance(v, str) for v in key):
+        raise ValueError('invalid cursor')
+    return key[0], key[1], key[2]
+
+
+def _is_after(report: Dict[str, Any], cursor_key: Tuple[str, str, str]) -> bool:
+    """sort_reports()の順序で、日報がカーソルより後ろにあるか"""
+    key = _cursor_key(report)
+    if key[0] != cursor_key[0]:
+        return key[0] < cursor_key[0]
+    return key[1:] > cursor_key[1:]
+
+
+def query_reports(usernames: Iterable[str], date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  project_id: Optional[str] = None, limit: Optional[int] = None,
+                  cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """日報を検索し、(新しい順の日報, 次のページのカーソル)を返す
+
+    日付範囲・プロジェクトは月別ファイルの索引で絞り込んでから読み込む。
+    カーソル指定時はカーソルの日付より新しい月も読み込まない。
+    日付のない日報は日付のある日報の後に並ぶため、日付範囲の指定がなければカーソルより後のページに含める。
+    """
+    cursor_key = decode_cursor(cursor) if cursor else None
+    include_undated = False
+    if cursor_key is not None and cursor_key[0] and (date_to is None or cursor_key[0] < date_to):
+        include_undated = date_from is None and date_to is None
+        date_to = cursor_key[0]
+
+    reports = load_all_user_reports(usernames, date_from, date_to, project_id, include_undated)
+    sort_reports(reports)
+    if cursor_key is not None:
+        reports = [r for r in reports if _is_after(r, cursor_key)]
+
+    next_cursor = None
+    if limit is not None and len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = encode_cursor(reports[-1]) if reports else None
+    return reports, next_cursor
+
+
+def _initial_changes(username: str) -> Dict[str, Any]:
+    """保存済みの日報から変更索引を作成（既存の日報は連番0の変更とし、削除済みの日報の墓標は含まれない）"""
+    entries = sorted([0, r.get('id'), False] for r in load_user_reports(username) if r.get('id'))
+    return {'format': CHANGES_FORMAT, 'entries': entries}
+
+
+def _merge_changes(entries: List[List[Any]], events: Iterable[Dict[str, Any]]) -> List[List[Any]]:
+    """変更索引にジャーナルの変更を反映（日報ごとに最新の1件だけを残し、連番・ID順に並べる）"""
+    latest = {}
+    for event in events:
+        latest[_event_id(event)] = [event['seq'], _event_id(event), event['op'] == 'delete']
+    if not latest:
+        return entries
+    return sorted([entry for entry in entries if entry[1] not in latest] + list(latest.values()))
+
+
+@retry_on_conflict
+def _build_changes(username: str) -> Dict[str, Any]:
+    """変更索引を作成して保存
+
+    変更索引が存在しない場合のみ作成する（読み込みに失敗した場合は例外を送出し、既存の索引を上書きしない）。
+    """
+    with transaction(get_changes_filename(username)) as changes:
+        if changes.get('format') == CHANGES_FORMAT:
+            return changes
+        changes.clear()
+        changes.update(_initial_changes(username))
+    return changes
+
+
+def _load_changes(username: str) -> Dict[str, Any]:
+    """変更索引を取得（存在しない場合は保存済みの日報から作成）
+
+    entries は [連番, 日報ID, 削除済みか] の連番・ID順のリストで、日報ごとに最新の1件だけを持つ。
+    ジャーナルに未反映の変更は含まれない。
+    """
+    changes = load_json(get_changes_filename(username))
+    if changes.get('format') != CHANGES_FORMAT:
+        changes = _build_changes(username)
+    return changes
+
+
+def _change_entries(username: str, after: Tuple[int, str]) -> List[Tuple[int, str, bool]]:
+    """(連番, 日報ID)がafterより後の変更を (連番, 日報ID, 削除済みか) の連番・ID順に取得
+
+    変更索引は二分探索で位置を求め、ジャーナルに未反映の変更はジャーナルから加える。
+    """
+    if json_manager.USE_SQLITE:
+        return json_manager.get_sqlite_store().load_report_changes(username, after)
+
+    entries = _load_changes(username)['entries']
+    start = bisect.bisect_right(entries, [after[0], after[1], True])
+    pending = {entry[1]: tuple(entry) for entry in _merge_changes([], _load_journal(username))}
+    found = [tuple(entry) for entry in entries[start:] if entry[1] not in pending]
+    found += [entry for entry in pending.values() if entry[:2] > after]
+    return sorted(found)
+
+
+def _encode_positions(positions: Dict[str, Tuple[int, str]]) -> str:
+    raw = json.dumps({username: list(position) for username, position in positions.items()},
+                     ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_sync_token(token: str) -> Dict[str, Tuple[int, str]]:
+    """差分取得の位置（ユーザー名 -> (連番, 日報ID)）を復元（不正な場合はValueError）"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        positions = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('invalid sync token')
+    if not isinstance(positions, dict) or not all(
+            isinstance(p, list) and len(p) == 2 and isinstance(p[0], int) and isinstance(p[1], str)
+            for p in positions.values()):
+        raise ValueError('invalid sync token')
+    return {username: (p[0], p[1]) for username, p in positions.items()}
+
+
+def _get_reports_by_ids(username: str, report_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """日報IDの日報を取得（該当する月のファイルだけを読み込む）"""
+    report_ids = set(report_ids)
+    if json_manager.USE_SQLITE:
+        store = json_manager.get_sqlite_store()
+        reports = {report_id: store.get_report(username, report_id) for report_id in report_ids}
+        return {report_id: report_schema.expand_report(report)
+                for report_id, report in reports.items() if report is not None}
+
+    manifest, events = _load_view(username)
+    partitions = {manifest['index'][report_id] for report_id in report_ids if report_id in manifest['index']}
+    found = {}
+    for partition in sorted(partitions):
+        for report in _load_partition(username, partition, events)['reports']:
+            if report.get('id') in report_ids:
+                found[report['id']] = report_schema.expand_report(report)
+    return found
+
+
+def latest_sync_token(usernames: Iterable[str]) -> str:
+    """現在までの全ての変更を取得済みとする差分取得の位置（一覧を読み込む前に取得する）"""
+    positions = {}
+    for username in usernames:
+        entries = _change_entries(username, _START)
+        if entries:
+            positions[username] = entries[-1][:2]
+    return _encode_positions(positions)
+
+
+def query_changes(usernames: Iterable[str], since: Optional[str] = None,
+                  limit: int = 500) -> Tuple[List[Dict[str, Any]], str, bool]:
+    """sinceの位置より後に追加・更新・削除された日報を (変更, 次の位置, 続きがあるか) で返す
+
+    変更は {'id', 'username', 'seq', 'updated_at', 'deleted', 'report'} で、削除された日報はreportがNone。
+    位置はユーザーごとの連番（書き込み時にジャーナルへの追記と同時に採番）で表すため、
+    同時に書き込まれた変更も取りこぼさない。sinceを省略した場合は全ての日報を返す。
+    """
+    positions = decode_sync_token(since) if since else {}
+    candidates = []
+    for username in usernames:
+        for seq, report_id, deleted in _change_entries(username, positions.get(username, _START)):
+            candidates.append((seq, username, report_id, deleted))
+    candidates.sort()
+
+    has_more = len(candidates) > limit
+    candidates = candidates[:limit]
+    for seq, username, report_id, _ in candidates:
+        positions[username] = (seq, report_id)
+
+    # 削除されていない日報の内容をユーザーごとにまとめて読み込む
+    ids_by_user: Dict[str, List[str]] = {}
+    for _, username, report_id, deleted in candidates:
+        if not deleted:
+            ids_by_user.setdefault(username, []).append(report_id)
+    reports_by_user = {username: _get_reports_by_ids(username, ids) for username, ids in ids_by_user.items()}
+
+    changes = []
+    for seq, username, report_id, deleted in candidates:
+        report = None if deleted else reports_by_user[username].get(report_id)
+        changes.append({
+            'id': report_id,
+            'username': username,
+            'seq': seq,
+            'updated_at': report.get('updated_at') if report else None,
+            'deleted': report is None,
+            'report': report
+        })
+    return changes, _encode_positions(positions), has_more
+
+
+def get_reports_by_date(username: str, date: str) -> List[Dict[str, Any]]:
+    """ユーザーの特定日付の日報を取得"""
+    if json_manager.USE_SQLITE:
+        return report_schema.expand_reports(json_manager.get_sqlite_store().load_reports(username, date=date))
+
+    partition = get_partition_key(date)
+    manifest, events = _load_view(username)
+    if partition not in manifest['partitions']:
+        return []
+    reports = _load_partition(username, partition, events)['reports']
+    return report_schema.expand_reports([r for r in reports if r.get('date') == date])
+
+
+@retry_on_conflict
+def add_report(username: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """日報を追加（保存用の形式に変換して保存し、渡された日報を返す）"""
+    stored = report_schema.compact_report(report)
+    if json_manager.USE_SQLITE:
+        json_manager.get_sqlite_store().insert_report(username, stored, report_rollups.sqlite_rollup_diff(username))
+        json_manager.invalidate_cache(get_user_reports_filename(username))
+        return report
+
+    # 旧形式の場合は先に移行する
+    _load_manifest(username)
+    # 月別ファイルとマニフェストは書き換えず、ジャーナルに追記する
+    with appending(get_journal_filename(username)) as (events, append):
+        event = {'op': 'put', 'seq': _last_seq(_load_manifest(username, revalidate=True), events) + 1,
+                 'partition': get_partition_key(report.get('date')), 'report': stored,
+                 'rollups': report_rollups.report_diff(username, None, stored)}
+        append(event)
+    _apply_rollups(username, events, event)
+    _compact_if_needed(username, len(events) + 1)
+    return report
+
+
+@retry_on_conflict
+def update_report(username: str, report_id: str,
+                  updater: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """日報を更新（updaterは既存の日報から新しい日報を作る関数）
+
+    見つからない場合はNoneを返す。日付の月が変わった場合は月別ファイル間で移動する。
+    保存が他の書き込みと競合した場合はupdaterを再度呼び出してやり直す。
+    """
+    if json_manager.USE_SQLITE:
+        store = json_manager.get_sqlite_store()
+        existing = store.get_report(username, report_id)
+        if existing is None:
+            return None
+        new_report = updater(report_schema.expand_report(existing))
+        if store.replace_report(username, report_schema.compact_report(new_report),
+                                report_rollups.sqlite_rollup_diff(username)) is None:
+            return None
+        json_manager.invalidate_cache(get_user_reports_filename(username))
+        return new_report
+
+    _load_manifest(username)
+    # ジャーナルへの追記の間は同じユーザーの日報の書き込みを排他する
+    with appending(get_journal_filename(username)) as (events, append):
+        manifest = _merge_manifest(_load_manifest(username, revalidate=True), events)
+        partition = manifest['index'].get(report_id)
+        if partition is None:
+            return None
+        reports = _load_partition(username, partition, events, revalidate=True)['reports']
+        existing = next((r for r in reports if r.get('id') == report_id), None)
+        if existing is None:
+            return None
+        new_report = updater(report_schema.expand_report(existing))
+        stored = report_schema.compact_report(new_report)
+        event = {'op': 'put', 'seq': _last_seq(manifest, events) + 1,
+                 'partition': get_partition_key(new_report.get('date')), 'report': stored,
+                 'rollups': report_rollups.report_diff(username, existing, stored)}
+        append(event)
+    _apply_rollups(username, events, event)
+    _compact_if_needed(username, len(events) + 1)
+    return new_report
+
+
+@retry_on_conflict
+def delete_report(username: str, report_id: str) -> Optional[Dict[str, Any]]:
+    """日報を削除し、削除した日報を返す（見つからない場合はNone）"""
+    if json_manager.USE_SQLITE:
+        deleted = json_manager.get_sqlite_store().delete_report(username, report_id,
+                                                                report_rollups.sqlite_rollup_diff(username))
+        json_manager.invalidate_cache(get_user_reports_filename(username))
+        if deleted is None:
+            return None
+        return report_schema.expand_report(deleted)
+
+    _load_manifest(username)
+    with appending(get_journal_filename(username)) as (events, append):
+        manifest = _merge_manifest(_load_manifest(username, revalidate=True), events)
+        partition = manifest['index'].get(report_id)
+        if partition is None:
+            return None
+        reports = _load_partition(username, partition, events, revalidate=True)['reports']
+        deleted = next((r for r in reports if r.get('id') == report_id), None)
+        if deleted is None:
+            return None
+        event = {'op': 'delete', 'seq': _last_seq(manifest, events) + 1, 'id': report_id,
+                 'rollups': report_rollups.report_diff(username, deleted, None)}
+        append(event)
+    _apply_rollups(username, events, event)
+    _compact_if_needed(username, len(events) + 1)
+    return report_schema.expand_report(deleted)
+
+
+def _apply_rollups(username: str, events: List[Dict[str, Any]], event: Dict[str, Any]):
+    """ジャーナルに追記した変更の差分を、その変更が対象とする集計表に反映
+
+    ジャーナルに記録済みのため、失敗しても日報の書き込みは成功として扱い、
+    次に同じ集計表に反映する時点かジャーナルを月別ファイルに反映する時点で加える。
+    """
+    try:
+        report_rollups.apply_journal(username, events + [event],
+                                     report_rollups.shard_filenames(event['rollups']))
+    except Exception as e:
+        print(f"[report_store] 集計表への反映に失敗しました: {username}, エラー: {e}")
+
+
+@retry_on_conflict
+def compact_journal(username: str) -> int:
+    """ジャーナルの変更を月別ファイルとマニフェストに反映してジャーナルを空にし、反映した件数を返す"""
+    if json_manager.USE_SQLITE:
+        return 0
+
+    _load_manifest(username)
+    # 月別ファイルを保存してからジャーナルを空にするため、途中で中断されても変更は失われない
+    # （反映済みの変更をもう一度反映しても結果は変わらない）
+    with transaction(get_journal_filename(username), list) as events:
+        if not events:
+            return 0
+        with transaction(get_manifest_filename(username)) as manifest:
+            # 変更の対象になる月（更新で移動した日報の移動元を含む）
+            index = dict(manifest['index'])
+            touched = set()
+            for event in events:
+                report_id = _event_id(event)
+                if report_id in index:
+                    touched.add(index[report_id])
+                if event['op'] == 'put':
+                    index[report_id] = event['partition']
+                    touched.add(event['partition'])
+                else:
+                    index.pop(report_id, None)
+            for partition in sorted(touched):
+                with transaction(get_partition_filename(username, partition)) as data:
+                    data['reports'] = _apply_events(data.get('reports', []), partition, events)
+                _set_partition(manifest, partition, data['reports'])
+            manifest['index'] = index
+            manifest['seq'] = _last_seq(manifest, events)
+            _bump_revision(manifest)
+        with transaction(get_changes_filename(username)) as changes:
+            if changes.get('format') != CHANGES_FORMAT:
+                changes.clear()
+                changes.update(_initial_changes(username))
+            changes['entries'] = _merge_changes(changes['entries'], events)
+        # ジャーナルを空にする前に、集計表に未反映の差分を反映する
+        report_rollups.apply_journal(username, events)
+        count = len(events)
+        del events[:]
+    print(f"[report_store] ジャーナルを月別ファイルに反映しました: {username}（{count}件）")
+    return count
+
+
+def _compact_if_needed(username: str, journal_size: int):
+    """ジャーナルがREPORT_JOURNAL_MAX_EVENTS件に達していれば月別ファイルに反映"""
+    if journal_size < REPORT_JOURNAL_MAX_EVENTS:
+        return
+    try:
+        compact_journal(username)
+    except Exception as e:
+        # 反映に失敗してもジャーナルに記録した変更は失われないため、次の書き込みで再度試みる
+        print(f"[report_store] ジャーナルの反映に失敗しました: {username}, エラー: {e}")
+
+
+def _stored_usernames() -> List[str]:
+    """日報が保存されている可能性のあるユーザー名（削除されたユーザーを含む）"""
+    usernames = set(load_json('users.json').keys())
+    for filename in json_manager.list_files('reports_'):
+        if filename.endswith('.json'):
+            usernames.add(filename[len('reports_'):-len('.json')])
+    for filename in json_manager.list_files('reports/'):
+        usernames.add(filename.split('/')[1])
+    return sorted(usernames)
+
+
+def migrate_all() -> List[str]:
+    """全ユーザーの旧形式の日報ファイルを月別ファイルに移行（移行済みのユーザーはスキップ）"""
+    migrated = []
+    for username in _stored_usernames():
+        if 'partitions' not in load_json(get_manifest_filename(username)):
+            migrate_user(username)
+            migrated.append(username)
+    return migrated
+
+
+def upgrade_user(username: str) -> int:
+    """ユーザーの保存済みの日報を現在の保存形式（report_schema.SCHEMA_VERSION）に変換し、変換した件数を返す"""
+    if json_manager.USE_SQLITE:
+        store = json_manager.get_sqlite_store()
+        count = 0
+        for report in store.load_reports(username):
+            compacted = report_schema.recompact_report(report)
+            if compacted != report and store.replace_report(username, compacted) is not None:
+                count += 1
+        if count:
+            json_manager.invalidate_cache(get_user_reports_filename(username))
+        return count
+
+    # ジャーナルの変更を月別ファイルに反映してから変換する
+    compact_journal(username)
+    count = 0
+    for partition in _sorted_partitions(_load_manifest(username)):
+        with transaction(get_partition_filename(username, partition)) as data:
+            reports = data.get('reports', [])
+            compacted = [report_schema.recompact_report(report) for report in reports]
+            count += sum(1 for old, new in zip(reports, compacted) if old != new)
+            data['reports'] = compacted
+    if count:
+        json_manager.update_json(get_manifest_filename(username), _bump_revision)
+    return count
+
+
+def upgrade_all() -> Dict[str, int]:
+    """全ユーザーの保存済みの日報を現在の保存形式に変換（ユーザー名 -> 変換した件数）
+
+    全ての日報を開始時点以降のカタログのリビジョンで保存し直すため、それ以前の階層の変更履歴は削除する。
+    """
+    revision = work_item_catalog.load_catalog()[0].get('revision', 0)
+    counts = {username: upgrade_user(username) for username in _stored_usernames()}
+    pruned = work_item_catalog.prune_history(revision)
+    if pruned:
+        print(f"[report_store] 作業項目の階層の変更履歴を{pruned}件整理しました")
+    return counts
+
+
+def compact_all() -> List[str]:
+    """全ユーザーのジャーナルを月別ファイルに反映（反映する変更がなかったユーザーは含めない）"""
+    usernames = load_json('users.json').keys()
+    return [username for username in sorted(usernames) if compact_journal(username)]
+
+
+if __name__ == '__main__':
+    import sys
+    # python -m backend.utils.report_store migrate
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        if json_manager.USE_SQLITE:
+            print('SQLiteでは日報は行単位で保存されるため、移行は不要です')
+            sys.exit(0)
+        users = migrate_all()
+        print(f"{len(users)}ユーザーの日報を月別ファイルに移行しました: {', '.join(users)}")
+    # python -m backend.utils.report_store compact
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'compact':
+        if json_manager.USE_SQLITE:
+            print('SQLiteでは日報は行単位で保存されるため、ジャーナルはありません')
+            sys.exit(0)
+        compacted = compact_all()
+        print(f"{len(compacted)}ユーザーのジャーナルを月別ファイルに反映しました: {', '.join(compacted)}")
+    # python -m backend.utils.report_store upgrade
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'upgrade':
+        counts = upgrade_all()
+        print(f"{sum(counts.values())}件の日報を保存形式のバージョン{report_schema.SCHEMA_VERSION}に変換しました: "
+              + ', '.join(f'{username}（{count}件）' for username, count in counts.items()))
+    else:
+        print('使い方: python -m backend.utils.report_store migrate|compact|upgrade')
+        sys.exit(1)
@@ -0,0 +1,542 @@
+"""SQLiteストレージ（json_managerのバックエンドとしてUSE_SQLITE=trueで使用）
+
+ユーザー・プロジェクト・工程・作業項目・日報はそれぞれのテーブルに1行ずつ保存し、
+それ以外のJSONファイルはdocumentsテーブルにそのまま保存する。
+日報の変更（差分取得用）は日報ごとに最新の1件をreport_changesテーブルに、工数の集計表は
+集計表のファイル名ごとにreport_rollupsテーブルに保存し、いずれも日報の行と同じトランザクションで更新する。
+各行のdata列には元のJSONオブジェクトをそのまま保持するため、
+load_document()はsave_document()で保存した内容を同じ形で返す。
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.utils import json_codec
+
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join('instance', 'daily_report.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_versions (
+    filename TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    filename TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    tabled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT NOT NULL,
+    role TEXT,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT,
+    name TEXT,
+    status TEXT,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_types (
+    id TEXT,
+    name TEXT,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_items (
+    work_type_id TEXT NOT NULL,
+    id TEXT,
+    parent_id TEXT,
+    name TEXT,
+    level INTEGER,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    username TEXT NOT NULL,
+    id TEXT,
+    date TEXT,
+    updated_at TEXT,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS report_changes (
+    username TEXT NOT NULL,
+    id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL,
+    PRIMARY KEY (username, id)
+);
+CREATE TABLE IF NOT EXISTS report_rollups (
+    filename TEXT NOT NULL,
+    key1 TEXT NOT NULL,
+    key2 TEXT NOT NULL,
+    minutes NUMERIC NOT NULL,
+    PRIMARY KEY (filename, key1, key2)
+);
+CREATE INDEX IF NOT EXISTS idx_users_position ON users (position);
+CREATE INDEX IF NOT EXISTS idx_projects_position ON projects (position);
+CREATE INDEX IF NOT EXISTS idx_work_types_position ON work_types (position);
+CREATE INDEX IF NOT EXISTS idx_work_items_type ON work_items (work_type_id, position);
+CREATE INDEX IF NOT EXISTS idx_work_items_parent ON work_items (work_type_id, parent_id);
+CREATE INDEX IF NOT EXISTS idx_reports_user ON reports (username, position);
+CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports (username, id);
+CREATE INDEX IF NOT EXISTS idx_reports_user_date ON reports (username, date);
+CREATE INDEX IF NOT EXISTS idx_report_changes_seq ON report_changes (username, seq, id);
+"""
+
+# テーブルごとの列定義（data列とposition列以外）
+_TABLE_COLUMNS = {
+    'users': ('username', 'role'),
+    'projects': ('id', 'name', 'status'),
+    'work_types': ('id', 'name'),
+    'work_items': ('work_type_id', 'id', 'parent_id', 'name', 'level'),
+    'reports': ('username', 'id', 'date', 'updated_at'),
+}
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+class _TableSpec:
+    """JSONファイルとテーブルの対応"""
+    __slots__ = ('table', 'list_key', 'partition_column', 'partition_value')
+
+    def __init__(self, table: str, list_key: Optional[str], partition_column: Optional[str] = None,
+                 partition_value: Optional[str] = None):
+        self.table = table
+        self.list_key = list_key  # Noneの場合は{キー: 行}形式（users.json）
+        self.partition_column = partition_column
+        self.partition_value = partition_value
+
+    def where(self) -> Tuple[str, tuple]:
+        if self.partition_column:
+            return f'WHERE {self.partition_column} = ?', (self.partition_value,)
+        return '', ()
+
+
+def _table_spec(filename: str) -> Optional[_TableSpec]:
+    """ファイル名に対応するテーブルを取得（汎用ドキュメントの場合はNone）"""
+    if filename == 'users.json':
+        return _TableSpec('users', None)
+    if filename == 'projects.json':
+        return _TableSpec('projects', 'projects')
+    if filename == 'work_types.json':
+        return _TableSpec('work_types', 'work_types')
+    if filename.startswith('work_items_') and filename.endswith('.json'):
+        return _TableSpec('work_items', 'items', 'work_type_id', filename[len('work_items_'):-len('.json')])
+    if filename.startswith('reports_') and filename.endswith('.json'):
+        return _TableSpec('reports', 'reports', 'username', filename[len('reports_'):-len('.json')])
+    return None
+
+
+def _row_values(spec: _TableSpec, row: Dict[str, Any], key: Optional[str] = None) -> tuple:
+    """行のJSONオブジェクトから列の値を取り出す"""
+    if spec.table == 'users':
+        return (key, row.get('role'))
+    if spec.table == 'work_items':
+        return (spec.partition_value, row.get('id'), row.get('parent_id'), row.get('name'), row.get('level'))
+    if spec.table == 'reports':
+        return (spec.partition_value, row.get('id'), row.get('date'), row.get('updated_at'))
+    return tuple(row.get(col) for col in _TABLE_COLUMNS[spec.table])
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def get_connection() -> sqlite3.Connection:
+    """スレッドごとのSQLite接続を取得（WALモード）"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        directory = os.path.dirname(SQLITE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(SQLITE_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
+    return conn
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE〜COMMITを囲むコンテキストマネージャ"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+def _write() -> _Transaction:
+    return _Transaction(get_connection())
+
+
+def initialize(data_dir: Optional[str] = None):
+    """スキーマを作成し、空のデータベースの場合はJSONファイルから初期データを取り込む"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        conn = get_connection()
+        conn.executescript(SCHEMA)
+        count = conn.execute('SELECT COUNT(*) FROM document_versions').fetchone()[0]
+        if count == 0 and data_dir and os.path.isdir(data_dir):
+            imported = import_json_dir(data_dir)
+            if imported:
+                print(f"[sqlite_store] JSONファイルから{imported}件のデータを取り込みました: {os.path.abspath(data_dir)}")
+        _initialized = True
+
+
+def import_json_dir(data_dir: str) -> int:
+    """ディレクトリ内のJSONファイルを全てSQLiteに取り込む"""
+    count = 0
+    for filepath in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+        # JSON_CODECで圧縮されたファイルにも対応する
+        with open(filepath, 'rb') as f:
+            data = json_codec.decode(os.path.basename(filepath), f.read())
+        save_document(os.path.basename(filepath), data)
+        count += 1
+    return count
+
+
+def _put_envelope(conn: sqlite3.Connection, filename: str, envelope: Any, tabled: bool):
+    conn.execute(
+        'INSERT INTO documents (filename, data, tabled) VALUES (?, ?, ?) '
+        'ON CONFLICT(filename) DO UPDATE SET data = excluded.data, tabled = excluded.tabled',
+        (filename, _dumps(envelope), 1 if tabled else 0)
+    )
+
+
+def _bump_version(conn: sqlite3.Connection, filename: str) -> int:
+    conn.execute(
+        'INSERT INTO document_versions (filename, version) VALUES (?, 1) '
+        'ON CONFLICT(filename) DO UPDATE SET version = version + 1',
+        (filename,)
+    )
+    return conn.execute('SELECT version FROM document_versions WHERE filename = ?', (filename,)).fetchone()[0]
+
+
+def document_version(filename: str) -> Optional[str]:
+    """ドキュメントのバージョンを取得（存在しない場合はNone）"""
+    row = get_connection().execute(
+        'SELECT version FROM document_versions WHERE filename = ?', (filename,)
+    ).fetchone()
+    return str(row[0]) if row else None
+
+
+def _load_rows(conn: sqlite3.Connection, spec: _TableSpec) -> List[sqlite3.Row]:
+    where, params = spec.where()
+    key_column = ', username' if spec.table == 'users' else ''
+    return conn.execute(
+        f'SELECT data{key_column} FROM {spec.table} {where} ORDER BY position', params
+    ).fetchall()
+
+
+def load_document(filename: str) -> Tuple[Any, Optional[str]]:
+    """ドキュメントを読み込む（存在しない場合は(None, None)）"""
+    conn = get_connection()
+    # 読み込み中に書き込まれても整合した内容を返すよう、読み取りトランザクションで囲む
+    conn.execute('BEGIN')
+    try:
+        version = conn.execute(
+            'SELECT version FROM document_versions WHERE filename = ?', (filename,)
+        ).fetchone()
+        if version is None:
+            return None, None
+        envelope_row = conn.execute(
+            'SELECT data, tabled FROM documents WHERE filename = ?', (filename,)
+        ).fetchone()
+        envelope = json.loads(envelope_row[0]) if envelope_row else {}
+        spec = _table_spec(filename)
+        if spec is not None and envelope_row and envelope_row[1]:
+            rows = _load_rows(conn, spec)
+            if spec.list_key is None:
+                envelope = {row[1]: json.loads(row[0]) for row in rows}
+            else:
+                envelope[spec.list_key] = [json.loads(row[0]) for row in rows]
+        return envelope, str(version[0])
+    finally:
+        conn.execute('COMMIT')
+
+
+def _insert_rows(conn: sqlite3.Connection, spec: _TableSpec, rows: List[Tuple[Optional[str], Any]], start: int = 0):
+    columns = _TABLE_COLUMNS[spec.table]
+    placeholders = ', '.join('?' for _ in range(len(columns) + 2))
+    conn.executemany(
+        f'INSERT INTO {spec.table} ({", ".join(columns)}, position, data) VALUES ({placeholders})',
+        [_row_values(spec, row, key) + (start + i, _dumps(row)) for i, (key, row) in enumerate(rows)]
+    )
+
+
+def save_document(filename: str, data: Any, check_version: bool = False,
+                  expected_version: Optional[str] = None) -> Optional[str]:
+    """ドキュメントを保存し、新しいバージョンを返す
+
+    check_version=Trueの場合は、現在のバージョンがexpected_version（Noneは未作成）と
+    一致する場合のみ保存し、一致しなければ保存せずにNoneを返す。
+    """
+    spec = _table_spec(filename)
+    rows = None
+    envelope = data
+    if spec is not None and isinstance(data, dict):
+        if spec.list_key is None:
+            if all(isinstance(v, dict) for v in data.values()):
+                rows = list(data.items())
+                envelope = {}
+        elif isinstance(data.get(spec.list_key), list) and all(isinstance(r, dict) for r in data[spec.list_key]):
+            rows = [(None, row) for row in data[spec.list_key]]
+            # リストのキーの位置を保つため、プレースホルダーとしてNoneを残す
+            envelope = dict(data)
+            envelope[spec.list_key] = None
+
+    with _write() as conn:
+        if check_version:
+            row = conn.execute('SELECT version FROM document_versions WHERE filename = ?', (filename,)).fetchone()
+            if (str(row[0]) if row else None) != expected_version:
+                return None
+        if spec is not None:
+            where, params = spec.where()
+            conn.execute(f'DELETE FROM {spec.table} {where}', params)
+            if rows:
+                _insert_rows(conn, spec, rows)
+        # テーブルに格納できない形式の場合はドキュメント全体をそのまま保存する
+        _put_envelope(conn, filename, envelope, rows is not None)
+        version = _bump_version(conn, filename)
+    return str(version)
+
+
+def list_documents(prefix: str = '') -> List[str]:
+    """指定されたプレフィックスで始まるドキュメント名のリストを取得"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    rows = get_connection().execute(
+        "SELECT filename FROM document_versions WHERE filename LIKE ? ESCAPE '\\' ORDER BY filename",
+        (escaped + '%',)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+# 日報の行単位の操作
+
+def _ensure_reports_document(conn: sqlite3.Connection, filename: str):
+    """日報ドキュメントが行単位で保存される状態になっていることを確認"""
+    row = conn.execute('SELECT data, tabled FROM documents WHERE filename = ?', (filename,)).fetchone()
+    if row is not None and row[1]:
+        return
+    envelope = json.loads(row[0]) if row else {}
+    if not isinstance(envelope, dict):
+        envelope = {}
+    envelope['reports'] = None
+    _put_envelope(conn, filename, envelope, True)
+
+
+def load_reports(username: str, date: Optional[str] = None, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None, include_undated: bool = False) -> List[Dict[str, Any]]:
+    """ユーザーの日報を取得（日付・日付範囲の指定時はインデックスで絞り込む）
+
+    日付範囲の指定時は、include_undated=Trueの場合のみ日付のない日報も含める。
+    """
+    conditions = ['username = ?']
+    params: List[Any] = [username]
+    if date is not None:
+        conditions.append('date = ?')
+        params.append(date)
+    range_conditions = []
+    if date_from is not None:
+        range_conditions.append('date >= ?')
+        params.append(date_from)
+    if date_to is not None:
+        range_conditions.append('date <= ?')
+        params.append(date_to)
+    if range_conditions:
+        condition = f"({' AND '.join(range_conditions)} AND date != '')"
+        if include_undated:
+            condition = f"({condition} OR date IS NULL OR date = '')"
+        conditions.append(condition)
+    rows = get_connection().execute(
+        f'SELECT data FROM reports WHERE {" AND ".join(conditions)} ORDER BY position', params
+    ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def get_report(username: str, report_id: str) -> Optional[Dict[str, Any]]:
+    """日報を1件取得"""
+    row = get_connection().execute(
+        'SELECT data FROM reports WHERE username = ? AND id = ? ORDER BY position LIMIT 1',
+        (username, report_id)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _record_change(conn: sqlite3.Connection, username: str, report_id: Optional[str], seq: int, deleted: bool):
+    """日報の変更を記録（日報ごとに最新の1件だけを持ち、seqは書き込みと同じトランザクションで採番した版）"""
+    if report_id is None:
+        return
+    conn.execute(
+        'INSERT INTO report_changes (username, id, seq, deleted) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT(username, id) DO UPDATE SET seq = excluded.seq, deleted = excluded.deleted',
+        (username, report_id, seq, 1 if deleted else 0)
+    )
+
+
+# 集計表の差分（集計表のファイル名 -> [(キー1, キー2, 工数の増減)]、キー2がない集計表は空文字）
+RollupRows = Dict[str, List[Tuple[str, str, Any]]]
+RollupDiff = Callable[[Optional[Dict[str, Any]], Optional[Dict[str, Any]]], RollupRows]
+
+
+def _apply_rollups(conn: sqlite3.Connection, rows: RollupRows):
+    """集計表に工数の増減を反映（0になった行は削除し、変更した集計表のバージョンを上げる）"""
+    for filename, changes in rows.items():
+        for key1, key2, minutes in changes:
+            conn.execute(
+                'INSERT INTO report_rollups (filename, key1, key2, minutes) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(filename, key1, key2) DO UPDATE SET minutes = minutes + excluded.minutes',
+                (filename, key1, key2, minutes)
+            )
+        conn.execute('DELETE FROM report_rollups WHERE filename = ? AND minutes = 0', (filename,))
+        _bump_version(conn, filename)
+
+
+def _get_report_row(conn: sqlite3.Connection, username: str, report_id: Optional[str]) -> Optional[sqlite3.Row]:
+    return conn.execute(
+        'SELECT rowid, data FROM reports WHERE username = ? AND id = ? ORDER BY position LIMIT 1',
+        (username, report_id)
+    ).fetchone()
+
+
+def insert_report(username: str, report: Dict[str, Any], rollup_diff: Optional[RollupDiff] = None) -> str:
+    """日報を1行追加し、ドキュメントの新しいバージョンを返す
+
+    rollup_diffは (変更前の日報, 変更後の日報) から集計表の差分を求める関数で、同じトランザクションで反映する。
+    """
+    filename = f'reports_{username}.json'
+    spec = _table_spec(filename)
+    with _write() as conn:
+        _ensure_reports_document(conn, filename)
+        position = conn.execute(
+            'SELECT COALESCE(MAX(position) + 1, 0) FROM reports WHERE username = ?', (username,)
+        ).fetchone()[0]
+        _insert_rows(conn, spec, [(None, report)], start=position)
+        version = _bump_version(conn, filename)
+        _record_change(conn, username, report.get('id'), version, False)
+        if rollup_diff is not None:
+            _apply_rollups(conn, rollup_diff(None, report))
+    return str(version)
+
+
+def replace_report(username: str, report: Dict[str, Any], rollup_diff: Optional[RollupDiff] = None) -> Optional[str]:
+    """同じIDの日報を1行更新し、新しいバージョンを返す（見つからない場合はNone）
+
+    rollup_diffはinsert_reportと同じ（変更前の日報は同じトランザクション内で読み込んだ内容）。
+    """
+    filename = f'reports_{username}.json'
+    spec = _table_spec(filename)
+    with _write() as conn:
+        row = _get_report_row(conn, username, report.get('id'))
+        if row is None:
+            return None
+        values = _row_values(spec, report)
+        conn.execute(
+            'UPDATE reports SET date = ?, updated_at = ?, data = ? WHERE rowid = ?',
+            (values[2], values[3], _dumps(report), row[0])
+        )
+        version = _bump_version(conn, filename)
+        _record_change(conn, username, report.get('id'), version, False)
+        if rollup_diff is not None:
+            _apply_rollups(conn, rollup_diff(json.loads(row[1]), report))
+    return str(version)
+
+
+def delete_report(username: str, report_id: str, rollup_diff: Optional[RollupDiff] = None) -> Optional[Dict[str, Any]]:
+    """日報を削除し、削除した日報を返す（見つからない場合はNone）
+
+    rollup_diffはinsert_reportと同じ（変更後の日報はNone）。
+    """
+    filename = f'reports_{username}.json'
+    with _write() as conn:
+        _ensure_reports_document(conn, filename)
+        row = _get_report_row(conn, username, report_id)
+        conn.execute('DELETE FROM reports WHERE username = ? AND id = ?', (username, report_id))
+        version = _bump_version(conn, filename)
+        if row is None:
+            return None
+        deleted = json.loads(row[1])
+        _record_change(conn, username, report_id, version, True)
+        if rollup_diff is not None:
+            _apply_rollups(conn, rollup_diff(deleted, None))
+    return deleted
+
+
+def load_rollup(filename: str) -> List[Tuple[str, str, Any]]:
+    """集計表の行を (キー1, キー2, 工数) のリストで取得"""
+    return [tuple(row) for row in get_connection().execute(
+        'SELECT key1, key2, minutes FROM report_rollups WHERE filename = ? ORDER BY key1, key2', (filename,)
+    ).fetchall()]
+
+
+def rebuild_rollups(compute: Callable[[List[Tuple[str, Dict[str, Any]]]], RollupRows],
+                    marker_filename: str, marker: Any) -> int:
+    """全ての日報から集計表を作り直し、作成した集計表の数を返す
+
+    computeは (ユーザー名, 日報) のリストから集計表の行を求める関数。日報の読み込みから保存までを
+    1つのトランザクションで行うため、同時に書き込まれた日報の差分が失われることはない。
+    作成後にmarker_filenameのドキュメントをmarkerの内容で保存する。
+    """
+    with _write() as conn:
+        reports = [(row[0], json.loads(row[1])) for row in conn.execute(
+            'SELECT username, data FROM reports ORDER BY username, position'
+        ).fetchall()]
+        rows = compute(reports)
+        previous = [row[0] for row in conn.execute('SELECT DISTINCT filename FROM report_rollups').fetchall()]
+        conn.execute('DELETE FROM report_rollups')
+        for filename in previous:
+            _bump_version(conn, filename)
+        _apply_rollups(conn, rows)
+        _put_envelope(conn, marker_filename, marker, False)
+        _bump_version(conn, marker_filename)
+    return len(rows)
+
+
+def load_report_changes(username: str, after: Tuple[int, str] = (-1, '')) -> List[Tuple[int, str, bool]]:
+    """(seq, 日報ID)がafterより後の変更を (seq, 日報ID, 削除済みか) のseq・ID順のリストで返す
+
+    変更が記録される前から保存されている日報はseq=0の変更として含める。
+    """
+    rows = get_connection().execute(
+        'SELECT seq, id, deleted FROM ('
+        '  SELECT seq, id, deleted FROM report_changes WHERE username = ?'
+        '  UNION ALL'
+        '  SELECT 0, id, 0 FROM reports WHERE username = ? AND id IS NOT NULL'
+        '    AND id NOT IN (SELECT id FROM report_changes WHERE username = ?)'
+        ') WHERE seq > ? OR (seq = ? AND id > ?) ORDER BY seq, id',
+        (username, username, username, after[0], after[0], after[1])
+    ).fetchall()
+    return [(row[0], row[1], bool(row[2])) for row in rows]
+
+if __name__ == '__main__':
+    import sys
+    # python -m backend.utils.sqlite_store import-json [データディレクトリ]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'import-json':
+        source_dir = sys.argv[2] if len(sys.argv) >= 3 else 'data'
+        conn = get_connection()
+        conn.executescript(SCHEMA)
+        print(f"{import_json_dir(source_dir)}件のJSONファイルを{SQLITE_PATH}に取り込みました")
+    else:
+        print('使い方: python -m backend.utils.sqlite_store import-json [データディレクトリ]')
+        sys.exit(1)
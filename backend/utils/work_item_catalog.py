@@ -0,0 +1,157 @@
+"""全工程の作業項目カタログ
+
+工程ごとの作業項目ファイル（work_items_{工程ID}.json）をまとめた catalog/work_items.json を保持する。
+
+    {'format': 'catalog', 'files': {ファイル名: {'work_type_id', 'version', 'items'}},
+     'revision': 階層の変更回数, 'history': {工程ID: {作業項目ID: [[リビジョン, 変更前の階層], ...]}}}
+
+全工程の作業項目はカタログ1ファイルの読み込みで取得でき、作業項目ファイルを保存した際は
+そのファイルのエントリだけを差し替える。作業項目の削除・移動（親の変更）で階層（レベル1から
+作業項目自身までのID）が変わった場合は revision を上げ、変更前の階層を history に残す。
+保存時の revision を持つ日報は、その時点の階層を history から復元できる（report_schema）。
+history は python -m backend.utils.report_store upgrade で全ての日報を保存し直した後に整理される。
+カタログが存在しない場合は全ファイルから再構築する
+（python -m backend.utils.work_item_catalog rebuild で手動再構築も可能）。
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.utils import json_manager
+from backend.utils.json_manager import load_json_with_version, save_json
+from backend.utils.work_item_tree import WorkItemTree
+
+CATALOG_FILENAME = 'catalog/work_items.json'
+WORK_ITEMS_PREFIX = 'work_items_'
+
+# 同一プロセス内でのカタログ再構築の競合を防ぐ
+_catalog_lock = threading.Lock()
+
+
+def get_work_items_filename(work_type_id: str) -> str:
+    """工程ごとの作業項目ファイル名を取得"""
+    return f'{WORK_ITEMS_PREFIX}{work_type_id}.json'
+
+
+def get_work_type_id(filename: str) -> Optional[str]:
+    """作業項目ファイル名から工程IDを抽出 (work_items_{work_type_id}.json)"""
+    if filename.startswith(WORK_ITEMS_PREFIX) and filename.endswith('.json'):
+        return filename[len(WORK_ITEMS_PREFIX):-len('.json')]
+    return None
+
+
+def _make_entry(filename: str, data: Dict[str, Any], version: Optional[str]) -> Dict[str, Any]:
+    """カタログのエントリを作成（各アイテムにwork_type_idを設定）"""
+    work_type_id = get_work_type_id(filename)
+    items = data.get('items', [])
+    for item in items:
+        # まだ設定されていない場合のみ
+        if 'work_type_id' not in item or item['work_type_id'] is None:
+            item['work_type_id'] = work_type_id
+    return {'work_type_id': work_type_id, 'version': version, 'items': items}
+
+
+def _record_history(catalog: Dict[str, Any], old_entry: Optional[Dict[str, Any]], new_entry: Dict[str, Any],
+                    revision: int) -> bool:
+    """エントリの差し替えで削除・移動された作業項目の変更前の階層を history に記録する（記録した場合はTrue）"""
+    if not old_entry:
+        return False
+    old_tree = WorkItemTree(old_entry.get('items', []))
+    new_tree = WorkItemTree(new_entry['items'])
+    changed = {}
+    for item in old_entry.get('items', []):
+        old_path = old_tree.id_path(item)
+        new_item = new_tree.get(item.get('id'))
+        if new_item is None or new_tree.id_path(new_item) != old_path:
+            changed[item['id']] = old_path
+    if not changed:
+        return False
+    history = catalog.setdefault('history', {}).setdefault(str(new_entry['work_type_id']), {})
+    for item_id, old_path in changed.items():
+        history.setdefault(item_id, []).append([revision, old_path])
+    return True
+
+
+def rebuild_catalog() -> Dict[str, Any]:
+    """全ての作業項目ファイルからカタログを再構築して保存（階層の変更履歴は引き継ぐ）"""
+    with _catalog_lock:
+        previous, _ = load_json_with_version(CATALOG_FILENAME)
+        revision = previous.get('revision', 0)
+        catalog = {'format': 'catalog', 'files': {}, 'revision': revision, 'history': previous.get('history', {})}
+        for filename in sorted(json_manager.list_files(WORK_ITEMS_PREFIX)):
+            data, version = load_json_with_version(filename)
+            entry = _make_entry(filename, data, version)
+            if _record_history(catalog, previous.get('files', {}).get(filename), entry, revision + 1):
+                catalog['revision'] = revision + 1
+            catalog['files'][filename] = entry
+        save_json(CATALOG_FILENAME, catalog)
+        print(f"[work_item_catalog] カタログを再構築しました: {len(catalog['files'])}ファイル")
+        return catalog
+
+
+def load_catalog() -> Tuple[Dict[str, Any], Optional[str]]:
+    """カタログとそのバージョンを取得（存在しない場合は再構築）"""
+    catalog, version = load_json_with_version(CATALOG_FILENAME)
+    if catalog.get('format') != 'catalog':
+        rebuild_catalog()
+        catalog, version = load_json_with_version(CATALOG_FILENAME)
+    return catalog, version
+
+
+def update_catalog_file(filename: str):
+    """作業項目ファイルの保存後に、カタログのエントリをそのファイルの最新の内容で差し替える
+
+    複数のプロセスから続けて保存された場合も最新の内容が残るよう、作業項目ファイルは
+    カタログのtransaction内で読み直す。削除・移動された作業項目は変更前の階層を記録する。
+    """
+    def update(catalog):
+        if catalog.get('format') != 'catalog':
+            return False
+        data, version = load_json_with_version(filename, revalidate=True)
+        entry = _make_entry(filename, data, version)
+        revision = catalog.get('revision', 0) + 1
+        if _record_history(catalog, catalog['files'].get(filename), entry, revision):
+            catalog['revision'] = revision
+        catalog['files'][filename] = entry
+        return True
+
+    if not json_manager.update_json(CATALOG_FILENAME, update):
+        rebuild_catalog()
+
+
+def prune_history(revision: int) -> int:
+    """リビジョンrevision以前の階層の変更履歴を削除し、削除した件数を返す
+
+    全ての日報がrevision以降のリビジョンで保存し直された後に呼び出す（report_store.upgrade_all）。
+    """
+    def prune(catalog):
+        count = 0
+        for work_type_id, items in list(catalog.get('history', {}).items()):
+            for item_id, entries in list(items.items()):
+                kept = [entry for entry in entries if entry[0] > revision]
+                count += len(entries) - len(kept)
+                if kept:
+                    items[item_id] = kept
+                else:
+                    del items[item_id]
+            if not items:
+                del catalog['history'][work_type_id]
+        return count
+    return json_manager.update_json(CATALOG_FILENAME, prune)
+
+
+def load_all_work_items() -> List[Tuple[str, Optional[str], List[Dict[str, Any]]]]:
+    """全工程の作業項目を (ファイル名, バージョン, 作業項目リスト) のリストで取得（ファイル名順）"""
+    catalog, _ = load_catalog()
+    files = catalog.get('files', {})
+    return [(filename, files[filename].get('version'), files[filename].get('items', []))
+            for filename in sorted(files)]
+
+
+if __name__ == '__main__':
+    import sys
+    # python -m backend.utils.work_item_catalog rebuild
+    if len(sys.argv) >= 2 and sys.argv[1] == 'rebuild':
+        rebuild_catalog()
+    else:
+        print('使い方: python -m backend.utils.work_item_catalog rebuild')
+        sys.exit(1)
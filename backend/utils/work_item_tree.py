@@ -0,0 +1,204 @@
+"""作業項目の木構造
+
+作業項目のリスト（parent_idで親子関係を表す）から、1回の走査で
+IDマップ・子項目マップを構築し、最下層判定・階層パス・深さ・行きがけ順を
+O(1)〜O(深さ)で引けるようにする。
+"""
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+Item = Dict[str, Any]
+
+
+class WorkItemTree:
+    """作業項目の木構造（items の順序を兄弟間の順序として保持する）"""
+
+    def __init__(self, items: Iterable[Item]):
+        self.items: List[Item] = list(items)
+        # 同じIDが複数ある場合は最初の項目を採用する（従来の next(...) と同じ）
+        self.by_id: Dict[Any, Item] = {}
+        self.children: Dict[Any, List[Item]] = {}
+        for item in self.items:
+            self.by_id.setdefault(item.get('id'), item)
+            self.children.setdefault(item.get('parent_id'), []).append(item)
+        self._path_cache: Dict[Any, List[str]] = {}
+        self._id_path_cache: Dict[Any, List[Any]] = {}
+
+    def get(self, item_id: Any) -> Optional[Item]:
+        """IDから項目を取得"""
+        return self.by_id.get(item_id)
+
+    def get_children(self, item_id: Any) -> List[Item]:
+        """子項目のリストを取得"""
+        return self.children.get(item_id, [])
+
+    def is_leaf(self, item_id: Any) -> bool:
+        """最下層の項目か（子項目が存在しない = 最下層）"""
+        return item_id not in self.children
+
+    def leaf_items(self) -> List[Item]:
+        """最下層の項目のみを元の順序で取得"""
+        return [item for item in self.items if self.is_leaf(item.get('id'))]
+
+    def _ancestor_chain(self, item: Item) -> List[Item]:
+        """項目自身から親をたどった項目のリスト（循環参照は打ち切る）"""
+        chain = [item]
+        seen = {id(item)}
+        parent_id = item.get('parent_id')
+        while parent_id:
+            parent = self.by_id.get(parent_id)
+            if parent is None or id(parent) in seen:
+                break
+            chain.append(parent)
+            seen.add(id(parent))
+            parent_id = parent.get('parent_id')
+        return chain
+
+    def path(self, item: Item) -> List[str]:
+        """項目の階層パス（レベル1から順に項目名）を取得"""
+        parent_id = item.get('parent_id')
+        if not parent_id or parent_id not in self.by_id:
+            return [item.get('name', '')]
+        parent_path = self._path_cache.get(parent_id)
+        if parent_path is None:
+            chain = self._ancestor_chain(self.by_id[parent_id])
+            parent_path = [node.get('name', '') for node in reversed(chain)]
+            self._path_cache[parent_id] = parent_path
+        return parent_path + [item.get('name', '')]
+
+    def id_path(self, item: Item) -> List[Any]:
+        """項目の階層パス（レベル1から順に項目ID）を取得"""
+        parent_id = item.get('parent_id')
+        if not parent_id or parent_id not in self.by_id:
+            return [item.get('id')]
+        parent_path = self._id_path_cache.get(parent_id)
+        if parent_path is None:
+            chain = self._ancestor_chain(self.by_id[parent_id])
+            parent_path = [node.get('id') for node in reversed(chain)]
+            self._id_path_cache[parent_id] = parent_path
+        return parent_path + [item.get('id')]
+
+    def depth(self, item: Item) -> int:
+        """項目の深さ（ルートが1）"""
+        return len(self.path(item))
+
+    def preorder(self) -> List[Item]:
+        """行きがけ順（親の直後に子孫が続く順）の項目リスト
+
+        親が存在しない項目はルートとして扱い、循環参照している項目は最後に追加する。
+        """
+        ordered: List[Item] = []
+        visited: Set[int] = set()
+        roots = [item for item in self.items
+                 if not item.get('parent_id') or item.get('parent_id') not in self.by_id]
+        for root in roots:
+            stack = [root]
+            while stack:
+                item = stack.pop()
+                if id(item) in visited:
+                    continue
+                visited.add(id(item))
+                ordered.append(item)
+                stack.extend(reversed(self.get_children(item.get('id'))))
+        ordered.extend(item for item in self.items if id(item) not in visited)
+        return ordered
+
+    def descendant_ids(self, item_id: Any) -> Set[Any]:
+        """項目IDとその全ての子孫IDを取得"""
+        result = {item_id}
+        stack = [item_id]
+        while stack:
+            for child in self.get_children(stack.pop()):
+                child_id = child.get('id')
+                if child_id not in result:
+                    result.add(child_id)
+                    stack.append(child_id)
+        return result
+
+    def ids_with_matching_leaf(self, predicate: Callable[[Item], bool]) -> Set[Any]:
+        """配下（自身を含む）に条件を満たす最下層項目がある項目IDの集合を取得
+
+        子から親へ1回だけ伝播させるため、項目数に対して線形時間で計算できる。
+        """
+        matched: Set[Any] = set()
+        for item_id, item in self.by_id.items():
+            if self.is_leaf(item_id) and predicate(item):
+                matched.add(item_id)
+        # 同じIDの項目が複数ある場合も全ての親へ伝播させる
+        parent_ids: Dict[Any, List[Any]] = {}
+        for item in self.items:
+            parent_ids.setdefault(item.get('id'), []).append(item.get('parent_id'))
+        # 条件を満たす最下層項目から祖先へ伝播
+        stack = list(matched)
+        while stack:
+            for parent_id in parent_ids.get(stack.pop(), []):
+                if parent_id in self.by_id and parent_id not in matched:
+                    matched.add(parent_id)
+                    stack.append(parent_id)
+        return matched
+
+
+# 担当種別ごとの表示可能項目キャッシュ
+# キー -> (ファイルのバージョン, 木構造, 担当種別 -> 表示可能な項目のインデックス集合)
+# 担当種別Noneは「担当種別が設定されていない最下層項目」のみを対象とした集合
+_visibility_cache: Dict[str, Tuple[str, WorkItemTree, Dict[Optional[str], FrozenSet[int]]]] = {}
+_visibility_lock = threading.Lock()
+
+
+def _category_predicate(category: Optional[str]) -> Callable[[Item], bool]:
+    """最下層項目が担当種別から見えるかの判定関数（担当種別未設定の項目は全員に見える）"""
+    if category is None:
+        return lambda item: not item.get('担当種別', [])
+
+    def predicate(item: Item) -> bool:
+        item_categories = item.get('担当種別', [])
+        return not item_categories or category in item_categories
+    return predicate
+
+
+def _compute_visible_indices(tree: WorkItemTree, category: Optional[str]) -> FrozenSet[int]:
+    """担当種別から見える項目（配下に見える最下層項目がある項目を含む）のインデックス集合"""
+    predicate = _category_predicate(category)
+    matched = tree.ids_with_matching_leaf(predicate)
+    visible = set()
+    for index, item in enumerate(tree.items):
+        item_id = item.get('id')
+        if tree.is_leaf(item_id):
+            if predicate(item):
+                visible.add(index)
+        elif item_id in matched:
+            visible.add(index)
+    return frozenset(visible)
+
+
+def filter_visible_items(cache_key: str, version: Optional[str], items: List[Item],
+                         user_categories: List[str]) -> List[Item]:
+    """ユーザーの担当種別から見える作業項目を元の順序で取得
+
+    表示可能な項目の集合は担当種別ごとに1回の走査で計算し、cache_key（ファイル名）と
+    バージョンの組でキャッシュする。ファイルが保存されるとバージョンが変わるため自動的に再計算される。
+    """
+    with _visibility_lock:
+        entry = _visibility_cache.get(cache_key)
+        if entry is None or version is None or entry[0] != version:
+            entry = (version, WorkItemTree(items), {})
+            if version is not None:
+                _visibility_cache[cache_key] = entry
+        _, tree, index_sets = entry
+        visible: Set[int] = set()
+        for category in [None] + list(user_categories):
+            indices = index_sets.get(category)
+            if indices is None:
+                indices = _compute_visible_indices(tree, category)
+                index_sets[category] = indices
+            visible.update(indices)
+    return [items[index] for index in sorted(visible) if index < len(items)]
+
+
+def invalidate_visibility_cache(cache_key: Optional[str] = None):
+    """表示可能項目キャッシュを破棄（cache_key未指定の場合は全て）"""
+    with _visibility_lock:
+        if cache_key is None:
+            _visibility_cache.clear()
+        else:
+            _visibility_cache.pop(cache_key, None)
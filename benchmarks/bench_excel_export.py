@@ -0,0 +1,171 @@
+"""Excelエクスポートの処理時間・ピークメモリ・残存一時ファイルを計測するベンチマーク
+
+使い方:
+    python benchmarks/bench_excel_export.py --users 20 --reports 300 --items 200
+    python benchmarks/bench_excel_export.py --repo /path/to/other/checkout   # 別のチェックアウトと比較
+
+エクスポートAPIをFlaskのテストクライアントで呼び出すため、別のチェックアウトに対しても
+同じ条件で計測できる。各エクスポートは一時ディレクトリ（TMPDIRも専用）内の別プロセスで実行し、
+実行後にTMPDIRに残ったファイル数を「残存一時ファイル」として数える。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ID = 'bench-project'
+
+EXPORTS = {
+    'work_items': '/api/masters/work-items/export?work_type_id={work_type_id}',
+    'project_user': f'/api/masters/projects/export?project_id={PROJECT_ID}&format=user',
+    'project_detail': f'/api/masters/projects/export?project_id={PROJECT_ID}&format=detail',
+    'project_view': '/api/masters/reports/export-project-view',
+}
+
+
+def write_json(data_dir, filename, data):
+    with open(os.path.join(data_dir, filename), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def make_work_items(count):
+    """3階層（大項目 > 中項目 > 最下層）の作業項目を作成"""
+    items = []
+    for top in range(max(1, count // 50)):
+        top_id = str(uuid.uuid4())
+        items.append({'id': top_id, 'name': f'大項目{top}', 'level': 1, 'parent_id': None})
+        for mid in range(5):
+            mid_id = str(uuid.uuid4())
+            items.append({'id': mid_id, 'name': f'中項目{top}-{mid}', 'level': 2, 'parent_id': top_id})
+            for leaf in range(10):
+                items.append({
+                    'id': str(uuid.uuid4()), 'name': f'作業{top}-{mid}-{leaf}', 'level': 3,
+                    'parent_id': mid_id, 'attribute': None, 'target_minutes': 30,
+                    'checklist': ['確認'], 'method': [], 'internal_leadtime': False,
+                    'external_leadtime': False, 'internal_leadtime_items': [],
+                    'external_leadtime_items': [], '担当種別': []
+                })
+    return items
+
+
+def prepare_data(data_dir, args):
+    """ベンチマーク用のデータ（旧形式の日報ファイル）を作成"""
+    os.makedirs(data_dir, exist_ok=True)
+    work_types = [{'id': str(uuid.uuid4()), 'name': f'工程{i}'} for i in range(args.work_types)]
+    leaves = {}
+    for work_type in work_types:
+        items = make_work_items(args.items)
+        write_json(data_dir, f"work_items_{work_type['id']}.json", {'items': items})
+        leaves[work_type['id']] = [item['id'] for item in items if item['level'] == 3]
+    write_json(data_dir, 'work_types.json', {'work_types': work_types})
+    write_json(data_dir, 'projects.json', {'projects': [
+        {'id': PROJECT_ID, 'name': 'ベンチマーク', 'status': '実行中',
+         'work_type_ids': [wt['id'] for wt in work_types], 'completed_date': None}
+    ]})
+    users = {'admin': {'username': 'admin', 'password': '', 'role': 'admin', '担当種別': 'all'}}
+    for u in range(args.users):
+        username = f'user{u}'
+        users[username] = {'username': username, 'password': '', 'role': 'user', '担当種別': []}
+        reports = []
+        for r in range(args.reports):
+            work_type_id = work_types[r % len(work_types)]['id']
+            leaf_ids = leaves[work_type_id]
+            reports.append({
+                'id': str(uuid.uuid4()),
+                'date': f'{2020 + r // 336:04d}-{(r // 28) % 12 + 1:02d}-{r % 28 + 1:02d}',
+                'projects': [{'project_id': PROJECT_ID, 'work_items': [
+                    {'work_item_id': leaf_ids[(r * 3 + k + u) % len(leaf_ids)], 'work_type_id': work_type_id,
+                     'minutes': 30, 'checklist': []} for k in range(3)
+                ]}],
+                'work_items': [],
+                'created_at': '2020-01-01T00:00:00',
+                'updated_at': '2020-01-01T00:00:00',
+            })
+        write_json(data_dir, f'reports_{username}.json', {'reports': reports})
+    write_json(data_dir, 'users.json', users)
+    return work_types[0]['id']
+
+
+def run_worker(args):
+    """子プロセス側: 1種類のエクスポートを計測"""
+    sys.path.insert(0, args.repo)
+    work_type_id = prepare_data('data', args)
+    from app import app
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['username'] = 'admin'
+        s['role'] = 'admin'
+        s['担当種別'] = 'all'
+    url = EXPORTS[args.export].format(work_type_id=work_type_id)
+
+    # 1回目は日報の読み込み（旧形式からの移行を含む）を温めるため計測しない
+    response = client.get(url)
+    response.close()
+
+    start = time.perf_counter()
+    response = client.get(url)
+    size = len(response.get_data())
+    response.close()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    response = client.get(url)
+    response.get_data()
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({'status': response.status_code, 'seconds': elapsed, 'peak': peak, 'bytes': size}))
+
+
+def run_export(name, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        tmpdir = os.path.join(workdir, 'tmp')
+        os.makedirs(tmpdir)
+        # 2回目以降もエクスポートを生成するよう、生成済みファイルのキャッシュは無効にする
+        env = dict(os.environ, USE_S3='false', USE_SQLITE='false', TMPDIR=tmpdir, EXPORT_CACHE_MAX_BYTES='0')
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--export', name,
+             '--repo', args.repo, '--users', str(args.users), '--reports', str(args.reports),
+             '--items', str(args.items), '--work-types', str(args.work_types)],
+            cwd=workdir, env=env
+        )
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        result['leaked'] = sum(len(files) for _, _, files in os.walk(tmpdir))
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repo', default=REPO_ROOT, help='計測するチェックアウトのパス')
+    parser.add_argument('--users', type=int, default=20, help='ユーザー数')
+    parser.add_argument('--reports', type=int, default=300, help='ユーザーあたりの日報件数')
+    parser.add_argument('--items', type=int, default=200, help='工程あたりの作業項目数（目安）')
+    parser.add_argument('--work-types', type=int, default=4, help='工程数')
+    parser.add_argument('--exports', default=','.join(EXPORTS), help='計測するエクスポート（カンマ区切り）')
+    parser.add_argument('--export', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.repo = os.path.abspath(args.repo)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f'ユーザー {args.users}人 × 日報 {args.reports}件 / 工程 {args.work_types} × 作業項目 約{args.items}件')
+    print(f'{"export":<16}{"status":>8}{"秒":>10}{"ピーク(MB)":>12}{"サイズ(KB)":>12}{"残存一時ファイル":>16}')
+    for name in args.exports.split(','):
+        r = run_export(name, args)
+        print(f'{name:<16}{r["status"]:>8}{r["seconds"]:>10.3f}{r["peak"] / 1024 / 1024:>12.1f}'
+              f'{r["bytes"] / 1024:>12.1f}{r["leaked"]:>16}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""作業項目Excelインポートの処理時間とピークメモリを計測するベンチマーク
+
+使い方:
+    python benchmarks/bench_excel_import.py --rows 10000,50000
+    python benchmarks/bench_excel_import.py --repo /path/to/other/checkout   # 別のチェックアウトと比較
+
+作業項目エクスポートと同じ列構成（4階層、リードタイム「あり」でUUID空欄の行を含む）の
+シートを生成し、import_work_items_from_excel をファイルとストリームの両方から呼び出して計測する。
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from openpyxl import Workbook
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = [
+    'UUID', 'レベル1', 'レベル2', 'レベル3', 'レベル4', 'チェックリスト', '手段',
+    '属性', '目標工数（分）', '社内リードタイム', '社内リードタイムUUID',
+    '社外リードタイム', '社外リードタイムUUID', '担当種別'
+]
+
+
+def make_workbook(rows):
+    """rows行の作業項目シートを作成（10行に1行は前の行をリードタイム対象とする）"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='作業項目')
+    ws.append(HEADERS)
+    for i in range(rows):
+        leadtime = 'あり' if i % 10 == 9 else 'なし'
+        ws.append([
+            str(uuid.uuid4()), f'大項目{i // 2500}', f'中項目{i // 250}', f'小項目{i // 25}', f'作業{i}',
+            '確認1\n確認2', '手段', '属性', 30, leadtime, '', 'なし', '', '営業,設計'
+        ])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repo', default=REPO_ROOT, help='計測するチェックアウトのパス')
+    parser.add_argument('--rows', default='10000,50000', help='行数（カンマ区切り）')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.repo))
+    from backend.utils.excel_manager import import_work_items_from_excel
+
+    print(f'{"rows":>8}{"source":>10}{"items":>10}{"秒":>10}{"ピーク(MB)":>12}')
+    for rows in [int(r) for r in args.rows.split(',')]:
+        content = make_workbook(rows)
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'work_items.xlsx')
+            with open(path, 'wb') as f:
+                f.write(content)
+            sources = [
+                ('file', lambda: import_work_items_from_excel(path)),
+                ('stream', lambda: import_work_items_from_excel(io.BytesIO(content))),
+            ]
+            for source, func in sources:
+                items, elapsed, peak = measure(func)
+                print(f'{rows:>8}{source:>10}{len(items):>10}{elapsed:>10.2f}{peak / 1024 / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
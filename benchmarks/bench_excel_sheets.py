@@ -0,0 +1,162 @@
+"""工程ごとのシートの行をプロセスプールで計算した場合のエクスポート時間を計測するベンチマーク
+
+使い方:
+    python benchmarks/bench_excel_sheets.py --processes 1,2,4,8 --work-types 7
+    python benchmarks/bench_excel_sheets.py --repo /path/to/other/checkout   # 別のチェックアウトと比較
+
+プロジェクト（ユーザー別・詳細）とプロジェクト別表示のエクスポートを、EXCEL_EXPORT_PROCESSESを
+変えた別プロセスで実行し、処理時間と逐次実行（1プロセス）に対する速度比を表示する。
+あわせて保存したブックのセルの値と塗りつぶしが逐次実行と一致するかを確認する。
+シートへの書き出し（XMLの生成）は親プロセスで行うため、並列化されるのは行の計算のみ。
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPORTS = ['project_user', 'project_detail', 'project_view']
+
+
+def make_work_items(rng, count):
+    """4階層（大項目 > 中項目 > 小項目 > 作業）の作業項目を作成"""
+    items = []
+    leaf_ids = []
+    for top in range(max(1, count // 100)):
+        top_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        items.append({'id': top_id, 'name': f'大項目{top}', 'level': 1, 'parent_id': None})
+        for mid in range(4):
+            mid_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            items.append({'id': mid_id, 'name': f'中項目{top}-{mid}', 'level': 2, 'parent_id': top_id})
+            for low in range(3):
+                low_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                items.append({'id': low_id, 'name': f'小項目{top}-{mid}-{low}', 'level': 3, 'parent_id': mid_id})
+                for leaf in range(8):
+                    leaf_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                    items.append({
+                        'id': leaf_id, 'name': f'作業{top}-{mid}-{low}-{leaf}', 'level': 4, 'parent_id': low_id,
+                        'internal_leadtime_items': [leaf_ids[-1]] if leaf_ids and leaf % 4 == 3 else [],
+                        'external_leadtime_items': [],
+                    })
+                    leaf_ids.append(leaf_id)
+    return items, leaf_ids
+
+
+def make_data(args):
+    """エクスポート関数に渡すデータを作成（同じ引数なら同じデータ）"""
+    rng = random.Random(0)
+    work_types = [{'id': f'wt{i}', 'name': f'工程{i}'} for i in range(args.work_types)]
+    work_items_by_type = {}
+    leaves = {}
+    for work_type in work_types:
+        items, leaf_ids = make_work_items(rng, args.items)
+        work_items_by_type[work_type['id']] = items
+        leaves[work_type['id']] = leaf_ids
+    projects = [{'id': f'p{i}', 'name': f'プロジェクト{i}', 'work_type_ids': [wt['id'] for wt in work_types]}
+                for i in range(args.projects)]
+    reports = []
+    for u in range(args.users):
+        for r in range(args.reports):
+            work_type_id = rng.choice(work_types)['id']
+            reports.append({
+                'username': f'user{u}',
+                'date': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                'projects': [{'project_id': rng.choice(projects)['id'], 'work_items': [
+                    {'work_item_id': rng.choice(leaves[work_type_id]), 'work_type_id': work_type_id, 'minutes': 30}
+                    for _ in range(3)
+                ]}],
+            })
+    return work_types, projects, work_items_by_type, reports
+
+
+def workbook_digest(content):
+    """保存したブックのシート名・セルの値・塗りつぶし色のハッシュ"""
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(content), read_only=True)
+    digest = hashlib.sha256()
+    for ws in wb.worksheets:
+        digest.update(ws.title.encode('utf-8'))
+        for row in ws.iter_rows():
+            for cell in row:
+                color = cell.fill.start_color.rgb if cell.fill is not None and cell.fill.fill_type else None
+                digest.update(repr((cell.value, color)).encode('utf-8'))
+    wb.close()
+    return digest.hexdigest()
+
+
+def run_worker(args):
+    """子プロセス側: 1種類のエクスポートを計測"""
+    sys.path.insert(0, args.repo)
+    from backend.utils import excel_manager
+
+    work_types, projects, work_items_by_type, reports = make_data(args)
+    project = projects[0]
+    exports = {
+        'project_user': lambda: excel_manager.export_project_to_excel(project, work_types, work_items_by_type, reports),
+        'project_detail': lambda: excel_manager.export_project_to_excel_detail(project, work_types, work_items_by_type, reports),
+        'project_view': lambda: excel_manager.export_project_view_to_excel(work_types, projects, work_items_by_type, reports),
+    }
+    export = exports[args.export]
+
+    # 1回目はプロセスプールの起動を含むため計測しない
+    export().save(io.BytesIO())
+
+    start = time.perf_counter()
+    stream = io.BytesIO()
+    export().save(stream)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'digest': workbook_digest(stream.getvalue())}))
+
+
+def run_export(name, processes, args):
+    env = dict(os.environ, EXCEL_EXPORT_PROCESSES=str(processes))
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--worker', '--export', name, '--repo', args.repo,
+         '--users', str(args.users), '--reports', str(args.reports), '--items', str(args.items),
+         '--work-types', str(args.work_types), '--projects', str(args.projects)],
+        env=env
+    )
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repo', default=REPO_ROOT, help='計測するチェックアウトのパス')
+    parser.add_argument('--processes', default=f'1,2,4,{os.cpu_count() or 1}', help='プロセス数（カンマ区切り）')
+    parser.add_argument('--users', type=int, default=20, help='ユーザー数')
+    parser.add_argument('--reports', type=int, default=300, help='ユーザーあたりの日報件数')
+    parser.add_argument('--items', type=int, default=1000, help='工程あたりの作業項目数（目安）')
+    parser.add_argument('--work-types', type=int, default=7, help='工程数')
+    parser.add_argument('--projects', type=int, default=5, help='プロジェクト数')
+    parser.add_argument('--exports', default=','.join(EXPORTS), help='計測するエクスポート（カンマ区切り）')
+    parser.add_argument('--export', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.repo = os.path.abspath(args.repo)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    process_counts = sorted({int(p) for p in args.processes.split(',')})
+    print(f'CPU {os.cpu_count()} / ユーザー {args.users}人 × 日報 {args.reports}件 / '
+          f'工程 {args.work_types} × 作業項目 約{args.items}件 / プロジェクト {args.projects}')
+    print(f'{"export":<16}{"processes":>10}{"秒":>10}{"速度比":>10}{"逐次と一致":>12}')
+    for name in args.exports.split(','):
+        baseline = run_export(name, 1, args)
+        for processes in process_counts:
+            r = baseline if processes == 1 else run_export(name, processes, args)
+            speedup = baseline['seconds'] / r['seconds']
+            same = 'はい' if r['digest'] == baseline['digest'] else 'いいえ'
+            print(f'{name:<16}{processes:>10}{r["seconds"]:>10.3f}{speedup:>10.2f}{same:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""JSONファイルの保存形式（JSON_CODEC）ごとのサイズと読み書き時間を比較するベンチマーク
+
+使い方:
+    python benchmarks/bench_json_codec.py --items 5000 --reports 2000
+    python benchmarks/bench_json_codec.py --data-dir data   # 既存のデータディレクトリのファイルで計測
+
+作業項目ファイル（work_items_*.json）と月別日報ファイルに相当するデータを各形式でエンコードし、
+サイズ（S3との転送量）とエンコード・デコードの時間（1回あたりの平均、ミリ秒）を表示する。
+zstdはzstandardがインストールされていない場合はgzipで計測される。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_work_items(count):
+    """4階層の作業項目ファイルの内容を作成（葉の項目は空の配列を多く含む）"""
+    rng = random.Random(0)
+    items = []
+    parents = [None]
+    for i in range(count):
+        level = i % 4 + 1
+        item_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        items.append({
+            'id': item_id,
+            'name': f'作業項目{i}',
+            'level': level,
+            'parent_id': parents[level - 1] if level > 1 else None,
+            'internal_leadtime_items': [],
+            'external_leadtime_items': [],
+            'checklist': [{'name': f'・確認{j}', 'checked': False} for j in range(i % 3)],
+            'target_minutes': None,
+        })
+        parents = parents[:level] + [item_id]
+    return {'work_items': items}
+
+
+def make_reports(count):
+    """月別日報ファイルの内容を作成"""
+    rng = random.Random(0)
+    work_type_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(7)]
+    return {'reports': [{
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'date': f'2026-01-{i % 28 + 1:02d}',
+        'projects': [{'project_id': '1', 'work_items': [{
+            'work_item_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'work_type_id': rng.choice(work_type_ids),
+            'hierarchy': [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(4)],
+            'minutes': 30,
+            'target_minutes': None,
+            'checklist': [],
+        } for _ in range(3)]}],
+        'work_items': [],
+        'created_at': '2026-01-01T00:00:00',
+        'updated_at': '2026-01-01T00:00:00',
+    } for i in range(count)]}
+
+
+def load_data_dir(data_dir):
+    """データディレクトリ以下のJSONファイルを読み込む"""
+    from backend.utils import json_codec
+    documents = {}
+    for directory, _, files in os.walk(data_dir):
+        for name in sorted(files):
+            if name.endswith('.json'):
+                path = os.path.join(directory, name)
+                with open(path, 'rb') as f:
+                    documents[os.path.relpath(path, data_dir)] = json_codec.decode(name, f.read())
+    return documents
+
+
+def measure(codec, data, repeat):
+    from backend.utils import json_codec
+    json_codec.JSON_CODEC = codec
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body, used = json_codec.encode('bench.json', data)
+    encode_seconds = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json_codec.decode('bench.json', body)
+    decode_seconds = (time.perf_counter() - start) / repeat
+    return used, len(body), encode_seconds, decode_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repo', default=REPO_ROOT, help='計測するチェックアウトのパス')
+    parser.add_argument('--items', type=int, default=5000, help='作業項目ファイルの項目数')
+    parser.add_argument('--reports', type=int, default=2000, help='日報ファイルの日報件数')
+    parser.add_argument('--data-dir', help='計測するデータディレクトリ（指定した場合は生成データの代わりに使用）')
+    parser.add_argument('--repeat', type=int, default=5, help='1形式あたりの繰り返し回数')
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(args.repo))
+    from backend.utils import json_codec
+
+    if args.data_dir:
+        documents = load_data_dir(args.data_dir)
+    else:
+        documents = {'work_items': make_work_items(args.items), 'reports': make_reports(args.reports)}
+
+    print(f'{"document":<48}{"codec":>9}{"bytes":>12}{"比率":>8}{"encode":>10}{"decode":>10}')
+    for name, data in documents.items():
+        baseline = None
+        for codec in json_codec.CODECS:
+            used, size, encode_seconds, decode_seconds = measure(codec, data, args.repeat)
+            baseline = baseline or size
+            print(f'{name:<48}{used:>9}{size:>12}{size / baseline:>8.2f}'
+                  f'{encode_seconds * 1000:>10.2f}{decode_seconds * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""JSONバックエンドとSQLiteバックエンドの日報書き込み性能を比較するベンチマーク
+
+使い方:
+    python benchmarks/bench_storage_backends.py --reports 2000 --ops 200
+
+各バックエンドは環境変数で選択されるため、一時ディレクトリ内の別プロセスで実行する。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERNAME = 'bench'
+
+
+def make_report(day_index):
+    """ベンチマーク用の日報を1件作成"""
+    year = 2020 + day_index // 336
+    month = (day_index // 28) % 12 + 1
+    day = day_index % 28 + 1
+    return {
+        'id': str(uuid.uuid4()),
+        'date': f'{year:04d}-{month:02d}-{day:02d}',
+        'projects': [{
+            'project_id': '1',
+            'work_items': [{
+                'work_item_id': str(uuid.uuid4()),
+                'work_type_id': str(uuid.uuid4()),
+                'hierarchy': [str(uuid.uuid4()) for _ in range(4)],
+                'minutes': 30,
+                'target_minutes': None,
+                'checklist': [{'name': f'・項目{i}', 'checked': True} for i in range(6)],
+            } for _ in range(3)]
+        }],
+        'work_items': [],
+        'created_at': '2020-01-01T00:00:00',
+        'updated_at': '2020-01-01T00:00:00',
+    }
+
+
+def run_worker(args):
+    """子プロセス側: 現在の環境変数で選択されたバックエンドを計測"""
+    sys.path.insert(0, REPO_ROOT)
+    from backend.utils import report_store
+    from backend.utils.json_manager import save_json
+
+    save_json(report_store.get_user_reports_filename(USERNAME),
+              {'reports': [make_report(i) for i in range(args.reports)]})
+
+    results = {}
+    start = time.perf_counter()
+    added = []
+    for i in range(args.ops):
+        report = make_report(args.reports + i)
+        report_store.add_report(USERNAME, report)
+        added.append(report['id'])
+    results['add'] = (time.perf_counter() - start) / args.ops
+
+    start = time.perf_counter()
+    for report_id in added:
+        report_store.update_report(USERNAME, report_id, lambda r: dict(r, updated_at='2021-01-01T00:00:00'))
+    results['update'] = (time.perf_counter() - start) / args.ops
+
+    start = time.perf_counter()
+    for _ in range(args.ops):
+        report_store.get_reports_by_date(USERNAME, '2020-03-15')
+    results['by_date'] = (time.perf_counter() - start) / args.ops
+
+    print(json.dumps(results))
+
+
+def run_backend(name, env_overrides, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, USE_S3='false', USE_SQLITE='false', JSON_CACHE_TTL='0')
+        env.update(env_overrides)
+        env['SQLITE_PATH'] = os.path.join(workdir, 'bench.db')
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--worker',
+             '--reports', str(args.reports), '--ops', str(args.ops)],
+            cwd=workdir, env=env
+        )
+        return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=2000, help='既存の日報件数')
+    parser.add_argument('--ops', type=int, default=200, help='計測する操作回数')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    backends = [('json', {}), ('sqlite', {'USE_SQLITE': 'true'})]
+    print(f'既存日報 {args.reports}件 / 操作 {args.ops}回（1操作あたりの平均、ミリ秒）')
+    print(f'{"backend":<10}{"add":>12}{"update":>12}{"by_date":>12}')
+    for name, env in backends:
+        r = run_backend(name, env, args)
+        print(f'{name:<10}{r["add"] * 1000:>12.3f}{r["update"] * 1000:>12.3f}{r["by_date"] * 1000:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,42 @@ async function apiCall(endpoint, method = 'GET', data = null) {
     }
 }
 
+// クエリ文字列を作成（値が空のパラメータは除外）
+function buildQuery(params = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') {
+            query.append(key, value);
+        }
+    });
+    const queryString = query.toString();
+    return queryString ? `?${queryString}` : '';
+}
+
+// エクスポートジョブAPI
+const ExportJobAPI = {
+    get: (jobId) => apiCall(`/masters/export-jobs/${jobId}`, 'GET'),
+    download: (jobId) => {
+        // ファイルダウンロードのため、apiCallを使わずに直接fetchを使用
+        return fetch(`${API_BASE}/masters/export-jobs/${jobId}/download`, {
+            method: 'GET',
+            credentials: 'same-origin'
+        });
+    }
+};
+
+// エクスポートジョブの完了を待ち、ダウンロードのレスポンスを返す
+async function waitForExportJob(job, intervalMs = 1000) {
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        job = (await ExportJobAPI.get(job.id)).job;
+    }
+    if (job.status !== 'done') {
+        throw new Error(job.error || 'エクスポートに失敗しました');
+    }
+    return ExportJobAPI.download(job.id);
+}
+
 // 認証API
 const AuthAPI = {
     login: (username, password) => apiCall('/auth/login', 'POST', { username, password }),
@@ -37,6 +73,11 @@ const AuthAPI = {
     check: () => apiCall('/auth/check', 'GET')
 };
 
+// 起動時API（ログイン状態と参照できる全マスターをまとめて取得）
+const BootstrapAPI = {
+    get: () => apiCall('/bootstrap', 'GET')
+};
+
 // アカウントAPI
 const AccountAPI = {
     getAll: () => apiCall('/accounts/', 'GET'),
@@ -63,12 +104,10 @@ const MasterAPI = {
     addProject: (data) => apiCall('/masters/projects/add', 'POST', data),
     updateProject: (data) => apiCall('/masters/projects/update', 'PUT', data),
     deleteProject: (id) => apiCall('/masters/projects/delete', 'DELETE', { id }),
-    exportProject: (projectId, formatType = 'user') => {
-        // ファイルダウンロードのため、apiCallを使わずに直接fetchを使用
-        return fetch(`${API_BASE}/masters/projects/export?project_id=${projectId}&format=${formatType}`, {
-            method: 'GET',
-            credentials: 'same-origin'
-        });
+    exportProject: async (projectId, formatType = 'user') => {
+        // サーバー側のエクスポートジョブの完了を待ってファイルを取得
+        const result = await apiCall('/masters/projects/export/jobs', 'POST', { project_id: projectId, format: formatType });
+        return waitForExportJob(result.job);
     },
     
     // 工程
@@ -81,18 +120,19 @@ const MasterAPI = {
 
     // 日報API
 const ReportAPI = {
-    getAll: () => apiCall('/reports/', 'GET'),
-    getAllUsers: () => apiCall('/reports/all', 'GET'),  // admin専用
+    // params: { from, to, username, project_id, limit, cursor }
+    getAll: (params = {}) => apiCall(`/reports/${buildQuery(params)}`, 'GET'),
+    getAllUsers: (params = {}) => apiCall(`/reports/all${buildQuery(params)}`, 'GET'),  // admin専用
+    // params: { since, cursor, limit, username }（sinceより後に追加・更新・削除された日報）
+    getChanges: (params = {}) => apiCall(`/reports/changes${buildQuery(params)}`, 'GET'),
     add: (data) => apiCall('/reports/add', 'POST', data),
     update: (data) => apiCall('/reports/update', 'PUT', data),
     delete: (id) => apiCall('/reports/delete', 'DELETE', { id }),
     getByDate: (date) => apiCall(`/reports/date/${date}`, 'GET'),
-    exportProjectView: () => {
-        // ファイルダウンロードのため、apiCallを使わずに直接fetchを使用
-        return fetch(`${API_BASE}/masters/reports/export-project-view`, {
-            method: 'GET',
-            credentials: 'same-origin'
-        });
+    exportProjectView: async () => {
+        // サーバー側のエクスポートジョブの完了を待ってファイルを取得
+        const result = await apiCall('/masters/reports/export-project-view/jobs', 'POST');
+        return waitForExportJob(result.job);
     }
 };
 
@@ -4,13 +4,15 @@ let currentUser = null;
 
 async function checkAuth() {
     try {
-        const result = await AuthAPI.check();
+        // ログイン状態とマスターを1回のリクエストで取得
+        const result = await BootstrapAPI.get();
         if (result.logged_in) {
             currentUser = {
                 username: result.username,
                 role: result.role,
                 担当種別: result.担当種別
             };
+            setBootstrapMasters(result);
             showMainScreen();
         } else {
             showLoginScreen();
@@ -89,6 +91,12 @@ document.getElementById('login-form').addEventListener('submit', async (e) => {
                 role: result.role,
                 担当種別: result.担当種別
             };
+            try {
+                setBootstrapMasters(await BootstrapAPI.get());
+            } catch (error) {
+                // マスターは日報一覧の読み込み時に個別に取得する
+                console.error('マスターの読み込みに失敗しました:', error);
+            }
             showMainScreen();
         }
     } catch (error) {
@@ -8,36 +8,125 @@ let currentEditingReport = null;
 let projectCounter = 0;
 let workItemCounter = 0;
 let currentViewMode = 'timeline'; // timeline, date, user, project
+let lastReportSync = ''; // 差分取得の位置（サーバーが返すsync_token）
+let mastersPreloaded = false; // ログイン時にまとめて読み込んだマスターが未使用の場合true
+let reportsGeneration = 0; // 一覧を読み込み直した回数（古い読み込みの続きを破棄する）
+const ADMIN_REPORTS_PAGE_SIZE = 200; // adminの全ユーザーの日報を1回に読み込む件数
+
+// ログイン時にまとめて読み込んだマスター（/api/bootstrap）を設定
+function setBootstrapMasters(result) {
+    allWorkItems = result.work_items || [];
+    allProjects = result.projects || [];
+    allWorkTypes = result.work_types || [];
+    mastersPreloaded = true;
+}
 
 // 日報一覧読み込み
 async function loadReports() {
     try {
         // adminユーザーの場合は全ユーザーの日報を取得、それ以外は自分の日報のみ
         const isAdmin = currentUser && currentUser.role === 'admin';
-        const reportsPromise = isAdmin ? ReportAPI.getAllUsers() : ReportAPI.getAll();
-        
-        // 日報データとマスターデータを同時に読み込む
-        const [reportsResult, workItemsResult, projectsResult, workTypesResult] = await Promise.all([
-            reportsPromise,
-            MasterAPI.getWorkItems(),
-            MasterAPI.getProjects(),
-            MasterAPI.getWorkTypes()
-        ]);
-        
-        allReports = reportsResult.reports || [];
-        allWorkItems = workItemsResult.items || [];
-        allProjects = projectsResult.projects || [];
-        allWorkTypes = workTypesResult.work_types || [];
+        // 一覧より前に差分取得の位置を取得する（一覧の読み込み中の変更は次回の差分取得で反映される）
+        const syncResult = await ReportAPI.getChanges({ since: 'latest' });
+        // adminは新しい順に1ページ目だけを読み込んで表示し、残りは後から読み込む
+        const reportsPromise = isAdmin ? ReportAPI.getAllUsers({ limit: ADMIN_REPORTS_PAGE_SIZE }) : ReportAPI.getAll();
+        const generation = ++reportsGeneration;
+        let reportsResult;
+        
+        if (mastersPreloaded) {
+            // ログイン時に読み込んだマスターを使い、日報だけを読み込む
+            mastersPreloaded = false;
+            reportsResult = await reportsPromise;
+            allReports = reportsResult.reports || [];
+        } else {
+            // 日報データとマスターデータを同時に読み込む
+            let workItemsResult, projectsResult, workTypesResult;
+            [reportsResult, workItemsResult, projectsResult, workTypesResult] = await Promise.all([
+                reportsPromise,
+                MasterAPI.getWorkItems(),
+                MasterAPI.getProjects(),
+                MasterAPI.getWorkTypes()
+            ]);
+            
+            allReports = reportsResult.reports || [];
+            allWorkItems = workItemsResult.items || [];
+            allProjects = projectsResult.projects || [];
+            allWorkTypes = workTypesResult.work_types || [];
+        }
+        lastReportSync = syncResult.sync_token || '';
         
         // 表示モードタブとフィルターの設定
         setupViewModeTabs();
         
         displayReports();
+        if (reportsResult.next_cursor) {
+            loadRemainingReports(reportsResult.next_cursor, generation).catch(error => {
+                console.error('日報の読み込みに失敗しました:', error);
+            });
+        }
     } catch (error) {
         console.error('日報の読み込みに失敗しました:', error);
     }
 }
 
+// adminの一覧の2ページ目以降を読み込み、全て読み込んだ時点で表示を更新
+async function loadRemainingReports(cursor, generation) {
+    const remaining = [];
+    while (cursor) {
+        const result = await ReportAPI.getAllUsers({ limit: ADMIN_REPORTS_PAGE_SIZE, cursor });
+        remaining.push(...(result.reports || []));
+        cursor = result.next_cursor;
+    }
+    // 読み込み中に一覧が読み込み直された場合は破棄する
+    if (generation !== reportsGeneration) {
+        return;
+    }
+    // 差分取得で反映済みの日報は差分取得の内容を優先する
+    const loadedIds = new Set(allReports.map(report => report.id));
+    allReports = sortReportsNewestFirst(allReports.concat(remaining.filter(report => !loadedIds.has(report.id))));
+    displayReports();
+}
+
+// 日報を新しい順に並べ替え（同じ日付の中はユーザー名・IDの順、サーバーの一覧と同じ順序）
+function sortReportsNewestFirst(reports) {
+    const compare = (a, b) => (a < b ? -1 : a > b ? 1 : 0);
+    return reports.sort((a, b) =>
+        compare(b.date || '', a.date || '') ||
+        compare(a.username || '', b.username || '') ||
+        compare(a.id || '', b.id || ''));
+}
+
+// 前回の読み込み以降に追加・更新・削除された日報だけを取得して一覧に反映
+async function refreshReports() {
+    const isAdmin = currentUser && currentUser.role === 'admin';
+    try {
+        const reportsById = new Map(allReports.map(report => [report.id, report]));
+        let hasMore = false;
+        do {
+            const result = await ReportAPI.getChanges({ since: lastReportSync });
+            (result.changes || []).forEach(change => {
+                if (change.deleted) {
+                    reportsById.delete(change.id);
+                } else {
+                    const report = { ...change.report };
+                    if (isAdmin) {
+                        report.username = change.username;
+                    }
+                    reportsById.set(change.id, report);
+                }
+            });
+            lastReportSync = result.sync_token;
+            hasMore = Boolean(result.next_cursor);
+        } while (hasMore);
+        
+        allReports = sortReportsNewestFirst(Array.from(reportsById.values()));
+        displayReports();
+    } catch (error) {
+        console.error('日報の差分取得に失敗しました:', error);
+        await loadReports();
+    }
+}
+
 // 日報表示
 function displayReports() {
     const historyList = document.getElementById('history-list');
@@ -198,7 +287,7 @@ function displayReportsByUser() {
 }
 
 // ユーザー別カレンダー表示
-function displayUserCalendar(yearMonth, selectedUser) {
+async function displayUserCalendar(yearMonth, selectedUser) {
     const historyList = document.getElementById('history-list');
     
     // 年月を解析
@@ -207,18 +296,32 @@ function displayUserCalendar(yearMonth, selectedUser) {
     const lastDay = new Date(year, month, 0);
     const daysInMonth = lastDay.getDate();
     
-    // adminユーザーを除外して対象月の日報をフィルター
-    let monthReports = allReports.filter(report => {
-        if (!report.date) return false;
-        if (report.username === 'admin') return false; // adminを除外
-        const reportDate = new Date(report.date);
-        return reportDate.getFullYear() === year && reportDate.getMonth() + 1 === month;
-    });
+    // 対象月（選択ユーザー）の日報のみをサーバーから取得
+    let monthReports;
+    try {
+        const result = await ReportAPI.getAllUsers({
+            from: `${yearMonth}-01`,
+            to: `${yearMonth}-${String(daysInMonth).padStart(2, '0')}`,
+            username: selectedUser
+        });
+        monthReports = result.reports || [];
+    } catch (error) {
+        console.error('日報の読み込みに失敗しました:', error);
+        return;
+    }
     
-    // ユーザーが選択されている場合、そのユーザーの日報のみをフィルター
-    if (selectedUser) {
-        monthReports = monthReports.filter(report => report.username === selectedUser);
+    // 読み込み中に表示条件が変わった場合は描画しない
+    const userFilter = document.getElementById('user-filter');
+    const userMonthFilter = document.getElementById('user-month-filter');
+    if (currentViewMode !== 'user' ||
+        (userMonthFilter && userMonthFilter.value !== yearMonth) ||
+        (userFilter && userFilter.value !== selectedUser)) {
+        return;
     }
+    historyList.innerHTML = '';
+    
+    // adminユーザーを除外
+    monthReports = monthReports.filter(report => report.date && report.username !== 'admin');
     
     // ユーザーごとに日報の有無をマッピング
     const userReportMap = {};
@@ -237,14 +340,11 @@ function displayUserCalendar(yearMonth, selectedUser) {
     if (selectedUser) {
         users = [selectedUser];
     } else {
-        // 全ユーザーから対象月に日報があるユーザーを取得（adminを除外）
+        // 対象月に日報があるユーザーを取得（adminを除外済み）
         const allUsers = new Set();
-        allReports.forEach(report => {
-            if (report.username && report.username !== 'admin') {
-                const reportDate = new Date(report.date);
-                if (reportDate.getFullYear() === year && reportDate.getMonth() + 1 === month) {
-                    allUsers.add(report.username);
-                }
+        monthReports.forEach(report => {
+            if (report.username) {
+                allUsers.add(report.username);
             }
         });
         users = Array.from(allUsers).sort();
@@ -1950,8 +2050,8 @@ document.getElementById('submit-report-btn').addEventListener('click', async ()
         // フォームをリセット
         cancelReportForm();
         
-        // 日報一覧を再読み込み
-        await loadReports();
+        // 日報一覧に変更を反映
+        await refreshReports();
     } catch (error) {
         alert('日報の保存に失敗しました: ' + error.message);
     }
@@ -2081,7 +2181,7 @@ async function deleteReport(reportId) {
     
     try {
         await ReportAPI.delete(reportId);
-        await loadReports();
+        await refreshReports();
     } catch (error) {
         alert('日報の削除に失敗しました');
     }
@@ -0,0 +1,32 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils import json_manager, report_schema, sqlite_store  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """空のローカルデータディレクトリ（JSONファイル）で実行する"""
+    monkeypatch.setattr(json_manager, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(json_manager, 'USE_S3', False)
+    monkeypatch.setattr(json_manager, 'USE_SQLITE', False)
+    monkeypatch.setattr(report_schema, '_trees', None)
+    json_manager.invalidate_cache()
+    yield tmp_path
+    json_manager.invalidate_cache()
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def report_backend(request, data_dir, monkeypatch):
+    """日報ストアのバックエンド（ローカルのJSONファイルとSQLite）ごとに実行する"""
+    if request.param == 'sqlite':
+        monkeypatch.setattr(json_manager, 'USE_SQLITE', True)
+        monkeypatch.setattr(sqlite_store, 'SQLITE_PATH', str(data_dir / 'test.db'))
+        monkeypatch.setattr(sqlite_store, '_local', threading.local())
+        monkeypatch.setattr(sqlite_store, '_initialized', False)
+    yield request.param
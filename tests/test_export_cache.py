@@ -0,0 +1,72 @@
+import os
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from backend.utils import export_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """空のキャッシュと一時ディレクトリで実行する"""
+    monkeypatch.setattr(export_cache, '_entries', export_cache.OrderedDict())
+    monkeypatch.setattr(export_cache, '_total_bytes', 0)
+    monkeypatch.setattr(export_cache, '_cache_dir', str(tmp_path))
+    return tmp_path
+
+
+def builder(calls, value='x'):
+    def build():
+        calls.append(value)
+        wb = Workbook()
+        wb.active['A1'] = value
+        return wb
+    return build
+
+
+def read_cell(stream):
+    with stream:
+        return load_workbook(stream).active['A1'].value
+
+
+def test_cache_key_depends_on_params_and_versions():
+    key = export_cache.cache_key('project', {'project_id': '1'}, [('a.json', '1'), ('b.json', '2')])
+
+    assert export_cache.cache_key('project', {'project_id': '1'}, [('b.json', '2'), ('a.json', '1')]) == key
+    assert export_cache.cache_key('project', {'project_id': '1'}, [('a.json', '1'), ('b.json', '3')]) != key
+    assert export_cache.cache_key('project', {'project_id': '2'}, [('a.json', '1'), ('b.json', '2')]) != key
+
+
+def test_cached_export_is_reused(cache):
+    calls = []
+
+    assert read_cell(export_cache.open_or_build('k1', builder(calls, 'a'))) == 'a'
+    assert read_cell(export_cache.open_or_build('k1', builder(calls, 'b'))) == 'a'
+    assert read_cell(export_cache.open_or_build('k2', builder(calls, 'c'))) == 'c'
+    assert calls == ['a', 'c']
+
+
+def test_least_recently_used_export_is_evicted(cache, monkeypatch):
+    calls = []
+    read_cell(export_cache.open_or_build('k1', builder(calls)))
+    monkeypatch.setattr(export_cache, 'EXPORT_CACHE_MAX_BYTES', int(export_cache._total_bytes * 2.5))
+    read_cell(export_cache.open_or_build('k2', builder(calls)))
+    read_cell(export_cache.open_or_build('k1', builder(calls)))
+    opened = export_cache.open_or_build('k2', builder(calls))
+
+    # k1の後にk2を使ったため、k3の保存でk1が削除される（開いているk2は削除後も読める）
+    read_cell(export_cache.open_or_build('k3', builder(calls)))
+    export_cache.open_or_build('k1', builder(calls, 'rebuilt')).close()
+    assert calls == ['x', 'x', 'x', 'rebuilt']
+    assert list(export_cache._entries) == ['k3', 'k1']
+    assert not os.path.exists(export_cache._path('k2'))
+    assert read_cell(opened) == 'x'
+
+
+def test_disabled_cache_builds_every_time(cache, monkeypatch):
+    monkeypatch.setattr(export_cache, 'EXPORT_CACHE_MAX_BYTES', 0)
+    calls = []
+
+    assert read_cell(export_cache.open_or_build('k1', builder(calls, 'a'))) == 'a'
+    assert read_cell(export_cache.open_or_build('k1', builder(calls, 'b'))) == 'b'
+    assert calls == ['a', 'b'] and os.listdir(cache) == []
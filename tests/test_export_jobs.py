@@ -0,0 +1,80 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from backend.utils import export_jobs
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    """空のジョブ一覧と一時ディレクトリの結果ファイルで実行する"""
+    monkeypatch.setattr(export_jobs, '_jobs', {})
+    monkeypatch.setattr(export_jobs, '_active_by_key', {})
+    monkeypatch.setattr(export_jobs, '_result_dir', str(tmp_path))
+
+
+def wait(job):
+    deadline = time.time() + 5
+    while job.finished_at is None:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return job
+
+
+def build(content=b'xlsx', download_name='export.xlsx'):
+    return lambda: (io.BytesIO(content), download_name)
+
+
+def test_completed_job_result_is_downloaded(jobs):
+    job = wait(export_jobs.submit(('project', '1'), build()))
+
+    found, stream = export_jobs.open_result(job.id)
+    with stream:
+        assert found is job and found.to_dict()['status'] == export_jobs.DONE
+        assert (stream.read(), found.download_name) == (b'xlsx', 'export.xlsx')
+
+
+def test_pending_job_with_same_key_is_reused(jobs, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'EXPORT_JOB_MAX_PENDING', 1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_build():
+        started.set()
+        release.wait(5)
+        return io.BytesIO(b'xlsx'), 'export.xlsx'
+    job = export_jobs.submit(('project', '1'), slow_build)
+    started.wait(5)
+
+    assert export_jobs.submit(('project', '1'), build()) is job
+    assert export_jobs.submit(('project', '2'), build()) is None
+    assert export_jobs.open_result(job.id) == (job, None)
+    release.set()
+    wait(job)
+    assert export_jobs.submit(('project', '1'), build()) is not job
+
+
+def test_failed_job_has_error(jobs):
+    def fail():
+        raise ValueError('broken')
+    job = wait(export_jobs.submit(('project', '1'), fail))
+
+    assert (job.status, job.error) == (export_jobs.FAILED, 'broken')
+    assert export_jobs.open_result(job.id) == (job, None)
+
+
+def test_opened_result_survives_purge(jobs, monkeypatch):
+    job = wait(export_jobs.submit(('project', '1'), build()))
+    _, stream = export_jobs.open_result(job.id)
+    path = job.path
+
+    # ダウンロード中に期限切れで破棄されても、開いたストリームは最後まで読める
+    monkeypatch.setattr(export_jobs, 'EXPORT_JOB_TTL_SECONDS', 0)
+    assert export_jobs.get_job(job.id) is None
+    with stream:
+        assert stream.read() == b'xlsx'
+    assert not os.path.exists(path)
+    assert export_jobs.open_result(job.id) == (None, None)
@@ -0,0 +1,87 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+from backend.routes import masters, reports
+from backend.utils import http_cache, json_manager, report_store
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """日報・マスターのAPIと、本文の作成回数を数えるテスト用のエンドポイントを持つアプリ"""
+    monkeypatch.setattr(http_cache, '_responses', http_cache.OrderedDict())
+    monkeypatch.setattr(http_cache, '_total_bytes', 0)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(masters.bp)
+    app.register_blueprint(reports.bp)
+    app.builds = []
+
+    @app.route('/large/<version>')
+    def large(version):
+        def build():
+            app.builds.append(version)
+            return jsonify({'rows': ['x' * 100] * 50})
+        return http_cache.conditional_response(http_cache.make_etag([('large.json', version)]), build, cache=True)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'demo'
+        session['role'] = 'user'
+    return client
+
+
+def make_report(report_id, date):
+    return {'id': report_id, 'date': date, 'projects': [], 'work_items': []}
+
+
+def test_unchanged_document_returns_304(data_dir, client):
+    json_manager.save_json('projects.json', {'projects': [{'id': '1', 'name': 'A'}]})
+
+    response = client.get('/api/masters/projects')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get('/api/masters/projects', headers={'If-None-Match': etag})
+    assert (response.status_code, response.data, response.headers['ETag']) == (304, b'', etag)
+
+    json_manager.save_json('projects.json', {'projects': []})
+    response = client.get('/api/masters/projects', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert response.get_json() == {'projects': []}
+
+
+def test_report_writes_change_etag(report_backend, client):
+    report_store.add_report('demo', make_report('a', '2026-01-05'))
+    etag = client.get('/api/reports/').headers['ETag']
+    assert client.get('/api/reports/', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/reports/?from=2026-01-01', headers={'If-None-Match': etag}).status_code == 200
+
+    report_store.update_report('demo', 'a', lambda r: dict(r, note='edited'))
+
+    response = client.get('/api/reports/', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.get_json()['reports'][0]['note'] == 'edited'
+
+
+def test_error_response_has_no_etag(data_dir, client):
+    response = client.get('/api/reports/?username=other')
+
+    assert response.status_code == 403 and 'ETag' not in response.headers
+
+
+def test_compressed_body_is_cached_with_its_own_etag(client):
+    response = client.get('/large/1', headers={'Accept-Encoding': 'gzip'})
+    etag, _ = response.get_etag()
+    assert response.headers['Content-Encoding'] == 'gzip' and etag.endswith('-gzip')
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = gzip.decompress(response.data)
+
+    response = client.get('/large/1')
+    assert 'Content-Encoding' not in response.headers and response.data == body
+    assert response.get_etag() == (etag[:-len('-gzip')], False)
+    assert client.get('/large/1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'}).status_code == 304
+    assert client.application.builds == ['1']
+
+    client.get('/large/2')
+    assert client.application.builds == ['1', '2']
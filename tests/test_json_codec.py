@@ -0,0 +1,78 @@
+import pytest
+
+from backend.utils import json_codec, json_manager
+
+DATA = {'reports': [{'id': 'a', 'note': '日報', 'minutes': 30.5, 'tags': [None, True]}]}
+
+
+@pytest.mark.parametrize('codec', json_codec.CODECS)
+def test_codecs_round_trip(data_dir, monkeypatch, codec):
+    monkeypatch.setattr(json_codec, 'JSON_CODEC', codec)
+    body, used = json_codec.encode('reports.json', DATA)
+
+    assert used == json_codec.active_codec()
+    assert json_codec.decode('reports.json', body) == DATA
+    assert json_codec.encode('reports.json', DATA)[0] == body
+
+    json_manager.save_json('reports.json', DATA)
+    json_manager.invalidate_cache()
+    assert json_manager.load_json('reports.json') == DATA
+
+
+def test_invalid_codec_falls_back_to_pretty(monkeypatch):
+    monkeypatch.setattr(json_codec, 'JSON_CODEC', 'unknown')
+
+    assert json_codec.encode('a.json', DATA) == json_codec.encode('a.json', DATA)[:1] + ('pretty',)
+
+
+def test_recode_rewrites_files_in_current_codec(data_dir, monkeypatch):
+    json_manager.save_json('a.json', DATA)
+    json_manager.save_json('b/c.json', {'x': 1})
+    monkeypatch.setattr(json_codec, 'JSON_CODEC', 'gzip')
+
+    assert json_manager.recode_all() == (2, 2)
+    assert (data_dir / 'a.json').read_bytes().startswith(json_codec.GZIP_MAGIC)
+    json_manager.invalidate_cache()
+    assert json_manager.load_json('a.json') == DATA
+    assert json_manager.recode_all() == (0, 2)
+
+
+def test_lines_are_not_compressed(monkeypatch):
+    monkeypatch.setattr(json_codec, 'JSON_CODEC', 'gzip')
+
+    body, used = json_codec.encode('journal.ndjson', [{'seq': 1}, {'seq': 2}])
+    assert (body, used) == (b'{"seq":1}\n{"seq":2}\n', 'ndjson')
+    assert json_codec.decode('journal.ndjson', body) == [{'seq': 1}, {'seq': 2}]
+
+
+def test_truncated_last_line_is_ignored(data_dir):
+    with json_manager.appending('journal.ndjson') as (_, append):
+        append({'seq': 1})
+    with open(data_dir / 'journal.ndjson', 'ab') as f:
+        f.write(b'{"seq":2,"rep')
+
+    assert json_codec.decode('journal.ndjson', (data_dir / 'journal.ndjson').read_bytes()) == [{'seq': 1}]
+    json_manager.invalidate_cache()
+    assert json_manager.load_list_json('journal.ndjson') == [{'seq': 1}]
+
+    # 次の追記では不完全な行を削除してから書き込む（途中の行として残すとファイル全体が読めなくなる）
+    with json_manager.appending('journal.ndjson') as (records, append):
+        assert records == [{'seq': 1}]
+        append({'seq': 3})
+    json_manager.invalidate_cache()
+    assert json_manager.load_list_json('journal.ndjson') == [{'seq': 1}, {'seq': 3}]
+    assert (data_dir / 'journal.ndjson').read_bytes() == b'{"seq":1}\n{"seq":3}\n'
+
+
+def test_truncated_only_line_is_removed_before_append(data_dir):
+    (data_dir / 'journal.ndjson').write_bytes(b'{"seq":1,' * 1000)
+
+    with json_manager.appending('journal.ndjson') as (records, append):
+        assert records == []
+        append({'seq': 2})
+    assert (data_dir / 'journal.ndjson').read_bytes() == b'{"seq":2}\n'
+
+
+def test_broken_middle_line_raises():
+    with pytest.raises(ValueError):
+        json_codec.decode('journal.ndjson', b'{"seq":1}\n{"seq"\n{"seq":3}\n')
@@ -0,0 +1,76 @@
+import pytest
+
+from backend.utils import report_store
+
+
+def make_report(report_id, date, updated_at=None):
+    updated_at = updated_at or f'{date}T09:00:00'
+    return {'id': report_id, 'date': date, 'projects': [{'project_id': '1', 'work_items': []}],
+            'work_items': [], 'created_at': updated_at, 'updated_at': updated_at}
+
+
+def fetch_all(usernames, since, limit=500):
+    """next_cursorがなくなるまで差分を取得し、(変更, 最後の位置)を返す"""
+    changes = []
+    while True:
+        page, since, has_more = report_store.query_changes(usernames, since=since, limit=limit)
+        changes += page
+        if not has_more:
+            return changes, since
+
+
+def test_changes_after_latest_token(report_backend):
+    report_store.add_report('demo', make_report('a', '2026-01-05'))
+    report_store.add_report('demo', make_report('b', '2026-01-06'))
+    token = report_store.latest_sync_token(['demo'])
+
+    report_store.update_report('demo', 'a', lambda r: dict(r, note='edited'))
+    report_store.delete_report('demo', 'b')
+    changes, token = fetch_all(['demo'], token)
+
+    assert [(c['id'], c['deleted']) for c in changes] == [('a', False), ('b', True)]
+    assert changes[0]['report']['note'] == 'edited'
+    assert changes[0]['seq'] < changes[1]['seq']
+    assert fetch_all(['demo'], token)[0] == []
+
+
+def test_change_with_older_updated_at_is_not_skipped(report_backend):
+    report_store.add_report('demo', make_report('a', '2026-01-05', '2026-01-05T12:00:00'))
+    _, token = fetch_all(['demo'], None)
+
+    # 更新日時は保存前に付けられるため、後から保存された変更の方が古い更新日時を持つことがある
+    report_store.add_report('demo', make_report('b', '2026-01-05', '2026-01-05T11:59:00'))
+    changes, _ = fetch_all(['demo'], token)
+
+    assert [c['id'] for c in changes] == ['b']
+
+
+def test_paging_across_users_returns_each_change_once(report_backend):
+    token = report_store.latest_sync_token(['demo', 'demo2'])
+    for i in range(5):
+        report_store.add_report('demo', make_report(f'a{i}', '2026-01-05'))
+        report_store.add_report('demo2', make_report(f'b{i}', '2026-01-05'))
+
+    changes, token = fetch_all(['demo', 'demo2'], token, limit=3)
+
+    assert sorted(c['id'] for c in changes) == sorted([f'a{i}' for i in range(5)] + [f'b{i}' for i in range(5)])
+    assert fetch_all(['demo', 'demo2'], token)[0] == []
+
+
+def test_changes_survive_journal_compaction(data_dir):
+    report_store.add_report('demo', make_report('a', '2026-01-05'))
+    report_store.add_report('demo', make_report('b', '2026-02-05'))
+    token = report_store.latest_sync_token(['demo'])
+    report_store.delete_report('demo', 'a')
+    report_store.compact_journal('demo')
+    report_store.add_report('demo', make_report('c', '2026-02-06'))
+
+    changes, _ = fetch_all(['demo'], token)
+
+    assert [(c['id'], c['deleted']) for c in changes] == [('a', True), ('c', False)]
+    assert [c['id'] for c in fetch_all(['demo'], None)[0]] == ['b', 'a', 'c']
+
+
+def test_invalid_token_is_rejected(data_dir):
+    with pytest.raises(ValueError):
+        report_store.query_changes(['demo'], since='2026-01-01T00:00:00')
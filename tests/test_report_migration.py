@@ -0,0 +1,60 @@
+from backend.utils import json_manager, report_store
+
+
+def make_report(report_id, date):
+    return {'id': report_id, 'date': date, 'projects': [{'project_id': '1', 'work_items': []}],
+            'work_items': [], 'created_at': f'{date}T09:00:00', 'updated_at': f'{date}T09:00:00'}
+
+
+def save_legacy(username, reports):
+    json_manager.save_json(report_store.get_user_reports_filename(username), {'reports': reports})
+
+
+def test_migrate_splits_legacy_file_by_month(data_dir):
+    save_legacy('demo', [make_report('a', '2026-01-05'), make_report('b', '2026-02-01'), make_report('c', '')])
+
+    manifest = report_store.migrate_user('demo')
+
+    assert sorted(manifest['partitions']) == ['2026-01', '2026-02', 'undated']
+    assert manifest['index'] == {'a': '2026-01', 'b': '2026-02', 'c': 'undated'}
+    assert [r['id'] for r in report_store.load_user_reports('demo')] == ['a', 'b', 'c']
+    legacy = json_manager.load_json(report_store.get_user_reports_filename('demo'))
+    assert legacy['migrated_to'] == 'reports/demo/'
+    assert len(legacy['reports']) == 3
+
+
+def test_failed_manifest_read_does_not_migrate_again(data_dir, monkeypatch):
+    save_legacy('demo', [make_report('a', '2026-01-05')])
+    report_store.add_report('demo', make_report('b', '2026-01-06'))
+    report_store.compact_journal('demo')
+
+    # S3の一時的な読み込み失敗と同じく、マニフェストの読み込み結果が空になった場合
+    manifest_filename = report_store.get_manifest_filename('demo')
+    load = report_store.load_json_with_version
+    monkeypatch.setattr(report_store, 'load_json_with_version',
+                        lambda filename, revalidate=False: ({}, None) if filename == manifest_filename
+                        else load(filename, revalidate=revalidate))
+    manifest = report_store._load_manifest('demo')
+
+    assert set(manifest['index']) == {'a', 'b'}
+    monkeypatch.setattr(report_store, 'load_json_with_version', load)
+    assert [r['id'] for r in report_store.load_user_reports('demo')] == ['a', 'b']
+
+
+def test_lost_manifest_is_rebuilt_from_partitions(data_dir):
+    save_legacy('demo', [make_report('a', '2026-01-05')])
+    report_store.add_report('demo', make_report('b', '2026-02-01'))
+    report_store.compact_journal('demo')
+
+    (data_dir / 'reports' / 'demo' / 'manifest.json').unlink()
+    json_manager.invalidate_cache()
+
+    manifest = report_store._load_manifest('demo')
+    assert manifest['index'] == {'a': '2026-01', 'b': '2026-02'}
+    assert [r['id'] for r in report_store.load_user_reports('demo')] == ['a', 'b']
+
+
+def test_user_without_legacy_file_gets_empty_manifest(data_dir):
+    assert report_store.load_user_reports('nobody') == []
+    assert not (data_dir / report_store.get_user_reports_filename('nobody')).exists()
+    assert json_manager.load_json(report_store.get_manifest_filename('nobody'))['partitions'] == {}
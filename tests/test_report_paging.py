@@ -0,0 +1,34 @@
+from backend.utils import report_store
+
+
+def make_report(report_id, date):
+    return {'id': report_id, 'date': date, 'projects': [{'project_id': '1', 'work_items': []}],
+            'work_items': [], 'created_at': '2026-01-01T09:00:00', 'updated_at': '2026-01-01T09:00:00'}
+
+
+def fetch_pages(usernames, limit, **query):
+    reports, cursor = report_store.query_reports(usernames, limit=limit, **query)
+    pages = [reports]
+    while cursor:
+        reports, cursor = report_store.query_reports(usernames, limit=limit, cursor=cursor, **query)
+        pages.append(reports)
+    return pages
+
+
+def test_paging_includes_undated_reports(report_backend):
+    for report in [make_report('a', '2026-02-01'), make_report('b', ''), make_report('c', '2026-01-15'),
+                   make_report('d', '2026-01-15'), make_report('e', None)]:
+        report_store.add_report('demo', report)
+
+    pages = fetch_pages(['demo'], limit=2)
+
+    assert [[r['id'] for r in page] for page in pages] == [['a', 'c'], ['d', 'b'], ['e']]
+
+
+def test_paging_with_date_range_excludes_undated_reports(report_backend):
+    for report in [make_report('a', '2026-02-01'), make_report('b', ''), make_report('c', '2026-01-15')]:
+        report_store.add_report('demo', report)
+
+    pages = fetch_pages(['demo'], limit=1, date_to='2026-12-31')
+
+    assert [r['id'] for page in pages for r in page] == ['a', 'c']
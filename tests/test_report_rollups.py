@@ -0,0 +1,85 @@
+import pytest
+
+from backend.utils import json_manager, report_rollups, report_store
+
+
+@pytest.fixture
+def users(report_backend):
+    json_manager.save_json('users.json', {'demo': {'role': 'user'}, 'demo2': {'role': 'user'}})
+
+
+def make_report(report_id, date, project_id='1', minutes=30, work_item_id='a'):
+    return {'id': report_id, 'date': date, 'projects': [{'project_id': project_id, 'work_items': [
+        {'work_item_id': work_item_id, 'work_type_id': 'w1', 'minutes': minutes}]}], 'work_items': []}
+
+
+def rows(group, **query):
+    return [tuple(row.values()) for row in report_rollups.summarize(group, **query)]
+
+
+def test_writes_apply_report_diffs(users):
+    report_store.add_report('demo', make_report('r1', '2026-01-05'))
+    report_store.add_report('demo2', make_report('r2', '2026-01-05', minutes=15))
+    report_store.update_report('demo', 'r1', lambda r: make_report('r1', '2026-01-06', project_id='2', minutes=45))
+    report_store.add_report('demo', make_report('r3', None, minutes=10))
+    report_store.delete_report('demo2', 'r2')
+
+    assert rows('user_day') == [('demo', '2026-01-06', 45)]
+    assert rows('project_day') == [('2', '2026-01-06', 45)]
+    assert rows('project_item') == [('1', 'w1', 'a', 10), ('2', 'w1', 'a', 45)]
+    assert report_rollups.verify_rollups() == []
+
+
+def test_summary_reads_only_requested_shards(users):
+    report_store.add_report('demo', make_report('r1', '2026-01-05'))
+    report_store.add_report('demo2', make_report('r2', '2026-02-05', project_id='2', minutes=15))
+
+    assert rows('user_day', usernames=['demo2']) == [('demo2', '2026-02-05', 15)]
+    assert rows('project_day', project_id='1', date_from='2026-01-01', date_to='2026-01-31') == [('1', '2026-01-05', 30)]
+    filenames = [filename for filename, _ in report_rollups.summary_versions('user_day', ['demo'])]
+    assert filenames == [report_rollups.MANIFEST_FILENAME, 'rollups/user_day/demo.json']
+
+
+def test_rollups_are_built_from_existing_reports(users):
+    report_store.add_report('demo', make_report('r1', '2026-01-05'))
+    json_manager.save_json(report_rollups.MANIFEST_FILENAME, {})
+
+    assert rows('user_day') == [('demo', '2026-01-05', 30)]
+    report_store.add_report('demo', make_report('r2', '2026-01-05', minutes=5))
+    assert rows('user_day') == [('demo', '2026-01-05', 35)]
+
+
+def test_interrupted_diff_is_applied_once(users, monkeypatch):
+    if json_manager.USE_SQLITE:
+        pytest.skip('SQLiteでは日報と同じトランザクションで反映する')
+    report_store.add_report('demo', make_report('r1', '2026-01-05'))
+    apply_journal = report_rollups.apply_journal
+
+    def fail(*args, **kwargs):
+        raise OSError('interrupted')
+    monkeypatch.setattr(report_rollups, 'apply_journal', fail)
+    report_store.add_report('demo', make_report('r2', '2026-01-05', minutes=5))
+    monkeypatch.setattr(report_rollups, 'apply_journal', apply_journal)
+    assert rows('user_day') == [('demo', '2026-01-05', 30)]
+
+    # 同じ集計表への次の反映で中断された差分も加え、ジャーナルの反映時には二重に加えない
+    report_store.add_report('demo', make_report('r3', '2026-01-05', minutes=1))
+    assert rows('user_day') == [('demo', '2026-01-05', 36)]
+    report_store.compact_journal('demo')
+    assert rows('user_day') == [('demo', '2026-01-05', 36)]
+    assert report_rollups.verify_rollups() == []
+
+
+def test_compaction_applies_pending_diffs(users, monkeypatch):
+    if json_manager.USE_SQLITE:
+        pytest.skip('SQLiteではジャーナルを使わない')
+    report_store.add_report('demo', make_report('r1', '2026-01-05'))
+    apply_journal = report_rollups.apply_journal
+    monkeypatch.setattr(report_rollups, 'apply_journal', lambda *args, **kwargs: None)
+    report_store.add_report('demo', make_report('r2', '2026-01-05', project_id='2', minutes=5))
+    monkeypatch.setattr(report_rollups, 'apply_journal', apply_journal)
+
+    report_store.compact_journal('demo')
+
+    assert rows('project_day') == [('1', '2026-01-05', 30), ('2', '2026-01-05', 5)]
+    assert report_rollups.verify_rollups() == []
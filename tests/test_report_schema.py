@@ -0,0 +1,105 @@
+import copy
+
+from backend.utils import json_manager, report_schema, report_store, work_item_catalog
+
+WORK_ITEMS = [
+    {'id': 'l1', 'name': '設計', 'level': 1, 'parent_id': None},
+    {'id': 'l2', 'name': '基本設計', 'level': 2, 'parent_id': 'l1'},
+    {'id': 'l3', 'name': '画面設計', 'level': 3, 'parent_id': 'l2'},
+]
+
+
+def save_work_items(work_type_id, items):
+    filename = work_item_catalog.get_work_items_filename(work_type_id)
+    json_manager.save_json(filename, {'items': items})
+    work_item_catalog.update_catalog_file(filename)
+
+
+def make_report(work_items):
+    return {'id': 'r1', 'date': '2026-01-15',
+            'projects': [{'project_id': '1', 'work_items': work_items}], 'work_items': [],
+            'created_at': '2026-01-15T09:00:00', 'updated_at': '2026-01-15T09:00:00'}
+
+
+def make_work_item(work_item_id, hierarchy):
+    return {'work_item_id': work_item_id, 'work_type_id': 'w1', 'hierarchy': hierarchy, 'minutes': 30}
+
+
+def test_compact_and_expand_round_trip(data_dir):
+    save_work_items('w1', WORK_ITEMS)
+    report = make_report([make_work_item('l3', ['l1', 'l2', 'l3']), make_work_item('l2', ['l1', 'l2'])])
+
+    compacted = report_schema.compact_report(report)
+
+    assert compacted['schema'] == report_schema.SCHEMA_VERSION
+    assert 'work_items' not in compacted
+    assert all('hierarchy' not in item for item in compacted['projects'][0]['work_items'])
+    assert report_schema.expand_report(copy.deepcopy(compacted)) == report
+
+
+def test_unresolvable_hierarchy_is_kept(data_dir):
+    save_work_items('w1', WORK_ITEMS)
+    report = make_report([make_work_item('unknown', ['x', 'unknown']), make_work_item('l3', ['l1', 'l3'])])
+
+    compacted = report_schema.compact_report(report)
+
+    assert [item['hierarchy'] for item in compacted['projects'][0]['work_items']] == [['x', 'unknown'], ['l1', 'l3']]
+    assert report_schema.expand_report(copy.deepcopy(compacted)) == report
+
+
+def test_deleted_work_item_keeps_hierarchy(report_backend):
+    save_work_items('w1', WORK_ITEMS)
+    report = make_report([make_work_item('l3', ['l1', 'l2', 'l3'])])
+    report_store.add_report('demo', report)
+
+    save_work_items('w1', WORK_ITEMS[:1])
+
+    saved, = report_store.load_user_reports('demo')
+    assert saved['projects'][0]['work_items'][0]['hierarchy'] == ['l1', 'l2', 'l3']
+
+
+def test_moved_work_item_keeps_saved_hierarchy(report_backend):
+    save_work_items('w1', WORK_ITEMS)
+    report_store.add_report('demo', make_report([make_work_item('l3', ['l1', 'l2', 'l3'])]))
+
+    # l2を親のない項目に移動すると、子孫のl3の階層も変わる
+    save_work_items('w1', [WORK_ITEMS[0], dict(WORK_ITEMS[1], parent_id=None, level=1), WORK_ITEMS[2]])
+    report_store.add_report('demo', dict(make_report([make_work_item('l3', ['l2', 'l3'])]), id='r2'))
+
+    saved = {r['id']: r['projects'][0]['work_items'][0]['hierarchy'] for r in report_store.load_user_reports('demo')}
+    assert saved == {'r1': ['l1', 'l2', 'l3'], 'r2': ['l2', 'l3']}
+
+
+def test_readded_work_item_uses_current_hierarchy(data_dir):
+    save_work_items('w1', WORK_ITEMS)
+    save_work_items('w1', WORK_ITEMS[:2])
+    save_work_items('w1', WORK_ITEMS[:2] + [dict(WORK_ITEMS[2], parent_id='l1', level=2)])
+
+    expanded = report_schema.expand_report(report_schema.compact_report(make_report([make_work_item('l3', ['l1', 'l3'])])))
+    assert expanded['projects'][0]['work_items'][0]['hierarchy'] == ['l1', 'l3']
+
+
+def test_upgrade_pins_changed_hierarchy_and_prunes_history(report_backend):
+    json_manager.save_json('users.json', {'demo': {'role': 'user'}})
+    save_work_items('w1', WORK_ITEMS)
+    report_store.add_report('demo', make_report([make_work_item('l3', ['l1', 'l2', 'l3'])]))
+    save_work_items('w1', WORK_ITEMS[:1])
+
+    report_store.upgrade_all()
+
+    catalog, _ = work_item_catalog.load_catalog()
+    assert catalog['history'] == {}
+    saved, = report_store.load_user_reports('demo')
+    assert saved['projects'][0]['work_items'][0]['hierarchy'] == ['l1', 'l2', 'l3']
+
+
+def test_rebuild_catalog_records_and_keeps_history(data_dir):
+    save_work_items('w1', WORK_ITEMS)
+    save_work_items('w1', WORK_ITEMS[:2])
+    # 作業項目ファイルを直接編集した場合も再構築時に変更前の階層を記録する
+    json_manager.save_json(work_item_catalog.get_work_items_filename('w1'), {'items': WORK_ITEMS[:1]})
+
+    catalog = work_item_catalog.rebuild_catalog()
+
+    assert catalog['revision'] == 2
+    assert catalog['history'] == {'w1': {'l3': [[1, ['l1', 'l2', 'l3']]], 'l2': [[2, ['l1', 'l2']]]}}